@@ -0,0 +1,122 @@
+"""
+ASGI config for minesweeper_api project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Game subscriptions are served by ``PushRouter``, every other request by Django.
+
+Django 3.0 has no async views, so ``ThreadSensitive`` adapts its WSGI
+application, for every endpoint, list, create and update_cell included. The
+body is read on the event loop. Then the request gets a thread of its own, from
+a pool of ``ASGI_THREADS`` threads, and is handled, its response iterated and
+closed, with ``sync_to_async(thread_sensitive=True)``. Called below an
+``async_to_sync`` from that thread, asgiref runs them all in it, so the
+database connection of a request never changes threads, while other requests
+run in other threads. Meanwhile the event loop keeps accepting connections and
+serving subscriptions.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/dev/howto/deployment/asgi/
+"""
+
+import io
+import os
+import sys
+from functools import partial
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'minesweeper_api.settings')
+
+from ms_game.push import PushRouter, subscribable  # noqa: E402
+
+
+def wsgi_environ(scope, body):
+    """Return the WSGI environ of the HTTP request in ``scope``."""
+    host, port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin1"),
+        "PATH_INFO": scope["path"].encode().decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_NAME": host,
+        "SERVER_PORT": str(port),
+        "SERVER_PROTOCOL": "HTTP/" + scope["http_version"],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = map(str, scope["client"])
+    for name, value in scope["headers"]:
+        name = name.decode("latin1").upper().replace("-", "_")
+        if name not in ["CONTENT_LENGTH", "CONTENT_TYPE"]:
+            name = "HTTP_" + name
+        value = value.decode("latin1")
+        environ[name] = environ[name] + "," + value if name in environ else value
+    return environ
+
+
+class ThreadSensitive:
+    """Serve a WSGI application to ASGI, every request in a thread of its own."""
+
+    def __init__(self, wsgi_application):
+        """Wrap the WSGI application."""
+        self.wsgi_application = wsgi_application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            raise ValueError(F"Unsupported scope: {scope['type']}")
+
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        await sync_to_async(self.request_thread)(wsgi_environ(scope, body), send)
+
+    def request_thread(self, environ, send):
+        """Respond from this thread, where thread sensitive calls will run."""
+        async_to_sync(self.respond)(environ, send)
+
+    async def respond(self, environ, send):
+        in_thread = partial(sync_to_async, thread_sensitive=True)
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started.update(status=int(status.split()[0]), headers=headers)
+
+        response = await in_thread(self.wsgi_application)(environ, start_response)
+        try:
+            chunks = await in_thread(iter)(response)
+            chunk = await in_thread(next)(chunks, None)
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": started["status"],
+                    "headers": [
+                        (name.lower().encode("latin1"), value.encode("latin1"))
+                        for name, value in started["headers"]
+                    ],
+                }
+            )
+            while chunk is not None:
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": True}
+                )
+                chunk = await in_thread(next)(chunks, None)
+            await send({"type": "http.response.body"})
+        finally:
+            if hasattr(response, "close"):
+                await in_thread(response.close)()
+
+
+application = PushRouter(ThreadSensitive(subscribable(get_wsgi_application())))
@@ -246,6 +246,78 @@ CORS_ORIGIN_WHITELIST = [
 CORS_ALLOW_CREDENTIALS = True
 
 
+# Minesweeper game
+# In-memory representation for boards: "json" (nested dicts) or "compact" (bytearrays).
+MS_GAME_BOARD_ENGINE = os.environ.get("MS_GAME_BOARD_ENGINE", "json")
+# Cache for games, from CACHES.
+MS_GAME_CACHE = "games"
+# Cache for the solvers that find hints, from CACHES.
+MS_GAME_HINT_CACHE = "hints"
+# Caches for users authenticated by email, from CACHES, looked up in order.
+# Saved or deleted users are only removed from the "users" cache of the
+# process that saved them, so other processes keep authenticating them as
+# they were for up to its TIMEOUT, 60 seconds.
+MS_GAME_USER_CACHES = ["users", "default"]
+# Create users with INSERT ... ON CONFLICT DO NOTHING, instead of get_or_create.
+MS_GAME_EMAIL_AUTH_IGNORE_CONFLICTS = (
+    os.environ.get("MS_GAME_EMAIL_AUTH_IGNORE_CONFLICTS") == "True"
+)
+# Broker for the updates pushed to the subscribers of a game.
+MS_GAME_PUSH_BROKER = os.environ.get(
+    "MS_GAME_PUSH_BROKER", "ms_game.push.InMemoryBroker"
+)
+# Path below which `ms_game.push.PushRouter` serves the game subscriptions.
+MS_GAME_PUSH_PREFIX = "games/"
+# Configurations of the ready-made boards in the pool, as (cols, rows, bombs).
+MS_GAME_POOL_CONFIGS = [
+    tuple(int(value) for value in config.lower().split("x"))
+    for config in os.environ.get("MS_GAME_POOL_CONFIGS", "10x10x15").split()
+]
+# Boards kept in the pool of every configuration by `fill_board_pool`.
+MS_GAME_POOL_SIZE = int(os.environ.get("MS_GAME_POOL_SIZE", 100))
+
+
+# Cache
+# https://docs.djangoproject.com/en/dev/topics/cache/
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    },
+    "games": {
+        "BACKEND": os.environ.get(
+            "MS_GAME_CACHE_BACKEND", "ms_game.cache.SizeBoundedLRUCache"
+        ),
+        "LOCATION": os.environ.get("MS_GAME_CACHE_LOCATION", "games"),
+        "TIMEOUT": int(os.environ.get("MS_GAME_CACHE_TIMEOUT", 300)),
+        "OPTIONS": {
+            "MAX_BYTES": int(os.environ.get("MS_GAME_CACHE_MAX_BYTES", 64 * 2 ** 20))
+        },
+    },
+    "hints": {
+        "BACKEND": os.environ.get(
+            "MS_GAME_HINT_CACHE_BACKEND", "ms_game.cache.SizeBoundedLRUCache"
+        ),
+        "LOCATION": os.environ.get("MS_GAME_HINT_CACHE_LOCATION", "hints"),
+        "TIMEOUT": int(os.environ.get("MS_GAME_HINT_CACHE_TIMEOUT", 300)),
+        "OPTIONS": {
+            "MAX_BYTES": int(
+                os.environ.get("MS_GAME_HINT_CACHE_MAX_BYTES", 16 * 2 ** 20)
+            )
+        },
+    },
+    # In process, for the users of the last minute.
+    "users": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "users",
+        "TIMEOUT": 60,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+
 # https://docs.djangoproject.com/en/dev/topics/logging/#default-logging-configuration
 # Colorize output, and make it more verbose.
 LOGGING = deepcopy(DEFAULT_LOGGING)
@@ -0,0 +1,40 @@
+// Decode the compact board formats of the API into nested boards.
+// Both give a code to every cell, column by column: 0 to 8 for an uncovered
+// cell with that many adjacent bombs, then covered, flagged and bomb.
+const VALUES = [0, 1, 2, 3, 4, 5, 6, 7, 8, "c", "f", "*"];
+
+function nest(codes, cols, rows) {
+  const board = [];
+  for (let c = 0; c < cols; c++) {
+    const column = [];
+    for (let r = 0; r < rows; r++) {
+      column.push(VALUES[codes(c * rows + r)]);
+    }
+    board.push(column);
+  }
+  return board;
+}
+
+// Decode a base64 string with 4 bits per cell, the first cell in the high bits.
+export function decodePacked(packed, cols, rows) {
+  const bytes = atob(packed);
+  return nest(
+    index => {
+      const byte = bytes.charCodeAt(index >> 1);
+      return index & 1 ? byte & 0b1111 : byte >> 4;
+    },
+    cols,
+    rows
+  );
+}
+
+// Decode a flat list of [code, run length, code, run length, ...].
+export function decodeRle(runs, cols, rows) {
+  const codes = [];
+  for (let i = 0; i < runs.length; i += 2) {
+    for (let n = 0; n < runs[i + 1]; n++) {
+      codes.push(runs[i]);
+    }
+  }
+  return nest(index => codes[index], cols, rows);
+}
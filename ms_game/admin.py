@@ -10,3 +10,16 @@ class GameAdmin(admin.ModelAdmin):
 
     list_display = ("__str__", "player", "finished", "won")
     list_select_related = ["player"]
+    # The board, and what is derived from it, only change with moves.
+    exclude = ["json_board"]
+    readonly_fields = [
+        "uuid",
+        "finished_at",
+        "bomb_count",
+        "flag_count",
+        "uncovered_count",
+        "uncovered_bomb_count",
+        "col_count",
+        "row_count",
+        "version",
+    ]
@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
 
 
 class MsGameConfig(AppConfig):
     name = 'ms_game'
+
+    def ready(self):
+        """Keep the game and user caches in sync with saved and deleted objects."""
+        from .authentication import invalidate_user
+        from .cache import invalidate_game
+
+        post_save.connect(invalidate_game, sender="ms_game.Game")
+        post_delete.connect(invalidate_game, sender="ms_game.Game")
+        post_save.connect(invalidate_user, sender=settings.AUTH_USER_MODEL)
+        post_delete.connect(invalidate_user, sender=settings.AUTH_USER_MODEL)
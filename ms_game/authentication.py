@@ -1,5 +1,9 @@
 """Define authentication backends compatible with DRF."""
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 from django.utils.translation import gettext_lazy as _
@@ -10,15 +14,69 @@ User = get_user_model()
 
 
 class EmailAuth(BasicAuthentication):
-    """A very insecure authenticator that authenticates just with email!."""
+    """
+    A very insecure authenticator that authenticates just with email!.
+
+    Users are looked up by email in the caches named by the
+    `MS_GAME_USER_CACHES` setting, in order, and only then in the database.
+    A user found in one cache is added to the caches before it.
+
+    Users are created on their first request with `get_or_create`. When the
+    `MS_GAME_EMAIL_AUTH_IGNORE_CONFLICTS` setting is True, they are created
+    with `INSERT ... ON CONFLICT DO NOTHING` instead, so concurrent first
+    requests never fail or retry. Players can also be created in advance
+    with `manage.py provision_players`.
+    """
 
     def authenticate_credentials(self, userid, password, request=None):
         """Authenticate userid as email. Create user if does not exist."""
+        username = userid.lower()
+        key = user_cache_key(username)
+        user_caches = [caches[alias] for alias in settings.MS_GAME_USER_CACHES]
+
+        for position, cache in enumerate(user_caches):
+            user = cache.get(key)
+            if user is not None:
+                for missed in user_caches[:position]:
+                    missed.set(key, user)
+                return (user, None)
+
         try:
             validate_email(userid)
         except ValidationError:
             raise exceptions.AuthenticationFailed(_("Invalid username/password."))
 
-        user, __ = User.objects.get_or_create(username=userid.lower())
+        user = self.get_or_create_user(username)
+        for cache in user_caches:
+            cache.set(key, user)
 
         return (user, None)
+
+    @staticmethod
+    def get_or_create_user(username):
+        """Return the user with the given username, creating it if needed."""
+        if not settings.MS_GAME_EMAIL_AUTH_IGNORE_CONFLICTS:
+            return User.objects.get_or_create(username=username)[0]
+
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            User.objects.bulk_create([User(username=username)], ignore_conflicts=True)
+            return User.objects.get(username=username)
+
+
+def user_cache_key(username):
+    """Return the user cache key for a username."""
+    return F"ms_game:user:{hashlib.sha1(username.encode()).hexdigest()}"
+
+
+def invalidate_user(sender, instance, **kwargs):
+    """
+    Remove a user from the user caches when it is saved or deleted.
+
+    In-process caches are only cleared in the process that saved the user.
+    The others keep the cached user until it expires.
+    """
+    key = user_cache_key(instance.username)
+    for alias in settings.MS_GAME_USER_CACHES:
+        caches[alias].delete(key)
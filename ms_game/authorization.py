@@ -11,4 +11,4 @@ class IsPlayer(permissions.IsAuthenticated):
 
     def has_object_permission(self, request, view, obj):
         """If the current user is the player, allowe access."""
-        return obj.player == request.user
+        return obj.player_id == request.user.pk
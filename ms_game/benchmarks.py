@@ -0,0 +1,910 @@
+"""
+Define benchmarks for MS Game app.
+
+Benchmarks are plain functions registered with the `benchmark` decorator.
+Each one returns a list of rows (dicts) that `manage.py benchmark` prints
+as a table.
+"""
+import asyncio
+import base64
+import gc
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from . import board_formats, export, hints, pool
+from .authentication import EmailAuth
+from .cache import games as game_cache
+from .generators import (
+    build_games,
+    create_games,
+    generate_grid,
+    generate_solvable_grid,
+    place_bombs,
+    safe_area,
+)
+from .models import BoardEngine, Game, Grid, Status
+from .reveal import uncover_neighbors
+from .serializers import GameSerializer
+from .solver import is_solvable
+from .views import GameViewset
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register the decorated function as a benchmark with the given name."""
+
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return decorator
+
+
+def measure(func, repeat=5):
+    """
+    Call `func` `repeat` times and return a tuple of `(seconds, bytes)`.
+
+    Seconds is the best wall time of all runs, and bytes the memory peak
+    of the first run as reported by tracemalloc.
+    """
+    gc.collect()
+    tracemalloc.start()
+    func()
+    __, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings), peak
+
+
+def random_board(cols, rows, bombs, seed=0):
+    """Return a JSON board with bombs placed by a seeded random generator."""
+    board = GameSerializer._get_new_data_board(cols, rows)
+    return GameSerializer._populate_board_with_bombs(board, bombs, random.Random(seed))
+
+
+@benchmark("board_engine")
+def board_engine(cols=100, rows=100, bombs=1000):
+    """
+    Compare the JSON and compact engines for one GET and one move.
+
+    The board is unpacked from its stored bytes on every run, as it is for
+    every request.
+    """
+    board = random_board(cols, rows, bombs)
+    packed = Grid.from_board(board).pack()
+    # Uncover the first empty cell so the move floods part of the board.
+    target = next(
+        (c, r)
+        for c, column in enumerate(board)
+        for r, cell_data in enumerate(column)
+        if not cell_data.get("bomb")
+    )
+
+    def get():
+        GameSerializer(Game(packed_board=packed)).data
+
+    def move():
+        game = Game(packed_board=packed)
+        game[target].uncover()
+        GameViewset.recursive_uncover_neighbors(game, target)
+        game.finished
+        game.sync_board()
+
+    results = []
+    for engine in BoardEngine:
+        with override_settings(MS_GAME_BOARD_ENGINE=engine):
+            for name, func in [("get", get), ("move", move)]:
+                seconds, peak = measure(func)
+                results.append(
+                    {
+                        "engine": engine.value,
+                        "operation": name,
+                        "board": F"{cols}x{rows}",
+                        "ms": round(seconds * 1000, 2),
+                        "peak_kb": round(peak / 1024),
+                    }
+                )
+    return results
+
+
+@benchmark("storage")
+def storage(cols=100, rows=100, bombs=1000):
+    """
+    Compare the JSON and packed board formats.
+
+    Reports the stored size of the board, as Postgres compresses it, and the
+    time to decode it into a Grid. This one runs against the configured
+    database, with a temporary player.
+    """
+    board = random_board(cols, rows, bombs)
+    raw = json.dumps(board)
+    packed = Grid.from_board(board).pack()
+
+    player = get_user_model().objects.create_user("benchmark@ms-game.invalid")
+    try:
+        game = Game.objects.create(player=player, board=board)
+        Game.objects.filter(pk=game.pk).update(json_board=board)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_column_size(json_board), pg_column_size(packed_board) "
+                F"FROM {Game._meta.db_table} WHERE uuid = %s",
+                [game.pk],
+            )
+            json_size, packed_size = cursor.fetchone()
+    finally:
+        player.delete()
+
+    formats = [
+        ("json", json_size, lambda: Grid.from_board(json.loads(raw))),
+        ("packed", packed_size, lambda: Grid.unpack(packed)),
+    ]
+    results = []
+    for name, size, decode in formats:
+        seconds, __ = measure(decode)
+        results.append(
+            {
+                "format": name,
+                "board": F"{cols}x{rows}",
+                "stored_kb": round(size / 1024, 1),
+                "decode_ms": round(seconds * 1000, 3),
+            }
+        )
+    return results
+
+
+@benchmark("board_format")
+def board_format(cols=100, rows=100, bombs=1000):
+    """
+    Compare the size and encoding time of the board formats.
+
+    Boards are measured new, and after a click that uncovers part of them.
+    """
+    board = random_board(cols, rows, bombs)
+    new = Grid.from_board(board).pack()
+    game = Game(packed_board=new, col_count=cols, row_count=rows)
+    target = next(
+        (c, r)
+        for c, column in enumerate(board)
+        for r, cell_data in enumerate(column)
+        if not cell_data.get("bomb") and not game.adjacent_bombs[c * rows + r]
+    )
+    game[target].uncover()
+    GameViewset.recursive_uncover_neighbors(game, target)
+    game.sync_board()
+    played = game.packed_board
+
+    results = []
+    for stage, packed in [("new", new), ("played", played)]:
+        for name in ["json", *board_formats.FORMATS]:
+            game = Game(packed_board=packed, col_count=cols, row_count=rows)
+            game.adjacent_bombs
+
+            def encode():
+                serializer = GameSerializer(context={"board_format": name})
+                return json.dumps(serializer.get_board(game))
+
+            seconds, __ = measure(encode)
+            results.append(
+                {
+                    "board": F"{cols}x{rows}",
+                    "stage": stage,
+                    "format": name,
+                    "kb": round(len(encode()) / 1024, 1),
+                    "ms": round(seconds * 1000, 2),
+                }
+            )
+    return results
+
+
+@benchmark("reveal")
+def reveal(cols=100, rows=100):
+    """
+    Measure the reveal of a board with a single bomb in a corner.
+
+    This is the worst case: one click uncovers every other cell.
+    """
+    board = GameSerializer._get_new_data_board(cols, rows)
+    board[cols - 1][rows - 1]["bomb"] = True
+    raw = json.dumps(board)
+
+    def click():
+        game = Game(board=json.loads(raw))
+        game.adjacent_bombs
+        game[0, 0].uncover()
+        return GameViewset.recursive_uncover_neighbors(game, (0, 0))
+
+    results = []
+    for engine in BoardEngine:
+        with override_settings(MS_GAME_BOARD_ENGINE=engine):
+            seconds, peak = measure(click)
+            results.append(
+                {
+                    "engine": engine.value,
+                    "board": F"{cols}x{rows}",
+                    "uncovered": len(click()),
+                    "ms": round(seconds * 1000, 2),
+                    "peak_kb": round(peak / 1024),
+                }
+            )
+    return results
+
+
+@benchmark("bomb_placement")
+def bomb_placement(cols=100, rows=100):
+    """Measure the bomb placement for densities from 1% to 99.99%."""
+    size = cols * rows
+    rng = random.Random(0)
+
+    results = []
+    for density in [0.01, 0.1, 0.5, 0.9, 0.99, 0.9999]:
+        bombs = round(size * density)
+
+        def json_board():
+            board = GameSerializer._get_new_data_board(cols, rows)
+            GameSerializer._populate_board_with_bombs(board, bombs, rng)
+
+        def grid():
+            generate_grid(cols, rows, bombs, rng)
+
+        json_seconds, __ = measure(json_board)
+        grid_seconds, __ = measure(grid)
+        results.append(
+            {
+                "board": F"{cols}x{rows}",
+                "density": F"{density:.2%}",
+                "bombs": bombs,
+                "json_ms": round(json_seconds * 1000, 2),
+                "grid_ms": round(grid_seconds * 1000, 2),
+            }
+        )
+    return results
+
+
+@benchmark("contention")
+def contention(cols=40, rows=40, moves=20):
+    """
+    Measure moves per second with several clients playing the same game.
+
+    Every client flags and unflags its own cell, `moves` times. This one
+    runs against the configured database, with a temporary player.
+    """
+    player = get_user_model().objects.create_user("benchmark@ms-game.invalid")
+    try:
+        game = Game.objects.create(player=player, board=random_board(cols, rows, 0))
+        results = []
+        for clients in [1, 2, 4, 8, 16]:
+            results.append(_contended_moves(game, clients, moves))
+        return results
+    finally:
+        player.delete()
+
+
+def _contended_moves(game, clients, moves):
+    barrier = threading.Barrier(clients)
+    timings = []
+    conflicts = []
+
+    def play(c):
+        client = Client()
+        client.force_login(game.player)
+        url = reverse("game-update-cell", args=[game.uuid, c, 0])
+        try:
+            barrier.wait()
+            for move in range(moves):
+                status = Status.FLAGGED.value if move % 2 == 0 else None
+                start = time.perf_counter()
+                response = client.patch(
+                    url,
+                    {"status": status},
+                    content_type="application/json",
+                    secure=True,
+                )
+                timings.append(time.perf_counter() - start)
+                if response.status_code == 409:
+                    conflicts.append(c)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=play, args=[c]) for c in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    timings.sort()
+    return {
+        "clients": clients,
+        "moves": len(timings),
+        "conflicts": len(conflicts),
+        "moves_per_s": round(len(timings) / seconds),
+        "p50_ms": round(statistics.median(timings) * 1000, 2),
+        "p99_ms": round(timings[int(len(timings) * 0.99)] * 1000, 2),
+    }
+
+
+@benchmark("moves")
+def moves(cols=40, rows=40, count=100):
+    """
+    Compare `count` moves sent one PATCH at a time, and as one batch.
+
+    Every move flags or unflags a cell. This one runs against the configured
+    database, with a temporary player.
+    """
+    player = get_user_model().objects.create_user("benchmark@ms-game.invalid")
+    client = Client()
+    client.force_login(player)
+    statuses = [
+        Status.FLAGGED.value if move % 2 == 0 else None for move in range(count)
+    ]
+
+    def one_by_one(game):
+        for move, status in enumerate(statuses):
+            client.patch(
+                reverse("game-update-cell", args=[game.uuid, move // 2 % cols, 0]),
+                {"status": status},
+                content_type="application/json",
+                secure=True,
+            )
+
+    def batch(game):
+        moves = [
+            {"col": move // 2 % cols, "row": 0, "status": status}
+            for move, status in enumerate(statuses)
+        ]
+        client.post(
+            reverse("game-moves", args=[game.uuid]),
+            {"moves": moves},
+            content_type="application/json",
+            secure=True,
+        )
+
+    results = []
+    try:
+        game = Game.objects.create(player=player, board=random_board(cols, rows, 0))
+        for name, play in [("patch", one_by_one), ("batch", batch)]:
+            start = time.perf_counter()
+            play(game)
+            seconds = time.perf_counter() - start
+            results.append(
+                {
+                    "requests": name,
+                    "moves": count,
+                    "board": F"{cols}x{rows}",
+                    "ms": round(seconds * 1000, 1),
+                    "us_per_move": round(seconds / count * 10 ** 6),
+                }
+            )
+    finally:
+        player.delete()
+    return results
+
+
+@benchmark("wal")
+def wal(cols=100, rows=100, bombs=1000, moves=20):
+    """
+    Measure the WAL bytes written by Postgres for each saved move.
+
+    Compares a full `save()`, the whole game written by `save_if_unchanged`,
+    and `save_if_unchanged(cells)`, which only writes the move fields and
+    splices the changed bytes into the packed board. This one runs against
+    the configured database, with a temporary player.
+    """
+    player = get_user_model().objects.create_user("benchmark@ms-game.invalid")
+    board = random_board(cols, rows, bombs)
+    empty = [
+        (c, r)
+        for c, column in enumerate(board)
+        for r, cell_data in enumerate(column)
+        if not cell_data.get("bomb")
+    ]
+
+    def flag(game, key):
+        game[key].flag()
+        return {key}
+
+    def reveal(game, key):
+        game[key].uncover()
+        return {key} | GameViewset.recursive_uncover_neighbors(game, key)
+
+    saves = [
+        ("save()", lambda game, cells: game.save()),
+        ("save_if_unchanged()", lambda game, cells: game.save_if_unchanged()),
+        ("save_if_unchanged(cells)", lambda game, cells: game.save_if_unchanged(cells)),
+    ]
+
+    results = []
+    try:
+        for move_name, move in [("flag", flag), ("reveal", reveal)]:
+            for save_name, save in saves:
+                game = Game.objects.create(player=player, board=board)
+                game.count_cells()
+                game.adjacent_bombs
+                game.save()
+                game = Game.objects.get(pk=game.pk)
+
+                played = changed = 0
+                start = _wal_lsn()
+                for key in empty:
+                    if played == moves:
+                        break
+                    if game[key].is_covered:
+                        cells = move(game, key)
+                        save(game, cells)
+                        played += 1
+                        changed += len(cells)
+                written = _wal_lsn() - start
+
+                results.append(
+                    {
+                        "move": move_name,
+                        "save": save_name,
+                        "board": F"{cols}x{rows}",
+                        "cells_per_move": round(changed / played, 1),
+                        "wal_kb_per_move": round(written / played / 1024, 1),
+                    }
+                )
+    finally:
+        player.delete()
+    return results
+
+
+def _wal_lsn():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_current_wal_lsn() - '0/0'")
+        return int(cursor.fetchone()[0])
+
+
+@benchmark("game_cache")
+def cached_games(cols=100, rows=100, requests=100):
+    """
+    Count the game queries of retrieves and moves, with and without the cache.
+
+    A cached game is only served after reading its `version`, so it still
+    costs a query, but not the load of the board. Without the cache, the game
+    is removed from it before every request. This one runs against the
+    configured database, with a temporary player.
+    """
+    player = get_user_model().objects.create_user("benchmark@ms-game.invalid")
+    client = Client()
+    client.force_login(player)
+    game = Game.objects.create(player=player, board=random_board(cols, rows, 0))
+    table = F'"{Game._meta.db_table}"'
+
+    def retrieve(move):
+        url = reverse("game-detail", args=[game.uuid])
+        client.get(url, {"board_format": "packed"}, secure=True)
+
+    def flag(move):
+        client.patch(
+            reverse("game-update-cell", args=[game.uuid, move % cols, move // cols]),
+            {"status": Status.FLAGGED.value},
+            content_type="application/json",
+            secure=True,
+        )
+
+    results = []
+    try:
+        for cache in ["off", "on"]:
+            for name, request in [("retrieve", retrieve), ("flag", flag)]:
+                game_cache.delete(game.pk)
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    for move in range(requests):
+                        if cache == "off":
+                            game_cache.delete(game.pk)
+                        request(move)
+                    seconds = time.perf_counter() - start
+                game_queries = [q["sql"] for q in queries if table in q["sql"]]
+                board_loads = [
+                    sql
+                    for sql in game_queries
+                    if sql.startswith("SELECT") and "packed_board" in sql
+                ]
+                results.append(
+                    {
+                        "cache": cache,
+                        "request": name,
+                        "board": F"{cols}x{rows}",
+                        "game_queries": round(len(game_queries) / requests, 2),
+                        "board_loads": round(len(board_loads) / requests, 2),
+                        "ms_per_request": round(seconds / requests * 1000, 2),
+                    }
+                )
+    finally:
+        player.delete()
+    return results
+
+
+@benchmark("auth")
+def auth(requests=1000):
+    """
+    Measure the authentication of a burst of requests from one player.
+
+    Compares no user caches, only the shared one, and both. This one runs
+    against the configured database, with a temporary player.
+    """
+    email = "benchmark@ms-game.invalid"
+    credentials = base64.b64encode(F"{email}:".encode()).decode()
+    request = Request(
+        APIRequestFactory().get("/", HTTP_AUTHORIZATION=F"Basic {credentials}")
+    )
+    local, shared = settings.MS_GAME_USER_CACHES
+    configurations = [("none", []), ("shared", [shared]), ("both", [local, shared])]
+
+    results = []
+    try:
+        for name, aliases in configurations:
+            with override_settings(MS_GAME_USER_CACHES=aliases):
+                for alias in aliases:
+                    caches[alias].clear()
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    for _ in range(requests):
+                        EmailAuth().authenticate(request)
+                    seconds = time.perf_counter() - start
+            results.append(
+                {
+                    "caches": name,
+                    "requests": requests,
+                    "us_per_request": round(seconds / requests * 10 ** 6, 1),
+                    "queries": len(queries),
+                }
+            )
+    finally:
+        get_user_model().objects.filter(username=email).delete()
+    return results
+
+
+@benchmark("export")
+def export_games(sizes=(1000, 10000, 50000)):
+    """
+    Measure the time and memory peak of an NDJSON export of a player's games.
+
+    This one runs against the configured database, with a temporary player.
+    """
+    player = get_user_model().objects.create_user("benchmark@ms-game.invalid")
+    games = Game.objects.filter(player=player)
+    board = Grid(10, 10).pack()
+
+    results = []
+    try:
+        for size in sizes:
+            Game.objects.bulk_create(
+                Game(player=player, packed_board=board, col_count=10, row_count=10)
+                for _ in range(size - games.count())
+            )
+
+            def consume():
+                for __ in export.ndjson_lines(export.export_rows(games)):
+                    pass
+
+            seconds, peak = measure(consume, repeat=1)
+            results.append(
+                {
+                    "games": size,
+                    "ms": round(seconds * 1000),
+                    "peak_kb": round(peak / 1024),
+                }
+            )
+    finally:
+        player.delete()
+    return results
+
+
+@benchmark("board_pool")
+def board_pool(games=50, configs=((10, 10, 15), (40, 40, 300), (100, 100, 2000))):
+    """
+    Measure game creation with boards claimed from the pool, and generated.
+
+    This one runs against the configured database, with a temporary player.
+    """
+    player = get_user_model().objects.create_user("benchmark@ms-game.invalid")
+    request = Request(APIRequestFactory().post("/"))
+    request.user = player
+
+    def create(cols, rows, bombs):
+        start = time.perf_counter()
+        for _ in range(games):
+            data = {"cols": cols, "rows": rows, "bombs": bombs}
+            serializer = GameSerializer(data=data, context={"request": request})
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        return (time.perf_counter() - start) / games
+
+    results = []
+    try:
+        for cols, rows, bombs in configs:
+            with override_settings(MS_GAME_POOL_CONFIGS=[(cols, rows, bombs)]):
+                pool.fill_pool(cols, rows, bombs, games)
+                claimed = create(cols, rows, bombs)
+                generated = create(cols, rows, bombs)
+            results.append(
+                {
+                    "config": F"{cols}x{rows}x{bombs}",
+                    "claimed_ms": round(claimed * 1000, 2),
+                    "generated_ms": round(generated * 1000, 2),
+                }
+            )
+    finally:
+        player.delete()
+    return results
+
+
+@benchmark("no_guess")
+def no_guess(
+    sizes=((9, 9), (16, 16), (30, 16), (50, 50)),
+    densities=(0.12, 0.16, 0.2),
+    layouts=100,
+    boards=5,
+    workers=None,
+):
+    """
+    Measure the solver, and the generation of boards solvable without guessing.
+
+    For every board size and bomb density, random layouts are solved from
+    the center, reporting how many are solvable and the solve time
+    percentiles. Then `boards` solvable boards are generated by a pool of
+    `workers` processes, one per CPU by default, giving up on each after 500
+    candidates.
+    """
+    rng = random.Random(0)
+    results = []
+    with ProcessPoolExecutor(workers) as executor:
+        for cols, rows in sizes:
+            first_key = (cols // 2, rows // 2)
+            first_index = first_key[0] * rows + first_key[1]
+            for density in densities:
+                bombs = round(cols * rows * density)
+                exclude = safe_area(Grid(cols, rows), first_index, bombs)
+
+                timings = []
+                solvable = 0
+                for _ in range(layouts):
+                    grid = Grid(cols, rows)
+                    for index in place_bombs(cols, rows, bombs, rng, exclude):
+                        grid.bombs[index] = 1
+                    start = time.perf_counter()
+                    solvable += is_solvable(grid, first_index)
+                    timings.append(time.perf_counter() - start)
+                timings.sort()
+
+                generated = 0
+                start = time.perf_counter()
+                for _ in range(boards):
+                    grid = generate_solvable_grid(
+                        cols, rows, bombs, first_key, executor, 500, rng=rng
+                    )
+                    generated += grid is not None
+                seconds = time.perf_counter() - start
+
+                results.append(
+                    {
+                        "board": F"{cols}x{rows}",
+                        "density": F"{density:.0%}",
+                        "solvable": F"{solvable / layouts:.0%}",
+                        "p50_ms": round(timings[len(timings) // 2] * 1000, 2),
+                        "p90_ms": round(timings[len(timings) * 9 // 10] * 1000, 2),
+                        "max_ms": round(timings[-1] * 1000, 2),
+                        "boards": F"{generated}/{boards}",
+                        "boards_per_s": round(generated / seconds, 2),
+                    }
+                )
+    return results
+
+
+@benchmark("hints")
+def hint_moves(sizes=((16, 16), (30, 16), (50, 50), (100, 100)), moves=100):
+    """
+    Measure hints kept up to date by moves, against solving the whole board.
+
+    A game with 10% of bombs is played by uncovering each hint, for up to
+    `moves` moves. Each move updates the cached solver, and the next hint
+    only propagates what changed. Each state is also solved from scratch, as
+    it would be without the cache.
+    """
+    rng = random.Random(0)
+    results = []
+    for cols, rows in sizes:
+        bombs = round(cols * rows * 0.1)
+        first_key = (cols // 2, rows // 2)
+        grid = Grid(cols, rows)
+        exclude = safe_area(grid, first_key[0] * rows + first_key[1], bombs)
+        for index in place_bombs(cols, rows, bombs, rng, exclude):
+            grid.bombs[index] = 1
+        game = Game(col_count=cols, row_count=rows)
+        game.set_grid(grid)
+        game.count_cells()
+
+        incremental = []
+        full = []
+        key = first_key
+        for _ in range(moves):
+            start = time.perf_counter()
+            game[key].uncover()
+            changed = uncover_neighbors(game, key) | {key}
+            game.version += 1
+            hints.update(game, changed)
+            key = hints.hint(game)
+            incremental.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            hints.build_solver(game).deduce()
+            full.append(time.perf_counter() - start)
+            if key is None:
+                break
+
+        results.append(
+            {
+                "board": F"{cols}x{rows}",
+                "moves": len(incremental),
+                "incremental_p50_ms": round(statistics.median(incremental) * 1000, 2),
+                "incremental_max_ms": round(max(incremental) * 1000, 2),
+                "full_p50_ms": round(statistics.median(full) * 1000, 2),
+            }
+        )
+        hints.get_cache().delete(hints.KEY_PREFIX + str(game.pk))
+    return results
+
+
+SERVERS = {
+    "wsgi": ["gunicorn", "minesweeper_api.wsgi"],
+    "asgi": [
+        "gunicorn",
+        "minesweeper_api.asgi:application",
+        "--worker-class",
+        "uvicorn.workers.UvicornWorker",
+    ],
+}
+
+
+@benchmark("load")
+def load(concurrency=(10, 100, 1000), requests=4, workers=4, threads=8):
+    """
+    Compare requests per second and latency of the WSGI and ASGI servers.
+
+    Each server is started with `workers` processes, ASGI workers with
+    `threads` threads each, and loaded by every number of concurrent
+    clients in `concurrency`. Every client makes `requests` requests, in
+    turn listing games, flagging a cell, creating a game and unflagging the
+    cell. This one runs against the configured database, with a temporary
+    player.
+    """
+    email = "benchmark@ms-game.invalid"
+    player = get_user_model().objects.create_user(email)
+    credentials = base64.b64encode(F"{email}:".encode()).decode()
+
+    results = []
+    try:
+        games = build_games(player, max(concurrency), 10, 10, 10)
+        uuids = [game.uuid for batch in create_games(games) for game in batch]
+        for server, command in SERVERS.items():
+            with _serve(command, workers, threads) as port:
+                # Warm up every worker before measuring.
+                _load(port, credentials, uuids[: workers * threads], 1)
+                for clients in concurrency:
+                    results.append(
+                        {
+                            "server": server,
+                            "clients": clients,
+                            **_load(port, credentials, uuids[:clients], requests),
+                        }
+                    )
+    finally:
+        player.delete()
+    return results
+
+
+class _serve:
+    """Run a server command on a free port, until the context exits."""
+
+    def __init__(self, command, workers, threads):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.command = [
+            *command,
+            F"--bind=127.0.0.1:{self.port}",
+            F"--workers={workers}",
+            "--log-level=warning",
+        ]
+        self.env = {**os.environ, "ASGI_THREADS": str(threads)}
+
+    def __enter__(self):
+        bin_dir = os.path.dirname(sys.executable)
+        self.command[0] = os.path.join(bin_dir, self.command[0])
+        self.process = subprocess.Popen(self.command, env=self.env)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", self.port)).close()
+                return self.port
+            except ConnectionRefusedError:
+                time.sleep(0.1)
+        self.process.terminate()
+        raise RuntimeError(F"{' '.join(self.command)} did not start.")
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait()
+
+
+def _load(port, credentials, uuids, requests):
+    async def request(method, path, body=None):
+        body = json.dumps(body).encode() if body is not None else b""
+        head = (
+            F"{method} {path} HTTP/1.1\r\n"
+            "Host: 127.0.0.1\r\n"
+            F"Authorization: Basic {credentials}\r\n"
+            "X-Forwarded-Proto: https\r\n"
+            "Content-Type: application/json\r\n"
+            F"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(head.encode() + body)
+            response = await reader.read()
+            writer.close()
+        except OSError:
+            response = b""
+        timings.append(time.perf_counter() - start)
+        if not response.startswith((b"HTTP/1.1 2", b"HTTP/1.0 2")):
+            errors.append(response[:12])
+
+    async def play(uuid):
+        cell = F"/games/{uuid}/cells/0,0/"
+        moves = [
+            ("GET", "/games/", None),
+            ("PATCH", cell, {"status": Status.FLAGGED.value}),
+            ("POST", "/games/", {"cols": 10, "rows": 10, "bombs": 10}),
+            ("PATCH", cell, {"status": None}),
+        ]
+        for move in range(requests):
+            await request(*moves[move % len(moves)])
+
+    async def run():
+        await asyncio.gather(*(play(uuid) for uuid in uuids))
+
+    timings = []
+    errors = []
+    start = time.perf_counter()
+    asyncio.run(run())
+    seconds = time.perf_counter() - start
+
+    timings.sort()
+    return {
+        "requests": len(timings),
+        "errors": len(errors),
+        "requests_per_s": round((len(timings) - len(errors)) / seconds),
+        "p50_ms": round(statistics.median(timings) * 1000),
+        "p99_ms": round(timings[int(len(timings) * 0.99)] * 1000),
+    }
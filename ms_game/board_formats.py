@@ -0,0 +1,76 @@
+"""
+Board formats for MS Game app.
+
+Besides the nested JSON list, boards can be represented in two compact
+formats. Both give every cell a code, in the column-major `c * rows + r`
+order of the Grid: 0 to 8 for an uncovered cell with that many adjacent
+bombs, then `COVERED`, `FLAGGED` and `BOMB`.
+
+- `rle`: a flat list of `[code, run length, code, run length, ...]`.
+- `packed`: base64 of 4 bits per cell, two cells per byte, the first cell
+  in the high bits.
+
+Codes are computed from the Grid and the adjacent bomb counts of a game
+with big integer arithmetic and `bytes.translate`, never per cell.
+"""
+import re
+from base64 import b64encode
+
+COVERED = 9
+FLAGGED = 10
+BOMB = 11
+
+# Tables from `status | bomb << 2` to the code of a cell, and to a mask
+# selecting the uncovered cells without a bomb.
+_CODES = bytes(
+    {0: COVERED, 1: FLAGGED, 4: COVERED, 5: FLAGGED, 6: BOMB}.get(key, 0)
+    for key in range(256)
+)
+_EMPTY = bytes(0xFF if key == 2 else 0 for key in range(256))
+
+_RUN = re.compile(rb"(.)\1*", re.DOTALL)
+
+
+def cell_codes(game):
+    """Return the code of every cell of a game, as bytes."""
+    size = game.cols * game.rows
+    if not game.has_board:
+        # A safe_first_click game before its first move.
+        return bytes([COVERED]) * size
+
+    grid = game.as_grid()
+    # As big integers, there are no carries between cells.
+    status = int.from_bytes(grid.status, "big")
+    bombs = int.from_bytes(grid.bombs, "big")
+    keys = (status + 4 * bombs).to_bytes(size, "big")
+    codes = int.from_bytes(keys.translate(_CODES), "big")
+    empty = int.from_bytes(keys.translate(_EMPTY), "big")
+    adjacent_bombs = int.from_bytes(game.adjacent_bombs, "big")
+    return (codes + (adjacent_bombs & empty)).to_bytes(size, "big")
+
+
+def rle(codes):
+    """Return the codes as a flat list of `[code, run length, ...]`."""
+    runs = []
+    for run in _RUN.finditer(codes):
+        runs += [codes[run.start()], run.end() - run.start()]
+    return runs
+
+
+def packed(codes):
+    """Return the codes packed as 4 bits each, encoded as base64."""
+    codes += bytes(len(codes) % 2)
+    high = int.from_bytes(codes[0::2], "big")
+    low = int.from_bytes(codes[1::2], "big")
+    return b64encode((16 * high + low).to_bytes(len(codes) // 2, "big")).decode()
+
+
+FORMATS = {
+    "rle": rle,
+    "packed": packed,
+}
+
+
+def encode_board(game, board_format):
+    """Return the board of a game in one of the compact `FORMATS`."""
+    return FORMATS[board_format](cell_codes(game))
@@ -0,0 +1,194 @@
+"""
+Cache games for MS Game app.
+
+Games are cached by uuid in the Django cache named by the `MS_GAME_CACHE`
+setting. Any backend works: `SizeBoundedLRUCache` keeps games in process
+memory, and a shared backend (Redis, Memcached) serves every process.
+
+Cached games may be stale, for example when another process saved a move.
+The views only serve a cached game after checking its `version` against
+the database, so a cached read still costs a query, without the board.
+Moves are only saved if the `version` has not changed (see
+`Game.save_if_unchanged`).
+"""
+import pickle
+import time
+import zlib
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Game
+
+# Global in-memory stores, keyed by name, as LocMemCache does.
+_entries = {}
+_sizes = {}
+_locks = {}
+
+
+class SizeBoundedLRUCache(BaseCache):
+    """
+    Keep values in process memory, evicting the least recently used first.
+
+    Works like Django's LocMemCache, but it is bounded by the total size of
+    the pickled values, set with the `MAX_BYTES` option, instead of by their
+    number.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, name, params):
+        """Share the store of every cache with the same name."""
+        super().__init__(params)
+        self.max_bytes = int(params.get("OPTIONS", {}).get("MAX_BYTES", 64 * 2 ** 20))
+        # Entries are `(pickled value, expiry time)`, least recently used first.
+        self._entries = _entries.setdefault(name, OrderedDict())
+        self._size = _sizes.setdefault(name, [0])
+        self._lock = _locks.setdefault(name, Lock())
+
+    @property
+    def size(self):
+        """Return the total size of the pickled values, in bytes."""
+        return self._size[0]
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Set a value only if the key is not in the cache."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            if self._get(key) is not None:
+                return False
+            self._set(key, pickled, timeout)
+            return True
+
+    def get(self, key, default=None, version=None):
+        """Return the value of a key, and mark it as the most recently used."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            pickled = self._get(key)
+        if pickled is None:
+            return default
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Set the value of a key, evicting other keys if needed."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            self._set(key, pickled, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        """Set a new expiry time for a key."""
+        key = self.make_key(key, version=version)
+        with self._lock:
+            pickled = self._get(key)
+            if pickled is None:
+                return False
+            self._entries[key] = (pickled, self.get_backend_timeout(timeout))
+            return True
+
+    def has_key(self, key, version=None):
+        """Return True if the key is in the cache, and has not expired."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            return self._get(key) is not None
+
+    def delete(self, key, version=None):
+        """Remove a key from the cache."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            return self._delete(key)
+
+    def clear(self):
+        """Remove every key from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._size[0] = 0
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        pickled, expires = entry
+        if expires is not None and expires <= time.time():
+            self._delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return pickled
+
+    def _set(self, key, pickled, timeout):
+        self._delete(key)
+        if len(pickled) > self.max_bytes:
+            return
+        while self._entries and self._size[0] + len(pickled) > self.max_bytes:
+            self._delete(next(iter(self._entries)))
+        self._entries[key] = (pickled, self.get_backend_timeout(timeout))
+        self._size[0] += len(pickled)
+
+    def _delete(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._size[0] -= len(entry[0])
+        return True
+
+
+class GameCache:
+    """
+    Cache Game instances by uuid.
+
+    Games are cached as the values of their fields, so every `get` returns
+    a new instance. Keys depend on the field names, so games cached before
+    a change to the model are never read.
+    """
+
+    def __init__(self):
+        """Prepare the field names and the key prefix."""
+        self.field_names = [field.attname for field in Game._meta.concrete_fields]
+        fingerprint = zlib.crc32(",".join(self.field_names).encode())
+        self.key_prefix = F"ms_game:game:{fingerprint:x}:"
+
+    @property
+    def cache(self):
+        """Return the Django cache named by the `MS_GAME_CACHE` setting."""
+        return caches[settings.MS_GAME_CACHE]
+
+    def key(self, uuid):
+        """Return the cache key for a game uuid."""
+        return F"{self.key_prefix}{uuid}"
+
+    def get(self, uuid):
+        """Return the cached game with the given uuid, or None."""
+        values = self.cache.get(self.key(uuid))
+        if values is None:
+            return None
+        return Game.from_db(DEFAULT_DB_ALIAS, self.field_names, values)
+
+    def set(self, game):
+        """Cache a saved game."""
+        values = [getattr(game, name) for name in self.field_names]
+        values = [
+            bytes(value) if isinstance(value, memoryview) else value for value in values
+        ]
+        self.cache.set(self.key(game.pk), values)
+
+    def delete(self, uuid):
+        """Remove a game from the cache."""
+        self.cache.delete(self.key(uuid))
+
+
+games = GameCache()
+
+
+def invalidate_game(sender, instance, **kwargs):
+    """Remove a game from the cache when it is saved or deleted."""
+    games.delete(instance.pk)
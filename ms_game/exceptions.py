@@ -0,0 +1,12 @@
+"""Define API exceptions for MS Game app."""
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class GameConflict(APIException):
+    """The game kept changing while a move was being applied to it."""
+
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _("The game was changed by another move, try again.")
+    default_code = "conflict"
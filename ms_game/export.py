@@ -0,0 +1,81 @@
+"""
+Export games for MS Game app.
+
+Games are read from the database in chunks, and written one row at a time
+as NDJSON or CSV, so exports use the same memory whatever the number of
+games. Boards are never loaded.
+"""
+import csv
+import json
+
+EXPORT_FIELDS = [
+    "uuid",
+    "player",
+    "cols",
+    "rows",
+    "bombs",
+    "finished",
+    "won",
+    "created_at",
+    "finished_at",
+    "duration",
+]
+
+CHUNK_SIZE = 2000
+
+
+def export_rows(queryset, chunk_size=CHUNK_SIZE):
+    """Yield a dict with the `EXPORT_FIELDS` of every game, oldest first."""
+    games = queryset.order_by("created_at", "uuid").values_list(
+        "uuid",
+        "player__username",
+        "col_count",
+        "row_count",
+        "bomb_count",
+        "uncovered_bomb_count",
+        "created_at",
+        "finished_at",
+    )
+    for game in games.iterator(chunk_size=chunk_size):
+        uuid, player, cols, rows, bombs, uncovered_bombs, created_at, finished_at = game
+        finished = finished_at is not None
+        duration = (finished_at - created_at).total_seconds() if finished else None
+        yield {
+            "uuid": str(uuid),
+            "player": player,
+            "cols": cols,
+            "rows": rows,
+            "bombs": bombs,
+            "finished": finished,
+            "won": finished and not uncovered_bombs,
+            "created_at": created_at.isoformat(),
+            "finished_at": finished_at.isoformat() if finished else None,
+            "duration": duration,
+        }
+
+
+def ndjson_lines(rows):
+    """Yield every row as a line of JSON."""
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+class _Line:
+    """A file-like object that returns what is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    """Yield a CSV header, and every row as a CSV line."""
+    writer = csv.DictWriter(_Line(), EXPORT_FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+FORMATS = {
+    "ndjson": (ndjson_lines, "application/x-ndjson"),
+    "csv": (csv_lines, "text/csv"),
+}
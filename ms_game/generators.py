@@ -0,0 +1,189 @@
+"""
+Board generators for MS Game app.
+
+Bomb positions are flat `c * rows + r` indexes, sampled without
+replacement so that every layout with the requested number of bombs is
+equally likely. All generators accept a `random.Random` instance, so a
+seeded one produces reproducible boards.
+
+`generate_solvable_grid` only returns boards that can be solved without
+guessing (see `ms_game.solver`). Solving is slow, so candidate layouts are
+solved by a pool of processes. Those import this module, but not Django
+models, so that they work with any multiprocessing start method.
+"""
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+
+from .grid import Grid
+from .solver import is_solvable
+
+
+def place_bombs(cols, rows, bombs, rng=None, exclude=()):
+    """
+    Return a list with the flat indexes of `bombs` randomly chosen cells.
+
+    Cells whose index is in `exclude` never get a bomb.
+    """
+    size = cols * rows
+    candidates = range(size)
+    if exclude:
+        candidates = [index for index in candidates if index not in exclude]
+    bombs = min(len(candidates), bombs)
+    rng = rng or random
+
+    # Sample whichever is smaller, the bombs or the empty cells.
+    if bombs * 2 <= len(candidates):
+        return rng.sample(candidates, bombs)
+
+    empty = set(rng.sample(candidates, len(candidates) - bombs))
+    return [index for index in candidates if index not in empty]
+
+
+def generate_grid(cols, rows, bombs, rng=None):
+    """Return a new Grid with `bombs` randomly placed bombs."""
+    grid = Grid(cols, rows)
+    for index in place_bombs(cols, rows, bombs, rng):
+        grid.bombs[index] = 1
+    return grid
+
+
+def safe_area(grid, index, bombs):
+    """
+    Return the flat indexes kept free of bombs around a first click.
+
+    Those are the cell and its neighbors, or only the cell itself on boards
+    too dense to spare the neighbors.
+    """
+    exclude = {index, *grid.neighbors(index)}
+    if bombs > grid.size - len(exclude):
+        exclude = {index}
+    return exclude
+
+
+def place_pending_bombs(game, safe_key=None, rng=None):
+    """
+    Build the board of a `safe_first_click` game.
+
+    Without a `safe_key` the board is built without bombs, so that cells
+    can be flagged. With one, the bombs are placed away from that cell and
+    its neighbors. On boards too dense to spare the neighbors, only the
+    cell itself is kept free of bombs.
+    """
+    cols, rows = game.cols, game.rows
+    grid = Grid(cols, rows)
+    if game.has_board:
+        grid = game.as_grid()
+
+    if safe_key is not None:
+        c, r = safe_key
+        exclude = safe_area(grid, c * rows + r, game.bomb_count)
+        for index in place_bombs(cols, rows, game.bomb_count, rng, exclude):
+            grid.bombs[index] = 1
+
+    game.set_grid(grid)
+
+
+def find_solvable_bombs(cols, rows, bombs, first_index, seed, attempts):
+    """
+    Return the bombs of the first random layout that can be solved, or None.
+
+    Up to `attempts` layouts, sampled with the `seed`, are solved from the
+    cell at `first_index`, which is kept free of bombs with `safe_area`.
+    """
+    rng = random.Random(seed)
+    exclude = safe_area(Grid(cols, rows), first_index, bombs)
+    for _ in range(attempts):
+        grid = Grid(cols, rows)
+        layout = place_bombs(cols, rows, bombs, rng, exclude)
+        for index in layout:
+            grid.bombs[index] = 1
+        if is_solvable(grid, first_index):
+            return layout
+    return None
+
+
+def generate_solvable_grid(
+    cols, rows, bombs, first_key, executor=None, attempts=1000, batch_size=10, rng=None
+):
+    """
+    Return a Grid that can be solved from `first_key` without guessing, or None.
+
+    Candidate layouts are solved in batches of `batch_size` by the processes
+    of `executor`, a `ProcessPoolExecutor` created for the call if not given,
+    and the first solvable one found is returned. None is returned after
+    `attempts` candidates. Boards are only reproducible with one process.
+    """
+    rng = rng or random
+    c, r = first_key
+    first_index = c * rows + r
+
+    pool = executor or ProcessPoolExecutor()
+    futures = [
+        pool.submit(
+            find_solvable_bombs,
+            cols,
+            rows,
+            bombs,
+            first_index,
+            rng.getrandbits(64),
+            min(batch_size, attempts - start),
+        )
+        for start in range(0, attempts, batch_size)
+    ]
+    try:
+        for future in as_completed(futures):
+            layout = future.result()
+            if layout is not None:
+                grid = Grid(cols, rows)
+                for index in layout:
+                    grid.bombs[index] = 1
+                return grid
+        return None
+    finally:
+        for future in futures:
+            future.cancel()
+        if executor is None:
+            pool.shutdown()
+
+
+def build_games(player, count, cols, rows, bombs, safe_first_click=False, rng=None):
+    """
+    Yield `count` new, unsaved games with the same configuration.
+
+    Boards are generated as Grids and stored packed, with their counters
+    set, so the games are ready for `bulk_create`.
+    """
+    # Imported here, so that the solver processes do not need Django set up.
+    from .models import Game
+
+    empty = Grid(0, 0).pack()
+    for _ in range(count):
+        game = Game(
+            player=player,
+            col_count=cols,
+            row_count=rows,
+            bomb_count=bombs,
+            flag_count=0,
+            uncovered_count=0,
+            uncovered_bomb_count=0,
+            safe_first_click=safe_first_click,
+            packed_board=empty,
+        )
+        if not safe_first_click:
+            grid = generate_grid(cols, rows, bombs, rng)
+            game.packed_board = grid.pack()
+            game.adjacency = grid.count_adjacent_bombs()
+        yield game
+
+
+def create_games(games, batch_size=500):
+    """Insert games with `bulk_create`, and yield each inserted batch."""
+    from .models import Game
+
+    games = iter(games)
+    while True:
+        batch = list(islice(games, batch_size))
+        if not batch:
+            return
+        yield Game.objects.bulk_create(batch)
@@ -0,0 +1,278 @@
+"""
+Grids for MS Game app.
+
+Boards as flat arrays, independent of the Game model. The module only
+imports `django.db.models`, for the choices of `Status`, which needs neither
+settings nor the app registry. So grids can be used before Django is set up,
+like in the processes that search for boards that can be solved without
+guessing (see `ms_game.generators`).
+"""
+import struct
+
+from django.db import models
+
+
+class Status(models.TextChoices):
+    """Define possible status for a cell."""
+
+    FLAGGED = "F"
+    UNCOVERED = "U"
+
+
+class Grid:
+    """
+    Represent a board as flat arrays, indexed by `c * rows + r`.
+
+    `bombs` holds 1 for every cell with a bomb, and `status` holds one of
+    `COVERED`, `FLAGGED` or `UNCOVERED` for every cell. The layout follows
+    the column-major order of the JSON board.
+
+    A Grid is stored packed: a header with the number of columns and rows,
+    then 4 bits per cell, 2 for the status and 2 for the bomb. Each byte
+    holds two cells, the first one in the high bits.
+    """
+
+    COVERED = 0
+    FLAGGED = 1
+    UNCOVERED = 2
+
+    HEADER = struct.Struct(">HH")
+    # Tables to split packed bytes into cells, and cells into bombs and status.
+    HIGH_CELL = bytes(byte >> 4 for byte in range(256))
+    LOW_CELL = bytes(byte & 0b1111 for byte in range(256))
+    CELL_BOMB = bytes(byte >> 2 & 1 for byte in range(256))
+    CELL_STATUS = bytes(byte & 0b11 for byte in range(256))
+
+    __slots__ = ("cols", "rows", "bombs", "status")
+
+    def __init__(self, cols, rows, bombs=None, status=None):
+        """Create a Grid, all cells covered and without bombs by default."""
+        self.cols = cols
+        self.rows = rows
+        self.bombs = bytearray(cols * rows) if bombs is None else bombs
+        self.status = bytearray(cols * rows) if status is None else status
+
+    @property
+    def size(self):
+        """Return the number of cells in the grid."""
+        return self.cols * self.rows
+
+    @classmethod
+    def from_board(cls, board):
+        """Return a new Grid holding the data of a JSON board."""
+        cols = len(board)
+        rows = len(board[0]) if cols else 0
+        grid = cls(cols, rows)
+        codes = {
+            Status.FLAGGED.value: cls.FLAGGED,
+            Status.UNCOVERED.value: cls.UNCOVERED,
+        }
+        bombs, status = grid.bombs, grid.status
+
+        index = 0
+        for column in board:
+            for cell_data in column:
+                if cell_data.get("bomb", None) is True:
+                    bombs[index] = 1
+                status[index] = codes.get(cell_data.get("status", None), cls.COVERED)
+                index += 1
+
+        return grid
+
+    def to_board(self):
+        """Return the Grid as a JSON board."""
+        values = {
+            self.FLAGGED: Status.FLAGGED.value,
+            self.UNCOVERED: Status.UNCOVERED.value,
+        }
+        bombs, status = self.bombs, self.status
+
+        board = []
+        for c in range(self.cols):
+            column = []
+            for index in range(c * self.rows, (c + 1) * self.rows):
+                cell_data = {}
+                if bombs[index]:
+                    cell_data["bomb"] = True
+                if status[index]:
+                    cell_data["status"] = values[status[index]]
+                column.append(cell_data)
+            board.append(column)
+        return board
+
+    def pack(self):
+        """Return the Grid packed as bytes."""
+        size = self.size
+        # Cells are `status | bomb << 2`. As big integers, there are no carries.
+        status = int.from_bytes(self.status, "big")
+        bombs = int.from_bytes(self.bombs, "big")
+        cells = (status + 4 * bombs).to_bytes(size, "big") + bytes(size % 2)
+        high = int.from_bytes(cells[0::2], "big")
+        low = int.from_bytes(cells[1::2], "big")
+        packed = (16 * high + low).to_bytes(len(cells) // 2, "big")
+        return self.HEADER.pack(self.cols, self.rows) + packed
+
+    @classmethod
+    def unpack(cls, data):
+        """Return a new Grid from the bytes returned by `pack`."""
+        cols, rows = cls.unpack_size(data)
+        packed = bytes(data[cls.HEADER.size :])
+        cells = bytearray(2 * len(packed))
+        cells[0::2] = packed.translate(cls.HIGH_CELL)
+        cells[1::2] = packed.translate(cls.LOW_CELL)
+        del cells[cols * rows :]
+        return cls(
+            cols, rows, cells.translate(cls.CELL_BOMB), cells.translate(cls.CELL_STATUS)
+        )
+
+    @classmethod
+    def unpack_size(cls, data):
+        """Return the `(cols, rows)` of a packed Grid, without unpacking it."""
+        return cls.HEADER.unpack_from(data)
+
+    @classmethod
+    def packed_offset(cls, index):
+        """Return the offset of the byte holding a cell in a packed Grid."""
+        return cls.HEADER.size + index // 2
+
+    def index(self, key):
+        """Return the flat index for a `(column, row)` key."""
+        try:
+            c, r = key
+        except (ValueError, TypeError):
+            raise TypeError("Invalid cell index.")
+
+        if not (0 <= c < self.cols and 0 <= r < self.rows):
+            raise IndexError("Cell does not exist.")
+
+        return c * self.rows + r
+
+    def key(self, index):
+        """Return the `(column, row)` key for a flat index."""
+        return divmod(index, self.rows)
+
+    def neighbors(self, index):
+        """Yield the flat indexes of the neighbors of a cell."""
+        rows = self.rows
+        c, r = divmod(index, rows)
+        for rr in range(max(r - 1, 0), min(r + 2, rows)):
+            for cc in range(max(c - 1, 0), min(c + 2, self.cols)):
+                if c != cc or r != rr:
+                    yield cc * rows + rr
+
+    def count_adjacent_bombs(self):
+        """
+        Return the number of bombs adjacent to each cell, as bytes.
+
+        The bombs are read as one big integer, one byte per cell, and shifted
+        once per neighbor position. Counts are at most 8, so adding them
+        never carries into the next cell.
+        """
+        rows, size = self.rows, self.size
+        if not size:
+            return b""
+
+        # Bombs that are not in the first row, or not in the last row.
+        not_first, not_last = bytearray(self.bombs), bytearray(self.bombs)
+        not_first[0::rows] = bytes(self.cols)
+        not_last[rows - 1 :: rows] = bytes(self.cols)
+        bombs, not_first, not_last = (
+            int.from_bytes(bombs, "big") for bombs in [self.bombs, not_first, not_last]
+        )
+
+        # Cells count the bombs after them by shifting left, and before them
+        # by shifting right.
+        after = (
+            (not_first << 8)
+            + (bombs << 8 * rows)
+            + (not_first << 8 * (rows + 1))
+            + (not_last << 8 * (rows - 1))
+        )
+        before = (
+            (not_last >> 8)
+            + (bombs >> 8 * rows)
+            + (not_last >> 8 * (rows + 1))
+            + (not_first >> 8 * (rows - 1))
+        )
+        counts = (after & ((1 << 8 * size) - 1)) + before
+        return counts.to_bytes(size, "big")
+
+    def count_cells(self):
+        """Return a tuple of `(bombs, flags, uncovered, uncovered bombs)`."""
+        bombs, status = self.bombs, self.status
+        uncovered_bombs = sum(
+            1 for bomb, code in zip(bombs, status) if bomb and code == self.UNCOVERED
+        )
+        return (
+            sum(bombs),
+            status.count(self.FLAGGED),
+            status.count(self.UNCOVERED),
+            uncovered_bombs,
+        )
+
+    def cells(self, game=None):
+        """Yield tuples of `(key, cell)` in the same order as `Game.cells`."""
+        rows = self.rows
+        for r in range(rows):
+            for c in range(self.cols):
+                yield (c, r), GridCell(self, c * rows + r, game)
+
+
+class GridCell:
+    """Represent a cell in a Grid, with the same interface as Cell."""
+
+    __slots__ = ("_grid", "_index", "_game")
+
+    def __init__(self, grid, index, game=None):
+        """Reference the cell at `index` in `grid`, counted by `game`."""
+        self._grid = grid
+        self._index = index
+        self._game = game
+
+    def __eq__(self, other):
+        """Two GridCells are equal when they reference the same Grid cell."""
+        if not isinstance(other, GridCell):
+            return NotImplemented
+        return self._grid is other._grid and self._index == other._index
+
+    def __hash__(self):
+        """Hash the referenced Grid and index."""
+        return hash((id(self._grid), self._index))
+
+    def __repr__(self):
+        """Return the Grid position of the cell."""
+        return F"GridCell{self._grid.key(self._index)}"
+
+    @property
+    def is_flagged(self):
+        """Return True if the cell is flagged, False otherwise."""
+        return self._grid.status[self._index] == Grid.FLAGGED
+
+    @property
+    def is_covered(self):
+        """Return True if the cell is covered, False otherwise."""
+        return self._grid.status[self._index] != Grid.UNCOVERED
+
+    @property
+    def has_bomb(self):
+        """Return True if the cell has a bomb, False otherwise."""
+        return self._grid.bombs[self._index] == 1
+
+    def flag(self):
+        """Set the cell as flagged."""
+        if self._game is not None:
+            self._game.count_status_change(self, Status.FLAGGED)
+        self._grid.status[self._index] = Grid.FLAGGED
+
+    def unflag(self):
+        """Set the cell as not flagged."""
+        if self.is_flagged:
+            if self._game is not None:
+                self._game.count_status_change(self, None)
+            self._grid.status[self._index] = Grid.COVERED
+
+    def uncover(self):
+        """Set the cell as uncovered."""
+        if self._game is not None:
+            self._game.count_status_change(self, Status.UNCOVERED)
+        self._grid.status[self._index] = Grid.UNCOVERED
@@ -0,0 +1,117 @@
+"""
+Hints for MS Game app.
+
+A hint is a covered cell that can be uncovered without guessing, found by
+`ms_game.solver` from what the player sees. The solver of every game is kept
+in the Django cache named by the `MS_GAME_HINT_CACHE` setting, tagged with
+the version of the game, and the cells uncovered by every saved move are
+added to it. A hint then only propagates the constraints around the cells
+that changed since the previous one.
+
+The solver is only built from the whole board when it is not cached, or it
+missed a move, for example because the move was saved by another process.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Grid
+from .solver import Solver, bits
+
+KEY_PREFIX = "ms_game:hints:"
+
+# Table from the status of a cell to "1" if it is uncovered, or "0".
+_UNCOVERED = bytes(
+    ord("1") if key == Grid.UNCOVERED else ord("0") for key in range(256)
+)
+
+
+def get_cache():
+    """Return the Django cache named by the `MS_GAME_HINT_CACHE` setting."""
+    return caches[settings.MS_GAME_HINT_CACHE]
+
+
+def build_solver(game):
+    """Return a solver with every uncovered cell of a game."""
+    solver = Solver(game.cols, game.rows, game.bombs)
+    if not game.has_board:
+        return solver
+
+    # The status of the last cell is the first digit, the highest bit.
+    status = game.as_grid().status.translate(_UNCOVERED)
+    uncovered = int(status[::-1], 2)
+    adjacent_bombs = game.adjacent_bombs
+    for index in bits(uncovered):
+        solver.uncover(index, adjacent_bombs[index])
+    return solver
+
+
+def get_solver(game):
+    """
+    Return the solver of a game, with everything deduced from its board.
+
+    The cached solver is used if it is up to date, and is cached again if
+    anything was deduced.
+    """
+    cache = get_cache()
+    key = KEY_PREFIX + str(game.pk)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == game.version:
+        solver = cached[1]
+        if solver.deduce():
+            cache.set(key, (game.version, solver))
+    else:
+        solver = build_solver(game)
+        solver.deduce()
+        cache.set(key, (game.version, solver))
+    return solver
+
+
+def update(game, changed):
+    """
+    Add the cells uncovered by a saved move to the cached solver of a game.
+
+    `changed` are the keys of the cells changed by the move. The solver is
+    dropped if it was not up to date with the game before the move.
+    """
+    cache = get_cache()
+    key = KEY_PREFIX + str(game.pk)
+    cached = cache.get(key)
+    if cached is None:
+        return
+    version, solver = cached
+    if version != game.version - 1:
+        cache.delete(key)
+        return
+
+    adjacent_bombs = game.adjacent_bombs
+    rows = game.rows
+    for c, r in changed:
+        cell = game[c, r]
+        if not cell.is_covered and not cell.has_bomb:
+            solver.uncover(c * rows + r, adjacent_bombs[c * rows + r])
+    cache.set(key, (game.version, solver))
+
+
+def hint(game):
+    """
+    Return the key of a covered, unflagged cell that is safe, or None.
+
+    Before the bombs of a `safe_first_click` game are placed, every cell is
+    safe, and the unflagged one closest to the center is returned.
+    """
+    if game.bombs_pending:
+        center_c, center_r = game.cols // 2, game.rows // 2
+        if not game.has_board:
+            return center_c, center_r
+        keys = sorted(
+            ((c, r) for c in range(game.cols) for r in range(game.rows)),
+            key=lambda key: max(abs(key[0] - center_c), abs(key[1] - center_r)),
+        )
+        return next((key for key in keys if not game[key].is_flagged), None)
+
+    solver = get_solver(game)
+    for index in bits(solver.safe_cells):
+        key = divmod(index, game.rows)
+        if not game[key].is_flagged:
+            return key
+    return None
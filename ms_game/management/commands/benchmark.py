@@ -0,0 +1,42 @@
+"""Run the benchmarks defined in `ms_game.benchmarks`."""
+from django.core.management.base import BaseCommand, CommandError
+
+from ms_game.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    """Run one or all of the registered benchmarks and print their results."""
+
+    help = "Run MS Game benchmarks. With no names, run all of them."
+
+    def add_arguments(self, parser):
+        """Accept the names of the benchmarks to run."""
+        parser.add_argument("names", nargs="*", metavar="name")
+
+    def handle(self, *args, names, **options):
+        """Run the requested benchmarks."""
+        unknown = set(names) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(
+                F"Unknown benchmarks: {', '.join(sorted(unknown))}. "
+                F"Available: {', '.join(sorted(BENCHMARKS))}."
+            )
+
+        for name in names or BENCHMARKS:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.write_table(BENCHMARKS[name]())
+            self.stdout.write("")
+
+    def write_table(self, rows):
+        """Write a list of dicts as an aligned table."""
+        if not rows:
+            return
+
+        headers = list(rows[0])
+        widths = {
+            header: max(len(str(header)), *(len(str(row[header])) for row in rows))
+            for header in headers
+        }
+        self.stdout.write("  ".join(str(h).ljust(widths[h]) for h in headers))
+        for row in rows:
+            self.stdout.write("  ".join(str(row[h]).ljust(widths[h]) for h in headers))
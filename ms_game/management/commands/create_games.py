@@ -0,0 +1,46 @@
+"""Create games in bulk, for tournaments and load tests."""
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from ms_game.generators import build_games, create_games
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Create many games with the same configuration for a player."""
+
+    help = "Create games in batches with bulk_create, and report games per second."
+
+    def add_arguments(self, parser):
+        """Accept the player, the number of games and their configuration."""
+        parser.add_argument("player", help="Email of the player, created if needed.")
+        parser.add_argument("count", type=int)
+        parser.add_argument("--cols", type=int, default=10)
+        parser.add_argument("--rows", type=int, default=10)
+        parser.add_argument("--bombs", type=int, default=10)
+        parser.add_argument("--safe-first-click", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--seed", type=int, help="Seed for reproducible boards.")
+
+    def handle(self, *args, player, count, batch_size, seed, **options):
+        """Create the games, reporting the progress after each batch."""
+        cols, rows, bombs = options["cols"], options["rows"], options["bombs"]
+        if not 0 < bombs < cols * rows:
+            raise CommandError("There must be at least one bomb and one empty cell.")
+
+        player, __ = User.objects.get_or_create(username=player.lower())
+        rng = random.Random(seed) if seed is not None else None
+        games = build_games(
+            player, count, cols, rows, bombs, options["safe_first_click"], rng
+        )
+
+        created = 0
+        start = time.perf_counter()
+        for batch in create_games(games, batch_size):
+            created += len(batch)
+            rate = created / (time.perf_counter() - start)
+            self.stdout.write(F"Created {created}/{count} games, {rate:.0f} games/s.")
@@ -0,0 +1,34 @@
+"""Export games as NDJSON or CSV."""
+from django.core.management.base import BaseCommand
+
+from ms_game.export import CHUNK_SIZE, FORMATS, export_rows
+from ms_game.models import Game
+
+
+class Command(BaseCommand):
+    """Write every game, or the games of a player, as NDJSON or CSV."""
+
+    help = "Export games, with their size, bombs, outcome and duration."
+
+    def add_arguments(self, parser):
+        """Accept the format, the output file, and filters."""
+        parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+        parser.add_argument("--output", metavar="FILE", help="Defaults to stdout.")
+        parser.add_argument("--player", help="Only export the games of this email.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, format, output, player, chunk_size, **options):
+        """Write the games, one line at a time."""
+        games = Game.objects.all()
+        if player:
+            games = games.filter(player__username=player.lower())
+
+        to_lines, __ = FORMATS[format]
+        lines = to_lines(export_rows(games, chunk_size))
+        if output is None:
+            for line in lines:
+                self.stdout.write(line)
+            return
+
+        with open(output, "w", newline="") as file:
+            file.writelines(lines)
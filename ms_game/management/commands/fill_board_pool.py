@@ -0,0 +1,52 @@
+"""Keep the pool of ready-made boards filled."""
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ms_game.pool import fill_pool, parse_config, stats
+
+
+class Command(BaseCommand):
+    """Fill the pool of every configuration, once or every few seconds."""
+
+    help = "Generate ready-made boards for the pool, and report its hits and misses."
+
+    def add_arguments(self, parser):
+        """Accept the configurations, the size of their pools and how often to fill."""
+        parser.add_argument(
+            "configs",
+            nargs="*",
+            help="COLSxROWSxBOMBS, the MS_GAME_POOL_CONFIGS setting by default.",
+        )
+        parser.add_argument("--size", type=int, default=settings.MS_GAME_POOL_SIZE)
+        parser.add_argument(
+            "--interval", type=float, help="Keep filling, every so many seconds."
+        )
+        parser.add_argument("--seed", type=int, help="Seed for reproducible boards.")
+
+    def handle(self, *args, configs, size, interval, seed, **options):
+        """Fill the pools, reporting what was added and the counters."""
+        try:
+            configs = [parse_config(config) for config in configs]
+        except ValueError:
+            raise CommandError("Configurations must look like 10x10x15.")
+        configs = configs or settings.MS_GAME_POOL_CONFIGS
+        for cols, rows, bombs in configs:
+            if not 0 < bombs < cols * rows:
+                raise CommandError(
+                    F"{cols}x{rows}x{bombs} needs a bomb and an empty cell."
+                )
+
+        rng = random.Random(seed) if seed is not None else None
+        while True:
+            for cols, rows, bombs in configs:
+                added = fill_pool(cols, rows, bombs, size, rng)
+                self.stdout.write(F"Added {added} {cols}x{rows}x{bombs} boards.")
+            for row in stats():
+                line = "{config}: {size} boards, {hits} hits, {misses} misses."
+                self.stdout.write(line.format(**row))
+            if interval is None:
+                return
+            time.sleep(interval)
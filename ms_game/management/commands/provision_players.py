@@ -0,0 +1,76 @@
+"""Create players in bulk, before their first request."""
+import argparse
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.core.validators import validate_email
+from django.db import connection
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Create the players for a list of emails, skipping existing ones."""
+
+    help = (
+        "Create players from a file with one email per line, or from stdin. "
+        "Existing players are skipped."
+    )
+
+    def add_arguments(self, parser):
+        """Accept the file with the emails, and the batch size."""
+        parser.add_argument("file", nargs="?", type=argparse.FileType("r"), default="-")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, file, batch_size, **options):
+        """Create the players in batches of `batch_size`."""
+        created = invalid = 0
+        batch = {}
+        for line in file:
+            email = line.strip()
+            if not email:
+                continue
+            try:
+                validate_email(email)
+            except ValidationError:
+                self.stderr.write(F"Invalid email: {email}")
+                invalid += 1
+                continue
+
+            batch[email.lower()] = None
+            if len(batch) == batch_size:
+                created += self.create_players(batch)
+                batch = {}
+        created += self.create_players(batch)
+
+        self.stdout.write(
+            F"Created {created} players, skipped {invalid} invalid emails."
+        )
+
+    @staticmethod
+    def create_players(usernames):
+        """
+        Create the players that do not exist yet, and return how many.
+
+        Players created at the same time by other processes are skipped with
+        `INSERT ... ON CONFLICT DO NOTHING`, and only the rows it inserted are
+        counted.
+        """
+        existing = set(
+            User.objects.filter(username__in=usernames).values_list(
+                "username", flat=True
+            )
+        )
+        players = [User(username=name) for name in usernames if name not in existing]
+        inserted = 0
+
+        def count_inserted(execute, sql, params, many, context):
+            nonlocal inserted
+            result = execute(sql, params, many, context)
+            inserted += context["cursor"].rowcount
+            return result
+
+        with connection.execute_wrapper(count_inserted):
+            User.objects.bulk_create(players, ignore_conflicts=True)
+        return inserted
@@ -0,0 +1,56 @@
+# Generated by Django 3.0.8 on 2026-10-18 02:36
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def count_adjacent_bombs(board):
+    """Return the bombs adjacent to each cell of a board, by `c * rows + r`."""
+    cols = len(board)
+    rows = len(board[0]) if cols else 0
+    counts = bytearray(cols * rows)
+    for c, column in enumerate(board):
+        for r, cell_data in enumerate(column):
+            if cell_data.get("bomb", None) is not True:
+                continue
+            for cc in range(max(c - 1, 0), min(c + 2, cols)):
+                for rr in range(max(r - 1, 0), min(r + 2, rows)):
+                    if cc != c or rr != r:
+                        counts[cc * rows + rr] += 1
+    return bytes(counts)
+
+
+def backfill_adjacency(apps, schema_editor):
+    """Compute the adjacent bomb counts of the existing games."""
+    Game = apps.get_model("ms_game", "Game")
+    games = Game.objects.filter(adjacency__isnull=True).only("uuid", "board")
+
+    batch = []
+    for game in games.iterator(chunk_size=BATCH_SIZE):
+        game.adjacency = count_adjacent_bombs(game.board)
+        batch.append(game)
+        if len(batch) == BATCH_SIZE:
+            Game.objects.bulk_update(batch, ["adjacency"])
+            batch = []
+    Game.objects.bulk_update(batch, ["adjacency"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ms_game', '0002_auto_20200722_1712'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='game',
+            options={'ordering': ['-created_at'], 'verbose_name': 'Game', 'verbose_name_plural': 'Games'},
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='adjacency',
+            field=models.BinaryField(null=True, verbose_name='adjacency'),
+        ),
+        migrations.RunPython(backfill_adjacency, migrations.RunPython.noop),
+    ]
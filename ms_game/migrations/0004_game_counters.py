@@ -0,0 +1,68 @@
+# Generated by Django 3.0.8 on 2026-10-18 02:37
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+COUNTERS = ["bomb_count", "flag_count", "uncovered_count", "uncovered_bomb_count"]
+
+
+def count_cells(board):
+    """Return a tuple of `(bombs, flags, uncovered, uncovered bombs)` of a board."""
+    bombs = flags = uncovered = uncovered_bombs = 0
+    for column in board:
+        for cell_data in column:
+            bomb = cell_data.get("bomb", None) is True
+            status = cell_data.get("status", None)
+            bombs += bomb
+            flags += status == "F"
+            uncovered += status == "U"
+            uncovered_bombs += bomb and status == "U"
+    return bombs, flags, uncovered, uncovered_bombs
+
+
+def backfill_counters(apps, schema_editor):
+    """Count bombs, flags and uncovered cells of the existing games."""
+    Game = apps.get_model("ms_game", "Game")
+    games = Game.objects.filter(bomb_count__isnull=True).only("uuid", "board")
+
+    batch = []
+    for game in games.iterator(chunk_size=BATCH_SIZE):
+        counts = count_cells(game.board)
+        for name, value in zip(COUNTERS, counts):
+            setattr(game, name, value)
+        batch.append(game)
+        if len(batch) == BATCH_SIZE:
+            Game.objects.bulk_update(batch, COUNTERS)
+            batch = []
+    Game.objects.bulk_update(batch, COUNTERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ms_game', '0003_game_adjacency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='bomb_count',
+            field=models.PositiveIntegerField(null=True, verbose_name='bombs'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='flag_count',
+            field=models.PositiveIntegerField(null=True, verbose_name='flags'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='uncovered_bomb_count',
+            field=models.PositiveIntegerField(null=True, verbose_name='uncovered bombs'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='uncovered_count',
+            field=models.PositiveIntegerField(null=True, verbose_name='uncovered cells'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
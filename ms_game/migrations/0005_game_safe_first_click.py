@@ -0,0 +1,37 @@
+# Generated by Django 3.0.8 on 2026-10-18 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ms_game', '0004_game_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='col_count',
+            field=models.PositiveSmallIntegerField(null=True, verbose_name='columns'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='row_count',
+            field=models.PositiveSmallIntegerField(null=True, verbose_name='rows'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='safe_first_click',
+            field=models.BooleanField(default=False, verbose_name='safe first click'),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE ms_game_game
+            SET col_count = jsonb_array_length(board),
+                row_count = jsonb_array_length(board -> 0)
+            WHERE col_count IS NULL AND jsonb_array_length(board) > 0
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
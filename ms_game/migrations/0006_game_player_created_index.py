@@ -0,0 +1,17 @@
+# Generated by Django 3.0.8 on 2026-10-18 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ms_game', '0005_game_safe_first_click'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['player', '-created_at', '-uuid'], name='ms_game_player_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.8 on 2026-10-18 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ms_game', '0006_game_player_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='version'),
+        ),
+    ]
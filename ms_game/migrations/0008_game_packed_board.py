@@ -0,0 +1,110 @@
+# Generated by Django 3.0.8 on 2026-10-18 03:20
+
+import struct
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+# Packed boards are a header with the number of columns and rows, then 4 bits
+# per cell, `status | bomb << 2`, the first cell of each byte in the high bits.
+HEADER = struct.Struct(">HH")
+STATUS_CODES = {"F": 1, "U": 2}
+STATUS_VALUES = {code: value for value, code in STATUS_CODES.items()}
+
+
+def pack(board):
+    """Return a JSON board packed as bytes."""
+    cols = len(board)
+    rows = len(board[0]) if cols else 0
+    cells = [
+        STATUS_CODES.get(cell_data.get("status", None), 0)
+        | (cell_data.get("bomb", None) is True) << 2
+        for column in board
+        for cell_data in column
+    ]
+    if len(cells) % 2:
+        cells.append(0)
+    packed = bytes(high << 4 | low for high, low in zip(cells[0::2], cells[1::2]))
+    return HEADER.pack(cols, rows) + packed
+
+
+def unpack(data):
+    """Return the JSON board of bytes returned by `pack`."""
+    data = bytes(data)
+    cols, rows = HEADER.unpack_from(data)
+    cells = []
+    for byte in data[HEADER.size :]:
+        cells += [byte >> 4, byte & 0b1111]
+
+    board = []
+    for c in range(cols):
+        column = []
+        for cell in cells[c * rows : (c + 1) * rows]:
+            cell_data = {}
+            if cell >> 2 & 1:
+                cell_data["bomb"] = True
+            if cell & 0b11:
+                cell_data["status"] = STATUS_VALUES[cell & 0b11]
+            column.append(cell_data)
+        board.append(column)
+    return board
+
+
+def pack_boards(apps, schema_editor):
+    """Pack the JSON boards of the existing games."""
+    Game = apps.get_model("ms_game", "Game")
+    games = Game.objects.filter(packed_board__isnull=True, json_board__isnull=False)
+    games = games.only("uuid", "json_board")
+
+    batch = []
+    for game in games.iterator(chunk_size=BATCH_SIZE):
+        game.packed_board = pack(game.json_board)
+        game.json_board = None
+        batch.append(game)
+        if len(batch) == BATCH_SIZE:
+            Game.objects.bulk_update(batch, ["packed_board", "json_board"])
+            batch = []
+    Game.objects.bulk_update(batch, ["packed_board", "json_board"])
+
+
+def unpack_boards(apps, schema_editor):
+    """Write the packed boards back as JSON boards."""
+    Game = apps.get_model("ms_game", "Game")
+    games = Game.objects.filter(packed_board__isnull=False)
+    games = games.only("uuid", "packed_board")
+
+    batch = []
+    for game in games.iterator(chunk_size=BATCH_SIZE):
+        game.json_board = unpack(game.packed_board)
+        batch.append(game)
+        if len(batch) == BATCH_SIZE:
+            Game.objects.bulk_update(batch, ["json_board"])
+            batch = []
+    Game.objects.bulk_update(batch, ["json_board"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ms_game', '0007_game_version'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='game',
+            old_name='board',
+            new_name='json_board',
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='json_board',
+            field=django.contrib.postgres.fields.jsonb.JSONField(null=True, verbose_name='JSON board'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='packed_board',
+            field=models.BinaryField(null=True, verbose_name='packed board'),
+        ),
+        migrations.RunPython(pack_boards, unpack_boards),
+    ]
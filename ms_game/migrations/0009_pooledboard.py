@@ -0,0 +1,33 @@
+# Generated by Django 3.0.8 on 2026-10-18 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ms_game', '0008_game_packed_board'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PooledBoard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('packed_board', models.BinaryField(verbose_name='packed board')),
+                ('adjacency', models.BinaryField(verbose_name='adjacency')),
+                ('col_count', models.PositiveSmallIntegerField(verbose_name='columns')),
+                ('row_count', models.PositiveSmallIntegerField(verbose_name='rows')),
+                ('bomb_count', models.PositiveIntegerField(verbose_name='bombs')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+            ],
+            options={
+                'verbose_name': 'Pooled board',
+                'verbose_name_plural': 'Pooled boards',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pooledboard',
+            index=models.Index(fields=['col_count', 'row_count', 'bomb_count'], name='ms_game_pooled_config_idx'),
+        ),
+    ]
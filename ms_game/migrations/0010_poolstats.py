@@ -0,0 +1,32 @@
+# Generated by Django 3.0.8 on 2026-10-18 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ms_game', '0009_pooledboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PoolStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('col_count', models.PositiveSmallIntegerField(verbose_name='columns')),
+                ('row_count', models.PositiveSmallIntegerField(verbose_name='rows')),
+                ('bomb_count', models.PositiveIntegerField(verbose_name='bombs')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='hits')),
+                ('misses', models.PositiveIntegerField(default=0, verbose_name='misses')),
+            ],
+            options={
+                'verbose_name': 'Pool stats',
+                'verbose_name_plural': 'Pool stats',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='poolstats',
+            constraint=models.UniqueConstraint(fields=('col_count', 'row_count', 'bomb_count'), name='ms_game_pool_stats_config_uniq'),
+        ),
+    ]
@@ -1,20 +1,62 @@
 """Models for MS Api app."""
 import uuid
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.postgres.fields import JSONField
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from .grid import Grid, GridCell, Status
+
 User = get_user_model()
 
 
-class Status(models.TextChoices):
-    """Define possible status for a cell."""
+class BoardEngine(models.TextChoices):
+    """Define the in-memory representations available for a board."""
+
+    JSON = "json"
+    COMPACT = "compact"
+
+
+class BytesSplice(models.Func):
+    """Replace the bytes of a binary expression from `start`, 0 based, with `data`."""
+
+    template = "(%(expressions)s)"
+    arg_joiner = " || "
+    output_field = models.BinaryField()
+
+    def __init__(self, expression, start, data):
+        """Build the expression from the bytes before and after `data`."""
+        end = start + len(data)
+        super().__init__(
+            models.Func(expression, 1, start, function="substr"),
+            models.Value(data),
+            models.Func(expression, end + 1, function="substr"),
+        )
 
-    FLAGGED = "F"
-    UNCOVERED = "U"
+
+class GameQuerySet(models.QuerySet):
+    """Filter games by their stored state."""
+
+    def finished(self):
+        """Return the games that have finished."""
+        return self.filter(finished_at__isnull=False)
+
+    def in_progress(self):
+        """Return the games that have not finished."""
+        return self.filter(finished_at__isnull=True)
+
+    def won(self):
+        """Return the finished games in which no bomb was uncovered."""
+        return self.finished().filter(uncovered_bomb_count=0)
+
+    def not_won(self):
+        """Return the games in progress and the ones that were lost."""
+        return self.filter(
+            models.Q(finished_at__isnull=True) | models.Q(uncovered_bomb_count__gt=0)
+        )
 
 
 class Game(models.Model):
@@ -27,45 +69,227 @@ class Game(models.Model):
     A Game is Subscriptable, and the cells can be retrieved using the
     tuple of (column, row) for the cell:
         - `board[1, 2]`
+
+    Boards are stored packed in `packed_board` (see `Grid.pack`), and only
+    decoded the first time they are needed. Games stored before the packed
+    format keep their board in `json_board` until they are saved.
+
+    By default, the board is decoded into nested lists of cell dicts. When
+    the `MS_GAME_BOARD_ENGINE` setting is "compact", it is decoded into a
+    Grid instead, and cells are views over it.
+
+    The number of bombs, flags and uncovered cells are stored as columns.
+    They are counted from the board the first time they are needed, and
+    then kept up to date by the cells as they change.
+
+    Games created with `safe_first_click` are stored without a board. The
+    board is built on the first move, and bombs are placed on the first
+    uncover, away from the uncovered cell.
+
+    Moves are saved with `save_if_unchanged`, which only writes the game if
+    its `version` has not changed since it was loaded. A move that loses the
+    race can then be retried on the fresh game, instead of overwriting it.
+    `save` increases the `version` too, so moves loaded before it are retried.
     """
 
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4)
-    board = JSONField(_("Board"))
+    packed_board = models.BinaryField(_("packed board"), null=True)
+    json_board = JSONField(_("JSON board"), null=True)
+    adjacency = models.BinaryField(_("adjacency"), null=True)
     player = models.ForeignKey(User, verbose_name=_("Player"), on_delete=models.CASCADE)
     created_at = models.DateTimeField(_("created"), auto_now_add=True)
     finished_at = models.DateTimeField(_("finished"), null=True)
-
+    bomb_count = models.PositiveIntegerField(_("bombs"), null=True)
+    flag_count = models.PositiveIntegerField(_("flags"), null=True)
+    uncovered_count = models.PositiveIntegerField(_("uncovered cells"), null=True)
+    uncovered_bomb_count = models.PositiveIntegerField(_("uncovered bombs"), null=True)
+    col_count = models.PositiveSmallIntegerField(_("columns"), null=True)
+    row_count = models.PositiveSmallIntegerField(_("rows"), null=True)
+    safe_first_click = models.BooleanField(_("safe first click"), default=False)
+    version = models.PositiveIntegerField(_("version"), default=0)
+
+    objects = GameQuerySet.as_manager()
+
+    # Fields with the board, and data derived from it.
+    board_fields = ["packed_board", "json_board", "adjacency"]
+    # Fields not written by `save_if_unchanged`, which increases `version` itself.
+    immutable_fields = {"uuid", "player", "created_at", "version"}
+    # Fields changed by moves on a board that already has its bombs.
+    move_fields = [
+        "packed_board",
+        "json_board",
+        "finished_at",
+        "bomb_count",
+        "flag_count",
+        "uncovered_count",
+        "uncovered_bomb_count",
+    ]
+
+    _board = None
     _cells = None
+    _grid = None
+
+    @property
+    def board(self):
+        """
+        Return the board as a list of columns of cell dicts.
+
+        With the compact engine, this is a copy of the Grid.
+        """
+        if self._grid is not None:
+            return self._grid.to_board()
+        if self._board is None:
+            if self.packed_board is not None:
+                self._board = Grid.unpack(self.packed_board).to_board()
+            else:
+                self._board = self.json_board if self.json_board is not None else []
+        return self._board
+
+    @board.setter
+    def board(self, board):
+        """Replace the board with a list of columns of cell dicts."""
+        self._board = board
+        self._cells = None
+        self._grid = None
+
+    @property
+    def grid(self):
+        """Return the Grid for the board, or None when using the JSON engine."""
+        if self._grid is None and settings.MS_GAME_BOARD_ENGINE == BoardEngine.COMPACT:
+            self._grid = self.as_grid()
+            self._board = None
+        return self._grid
+
+    def as_grid(self):
+        """Return the Grid for the board, new unless using the compact engine."""
+        if self._grid is not None:
+            return self._grid
+        if self._board is not None:
+            return Grid.from_board(self._board)
+        if self.packed_board is not None:
+            return Grid.unpack(self.packed_board)
+        return Grid.from_board(self.json_board or [])
+
+    @property
+    def has_board(self):
+        """Return False for a `safe_first_click` game before its first move."""
+        if self._grid is not None:
+            return bool(self._grid.size)
+        if self._board is None and self.packed_board is not None:
+            cols, rows = Grid.unpack_size(self.packed_board)
+            return bool(cols * rows)
+        return bool(self.board)
+
+    @property
+    def adjacent_bombs(self):
+        """
+        Return the number of bombs adjacent to each cell, indexed by `c * rows + r`.
+
+        Bombs do not move once a board is created, so the counts are computed
+        the first time they are needed and stored in `adjacency`.
+        """
+        if not self.adjacency:
+            grid = self.as_grid()
+            self.adjacency = grid.count_adjacent_bombs()
+        elif isinstance(self.adjacency, memoryview):
+            self.adjacency = self.adjacency.tobytes()
+        return self.adjacency
 
     @property
     def cols(self):
         """Return the number of columns of the board."""
+        if self.col_count is not None:
+            return self.col_count
+        grid = self.grid
+        if grid is not None:
+            return grid.cols
         return len(self.board)
 
     @property
     def rows(self):
         """Return the number of rows of the board."""
+        if self.row_count is not None:
+            return self.row_count
+        grid = self.grid
+        if grid is not None:
+            return grid.rows
         return len(self.board[0]) if self.cols else 0
 
+    @property
+    def bombs_pending(self):
+        """Return True while a `safe_first_click` game waits for its first uncover."""
+        return self.safe_first_click and not self.uncovered
+
+    def set_grid(self, grid):
+        """Replace the board, and its adjacent bomb counts, with a Grid."""
+        self.adjacency = grid.count_adjacent_bombs()
+        if settings.MS_GAME_BOARD_ENGINE == BoardEngine.COMPACT:
+            self.board = None
+            self._grid = grid
+        else:
+            self.board = grid.to_board()
+
     @property
     def size(self):
         """Return the number of cells in the board."""
         return self.rows * self.cols
 
+    def count_cells(self):
+        """Count bombs, flags and uncovered cells from the board."""
+        grid = self.as_grid()
+        (
+            self.bomb_count,
+            self.flag_count,
+            self.uncovered_count,
+            self.uncovered_bomb_count,
+        ) = grid.count_cells()
+
+    def _get_counter(self, name):
+        if self.bomb_count is None:
+            self.count_cells()
+        return getattr(self, name)
+
     @property
     def bombs(self):
         """Return the number of bombs in the board."""
-        return sum(1 for _, cell in self.cells if cell.has_bomb)
+        return self._get_counter("bomb_count")
+
+    @property
+    def flags(self):
+        """Return the number of flagged cells in the board."""
+        return self._get_counter("flag_count")
 
     @property
     def uncovered(self):
         """Return the number of uncovered cells in the board."""
-        return sum(1 for _, cell in self.cells if not cell.is_covered)
+        return self._get_counter("uncovered_count")
 
     @property
     def uncovered_bombs(self):
         """Return the number of uncovered bombs in the board."""
-        return sum(1 for _, cell in self.cells if not cell.is_covered and cell.has_bomb)
+        return self._get_counter("uncovered_bomb_count")
+
+    def count_status_change(self, cell, status):
+        """
+        Update the counters for a cell that is changing to `status`.
+
+        Counters that have not been counted yet are left alone; they will be
+        counted from the board when needed.
+        """
+        if self.bomb_count is None:
+            return
+
+        if cell.is_flagged:
+            self.flag_count -= 1
+        elif not cell.is_covered:
+            self.uncovered_count -= 1
+            self.uncovered_bomb_count -= cell.has_bomb
+
+        if status == Status.FLAGGED:
+            self.flag_count += 1
+        elif status == Status.UNCOVERED:
+            self.uncovered_count += 1
+            self.uncovered_bomb_count += cell.has_bomb
 
     @property
     def finished(self):
@@ -88,6 +312,10 @@ class Game(models.Model):
 
     def __getitem__(self, key):
         """Return the requested game cell."""
+        grid = self.grid
+        if grid is not None:
+            return GridCell(grid, grid.index(key), self)
+
         try:
             c, r = key
         except (ValueError, TypeError):
@@ -105,16 +333,38 @@ class Game(models.Model):
             self._cells = {}
 
         if key not in self._cells:
-            self._cells[key] = Cell(cell_data)
+            self._cells[key] = Cell(cell_data, self)
 
         return self._cells[key]
 
+    def cell_at(self, index):
+        """Return the cell at a flat `c * rows + r` index, without bound checks."""
+        grid = self.grid
+        if grid is not None:
+            return GridCell(grid, index, self)
+
+        if self._cells is None:
+            self._cells = {}
+
+        key = divmod(index, len(self.board[0]))
+        cell = self._cells.get(key)
+        if cell is None:
+            c, r = key
+            cell = self._cells[key] = Cell(self.board[c][r], self)
+        return cell
+
     class Meta:
         """Define properties for Game model."""
 
         verbose_name = "Game"
         verbose_name_plural = "Games"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["player", "-created_at", "-uuid"],
+                name="ms_game_player_created_idx",
+            )
+        ]
 
     def _get_neighbors_keys(self, c, r):
         for rr in range(r - 1, r + 2):
@@ -133,20 +383,166 @@ class Game(models.Model):
     @property
     def cells(self):
         """Yield all the cells for the current game."""
+        grid = self.grid
+        if grid is not None:
+            yield from grid.cells(self)
+            return
+
         for r in range(0, self.rows):
             for c in range(0, self.cols):
                 yield (c, r), self[c, r]
 
+    def sync_board(self):
+        """Pack the board in memory, if it was decoded, into `packed_board`."""
+        if self._grid is None and self._board is None:
+            return
+        self.packed_board = self.as_grid().pack()
+        self.json_board = None
+
+    def refresh_from_db(self, using=None, fields=None):
+        """Drop the board, cells and Grid decoded from the previous board."""
+        super().refresh_from_db(using, fields)
+        if fields is None or set(fields) & set(self.board_fields):
+            self._board = None
+            self._cells = None
+            self._grid = None
+
+    def save(self, *args, update_fields=None, **kwargs):
+        """
+        Pack the board, and increase `version`, before saving.
+
+        The version is increased by the database, so a move loaded before
+        the save is not saved over it by `save_if_unchanged`.
+        """
+        self.sync_board()
+        if self._state.adding:
+            super().save(*args, update_fields=update_fields, **kwargs)
+            return
+
+        if update_fields is not None:
+            update_fields = {*update_fields, "version"}
+        self.version = models.F("version") + 1
+        super().save(*args, update_fields=update_fields, **kwargs)
+        self.refresh_from_db(fields=["version"])
+
+    def save_if_unchanged(self, cells=None):
+        """
+        Save the game, only if it has not been saved since it was loaded.
+
+        The write and the check are a single UPDATE, conditioned on the
+        loaded `version`. Return True if the game was saved.
+
+        `cells` are the keys of the cells changed since the game was loaded.
+        When given, only the `move_fields` are written, and the packed board
+        is written with `BytesSplice`, replacing the range of bytes that holds
+        those cells. A board that changed size, like the one built by the
+        first move of a safe first click game, is written whole.
+        """
+        if cells is None:
+            fields = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if field.name not in self.immutable_fields
+            ]
+        else:
+            fields = self.move_fields
+
+        stored = self.packed_board
+        self.sync_board()
+        values = {name: getattr(self, name) for name in fields}
+        if cells and stored is not None and len(stored) == len(self.packed_board):
+            values["packed_board"] = self._splice_board(cells)
+
+        saved = Game.objects.filter(pk=self.pk, version=self.version).update(
+            version=models.F("version") + 1, **values
+        )
+        if saved:
+            self.version += 1
+        return bool(saved)
+
+    def _splice_board(self, cells):
+        """Return an expression writing the packed bytes of `cells` to the board."""
+        rows = self.rows
+        offsets = [Grid.packed_offset(c * rows + r) for c, r in cells]
+        start, end = min(offsets), max(offsets) + 1
+        return BytesSplice(
+            models.F("packed_board"), start, bytes(self.packed_board[start:end])
+        )
+
     def __str__(self):
         """Return a useful? string representation of a game."""
         return F"{self.cols} x {self.rows} - {self.uuid}"
 
 
+class PooledBoard(models.Model):
+    """
+    Represent a ready-made board, waiting in the pool for a new game.
+
+    Boards are stored packed, with their adjacent bomb counts, exactly as a
+    Game stores them (see `ms_game.pool`).
+    """
+
+    packed_board = models.BinaryField(_("packed board"))
+    adjacency = models.BinaryField(_("adjacency"))
+    col_count = models.PositiveSmallIntegerField(_("columns"))
+    row_count = models.PositiveSmallIntegerField(_("rows"))
+    bomb_count = models.PositiveIntegerField(_("bombs"))
+    created_at = models.DateTimeField(_("created"), auto_now_add=True)
+
+    class Meta:
+        """Define properties for PooledBoard model."""
+
+        verbose_name = "Pooled board"
+        verbose_name_plural = "Pooled boards"
+        indexes = [
+            models.Index(
+                fields=["col_count", "row_count", "bomb_count"],
+                name="ms_game_pooled_config_idx",
+            )
+        ]
+
+    def __str__(self):
+        """Return the configuration of the board."""
+        return F"{self.col_count} x {self.row_count} - {self.bomb_count} bombs"
+
+
+class PoolStats(models.Model):
+    """
+    Count the games that found a board in the pool of a configuration or not.
+
+    Kept in the database, so every process adds to the same counters (see
+    `ms_game.pool`).
+    """
+
+    col_count = models.PositiveSmallIntegerField(_("columns"))
+    row_count = models.PositiveSmallIntegerField(_("rows"))
+    bomb_count = models.PositiveIntegerField(_("bombs"))
+    hits = models.PositiveIntegerField(_("hits"), default=0)
+    misses = models.PositiveIntegerField(_("misses"), default=0)
+
+    class Meta:
+        """Define properties for PoolStats model."""
+
+        verbose_name = "Pool stats"
+        verbose_name_plural = "Pool stats"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["col_count", "row_count", "bomb_count"],
+                name="ms_game_pool_stats_config_uniq",
+            )
+        ]
+
+    def __str__(self):
+        """Return the configuration counted."""
+        return F"{self.col_count} x {self.row_count} - {self.bomb_count} bombs"
+
+
 @dataclass
 class Cell:
     """Represent a cell in a Game."""
 
     _data: dict
+    _game: "Game" = field(default=None, compare=False, repr=False)
 
     @property
     def is_flagged(self):
@@ -165,13 +561,19 @@ class Cell:
 
     def flag(self):
         """Set the cell as flagged."""
+        if self._game is not None:
+            self._game.count_status_change(self, Status.FLAGGED)
         self._data["status"] = Status.FLAGGED.value
 
     def unflag(self):
         """Set the cell as not flagged."""
         if self.is_flagged:
+            if self._game is not None:
+                self._game.count_status_change(self, None)
             del self._data["status"]
 
     def uncover(self):
         """Set the cell as uncovered."""
+        if self._game is not None:
+            self._game.count_status_change(self, Status.UNCOVERED)
         self._data["status"] = Status.UNCOVERED.value
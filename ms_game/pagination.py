@@ -0,0 +1,133 @@
+"""Define pagination classes compatible with DRF."""
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from uuid import UUID
+
+from django.db import connection
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class GameKeysetPagination(BasePagination):
+    """
+    Paginate games by `(created_at, uuid)`, newest first.
+
+    Pages start after the last key of the previous page, instead of at an
+    OFFSET, so every page costs the same index range scan. The body is the
+    plain list of games, and the URL of the next page is given in a `Link`
+    header.
+    """
+
+    page_size = 15
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering = ("-created_at", "-uuid")
+    invalid_cursor_message = _("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return the page of games after the requested cursor."""
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.extra(
+                where=[self.after_cursor_sql(queryset.model)], params=cursor
+            )
+
+        page = list(queryset.order_by(*self.ordering)[: page_size + 1])
+        # The last game of the page is the cursor for the next one.
+        self.last_game = page[page_size - 1] if len(page) > page_size else None
+        return page[:page_size]
+
+    @staticmethod
+    def after_cursor_sql(model):
+        """
+        Return the condition for the games after a cursor, newest first.
+
+        It compares `(created_at, uuid)` as a row value, which Postgres uses
+        as the start of the index range scan. The same condition written
+        with OR only filters the rows the scan finds, from the newest game.
+        """
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = [
+            F"{table}.{connection.ops.quote_name(model._meta.get_field(name).column)}"
+            for name in ["created_at", "uuid"]
+        ]
+        return "({}, {}) < (%s, %s)".format(*columns)
+
+    def get_paginated_response(self, data):
+        """Return the games, with a `Link` to the next page if there is one."""
+        headers = {}
+        next_link = self.get_next_link()
+        if next_link:
+            headers["Link"] = F'<{next_link}>; rel="next"'
+        return Response(data, headers=headers)
+
+    def get_page_size(self, request):
+        """Return the requested page size, limited to `max_page_size`."""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        """Return the URL of the next page, or None if this is the last one."""
+        if self.last_game is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.last_game)
+        )
+
+    @staticmethod
+    def encode_cursor(game):
+        """Return an opaque cursor for the key of a game."""
+        key = F"{game.created_at.isoformat()}|{game.uuid}"
+        return urlsafe_b64encode(key.encode()).decode()
+
+    def decode_cursor(self, request):
+        """Return the `(created_at, uuid)` key of the requested cursor, if any."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            created_at, uuid = urlsafe_b64decode(encoded.encode()).decode().split("|")
+            created_at = parse_datetime(created_at)
+            uuid = UUID(uuid)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            created_at = None
+
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return created_at, uuid
+
+    def get_schema_fields(self, view):
+        """Describe the query parameters for API documentation."""
+        return [
+            coreapi.Field(
+                name=self.cursor_query_param,
+                required=False,
+                location="query",
+                schema=coreschema.String(
+                    description="The pagination cursor value, from the Link header."
+                ),
+            ),
+            coreapi.Field(
+                name=self.page_size_query_param,
+                required=False,
+                location="query",
+                schema=coreschema.Integer(
+                    description=F"Number of games per page, up to {self.max_page_size}."
+                ),
+            ),
+        ]
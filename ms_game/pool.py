@@ -0,0 +1,113 @@
+"""
+Board pool for MS Game app.
+
+Boards for the configurations in the `MS_GAME_POOL_CONFIGS` setting are
+generated ahead of time by the `fill_board_pool` command, and stored as
+`PooledBoard` rows. A new game claims one with `SELECT ... FOR UPDATE SKIP
+LOCKED`, so concurrent requests never wait for, or share, a board. Only
+when the pool of its configuration is empty is the board generated inline.
+
+Hits and misses are counted per configuration in `PoolStats` rows, shared
+by every process. They are counted once the game is committed, outside its
+transaction, so the row of a configuration is only locked for the increment,
+and concurrent new games do not wait for each other on it.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+
+from .generators import generate_grid
+from .models import PooledBoard, PoolStats
+
+
+def parse_config(config):
+    """Return the `(cols, rows, bombs)` of a `COLSxROWSxBOMBS` string."""
+    cols, rows, bombs = (int(value) for value in config.lower().split("x"))
+    return cols, rows, bombs
+
+
+def claim_board(cols, rows, bombs):
+    """
+    Remove a board with the configuration from the pool, and return it.
+
+    Return None when the configuration is not pooled, or its pool is empty.
+    Call it in a transaction, so the board goes back to the pool if the game
+    is not saved.
+    """
+    config = (cols, rows, bombs)
+    if config not in settings.MS_GAME_POOL_CONFIGS:
+        return None
+
+    with transaction.atomic(savepoint=False):
+        board = (
+            PooledBoard.objects.select_for_update(skip_locked=True)
+            .filter(col_count=cols, row_count=rows, bomb_count=bombs)
+            .first()
+        )
+        if board is not None:
+            PooledBoard.objects.filter(pk=board.pk).delete()
+
+    counter = "misses" if board is None else "hits"
+    transaction.on_commit(lambda: _count(config, counter))
+    return board
+
+
+def fill_pool(cols, rows, bombs, size, rng=None, batch_size=500):
+    """Add boards to the pool of a configuration, up to `size`, and count them."""
+    pooled = PooledBoard.objects.filter(
+        col_count=cols, row_count=rows, bomb_count=bombs
+    ).count()
+
+    boards = []
+    for _ in range(size - pooled):
+        grid = generate_grid(cols, rows, bombs, rng)
+        boards.append(
+            PooledBoard(
+                packed_board=grid.pack(),
+                adjacency=grid.count_adjacent_bombs(),
+                col_count=cols,
+                row_count=rows,
+                bomb_count=bombs,
+            )
+        )
+    PooledBoard.objects.bulk_create(boards, batch_size)
+    return len(boards)
+
+
+def stats():
+    """Return the size, hits and misses of the pool of every configuration."""
+    sizes = {
+        (cols, rows, bombs): size
+        for cols, rows, bombs, size in PooledBoard.objects.values_list(
+            "col_count", "row_count", "bomb_count"
+        ).annotate(size=Count("id"))
+    }
+    counters = {
+        (cols, rows, bombs): (hits, misses)
+        for cols, rows, bombs, hits, misses in PoolStats.objects.values_list(
+            "col_count", "row_count", "bomb_count", "hits", "misses"
+        )
+    }
+    configs = sorted({*settings.MS_GAME_POOL_CONFIGS, *sizes, *counters})
+
+    return [
+        {
+            "config": "{}x{}x{}".format(*config),
+            "size": sizes.get(config, 0),
+            "hits": counters.get(config, (0, 0))[0],
+            "misses": counters.get(config, (0, 0))[1],
+        }
+        for config in configs
+    ]
+
+
+def _count(config, counter):
+    cols, rows, bombs = config
+    config_stats = PoolStats.objects.filter(
+        col_count=cols, row_count=rows, bomb_count=bombs
+    )
+    if not config_stats.update(**{counter: F(counter) + 1}):
+        PoolStats.objects.get_or_create(
+            col_count=cols, row_count=rows, bomb_count=bombs
+        )
+        config_stats.update(**{counter: F(counter) + 1})
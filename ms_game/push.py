@@ -0,0 +1,296 @@
+"""
+Push game updates for MS Game app.
+
+The delta of every saved move is published to the broker named by the
+`MS_GAME_PUSH_BROKER` setting, and pushed to every client subscribed to
+the game, as Server-Sent Events or over a WebSocket. Subscriptions are
+served by `PushRouter`, an ASGI app in front of Django, so they never hold
+a worker thread.
+
+`InMemoryBroker` only reaches the clients connected to the same process.
+`PostgresBroker` broadcasts through `LISTEN/NOTIFY`, and reaches every
+process connected to the same database.
+
+Clients subscribe with a signed token for the game, from
+`games/{uuid}/push/`, because neither `EventSource` nor WebSockets can send
+an `Authorization` header. Subscriptions are served below the path in the
+`MS_GAME_PUSH_PREFIX` setting, inside the root path of the application.
+
+Messages are published once the transaction that saved the move commits,
+so moves that are rolled back are never pushed.
+"""
+import asyncio
+import json
+import re
+import threading
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs
+
+import psycopg2
+from django.conf import settings
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils.module_loading import import_string
+
+TOKEN_SALT = "ms_game.push"
+# Seconds a token can be used to subscribe, after it is issued.
+TOKEN_MAX_AGE = 60 * 60
+# Seconds between comments sent to keep idle event streams open.
+KEEP_ALIVE_SECONDS = 15
+# Yielded by `PushRouter.messages` instead of a message, to keep alive.
+KEEP_ALIVE = object()
+# Set in the WSGI environ of the requests served next to `PushRouter`.
+ENVIRON_KEY = "ms_game.push"
+
+
+class InMemoryBroker:
+    """Deliver messages to the subscribers in the current process."""
+
+    def __init__(self):
+        """Prepare the subscribers, as `(loop, queue)` pairs by game uuid."""
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, game_uuid, data):
+        """Send `data` to the subscribers of a game, from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(game_uuid, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, data)
+            except RuntimeError:
+                # The event loop was closed.
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, game_uuid):
+        """Yield a queue with the messages published for a game."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(game_uuid, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers[game_uuid].discard(subscriber)
+                if not self._subscribers[game_uuid]:
+                    del self._subscribers[game_uuid]
+
+
+class PostgresBroker(InMemoryBroker):
+    """
+    Deliver messages to the subscribers in every process, with Postgres.
+
+    Messages are sent with `NOTIFY` on the default database, and every
+    process with subscribers listens on its own connection. Notifications
+    are limited to 8000 bytes, so bigger messages are sent as `None`,
+    which asks the clients to reload the game.
+    """
+
+    channel = "ms_game_push"
+    max_payload = 7999
+
+    def __init__(self):
+        """Prepare the connection that will listen for notifications."""
+        super().__init__()
+        self._listener = None
+        self._loop = None
+
+    def publish(self, game_uuid, data):
+        """Notify every process of a message for a game."""
+        payload = json.dumps({"game": game_uuid, "data": data})
+        if len(payload.encode()) > self.max_payload:
+            payload = json.dumps({"game": game_uuid, "data": None})
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, payload])
+
+    @asynccontextmanager
+    async def subscribe(self, game_uuid):
+        """Yield a queue with the messages published for a game."""
+        self._listen(asyncio.get_running_loop())
+        async with super().subscribe(game_uuid) as queue:
+            yield queue
+
+    def close(self):
+        """Stop listening for notifications."""
+        if self._listener is not None and not self._listener.closed:
+            if not self._loop.is_closed():
+                self._loop.remove_reader(self._listener.fileno())
+            self._listener.close()
+
+    def _listen(self, loop):
+        if self._loop is loop and not self._listener.closed:
+            return
+        self.close()
+
+        params = connections[DEFAULT_DB_ALIAS].get_connection_params()
+        self._listener = psycopg2.connect(**params)
+        self._listener.autocommit = True
+        with self._listener.cursor() as cursor:
+            cursor.execute(F"LISTEN {self.channel}")
+        loop.add_reader(self._listener.fileno(), self._notified)
+        self._loop = loop
+
+    def _notified(self):
+        self._listener.poll()
+        while self._listener.notifies:
+            message = json.loads(self._listener.notifies.pop(0).payload)
+            super().publish(message["game"], message["data"])
+
+
+_brokers = {}
+
+
+def get_broker():
+    """Return the broker named by the `MS_GAME_PUSH_BROKER` setting."""
+    path = settings.MS_GAME_PUSH_BROKER
+    if path not in _brokers:
+        _brokers[path] = import_string(path)()
+    return _brokers[path]
+
+
+def publish(game, data):
+    """Push `data` to every client subscribed to a game, on commit."""
+    game_uuid = str(game.pk)
+    transaction.on_commit(lambda: get_broker().publish(game_uuid, data))
+
+
+def subscription_path(game_uuid, channel):
+    """Return the path to subscribe to a game, below the root path."""
+    return F"{settings.MS_GAME_PUSH_PREFIX}{game_uuid}/{channel}/"
+
+
+def subscription_token(game):
+    """Return a signed token to subscribe to a game."""
+    return signing.dumps(str(game.pk), salt=TOKEN_SALT)
+
+
+def check_token(token, game_uuid):
+    """Return True if `token` was issued for the game, and has not expired."""
+    try:
+        signed_uuid = signing.loads(token, salt=TOKEN_SALT, max_age=TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return signed_uuid == game_uuid
+
+
+def subscribable(wsgi_application):
+    """
+    Mark the requests to a WSGI application served next to `PushRouter`.
+
+    Only then can clients subscribe, so `games/{uuid}/push/` checks
+    `ENVIRON_KEY` before returning the URLs.
+    """
+
+    def subscribable_application(environ, start_response):
+        environ[ENVIRON_KEY] = True
+        return wsgi_application(environ, start_response)
+
+    return subscribable_application
+
+
+class PushRouter:
+    """
+    ASGI app that serves game subscriptions, and passes anything else on.
+
+    - `games/{uuid}/events/?token=...` streams Server-Sent Events.
+    - `games/{uuid}/socket/?token=...` sends messages over a WebSocket.
+
+    The paths are built by `subscription_path`, and `games/` is the default
+    `MS_GAME_PUSH_PREFIX`. Every message is the JSON delta of a move, or
+    `null` when the game should be reloaded.
+    """
+
+    def __init__(self, application):
+        """Wrap the ASGI `application` that serves everything else."""
+        self.application = application
+        prefix = re.escape(settings.MS_GAME_PUSH_PREFIX)
+        self.path = re.compile(
+            F"^/{prefix}(?P<uuid>[0-9a-f-]{{36}})/(?P<channel>events|socket)/$"
+        )
+
+    async def __call__(self, scope, receive, send):
+        """Serve subscriptions, and pass other requests to the application."""
+        path, root_path = scope.get("path", ""), scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path) :]
+        match = self.path.match(path)
+        if match and scope["type"] == "http" and match["channel"] == "events":
+            return await self.server_sent_events(scope, receive, send, match["uuid"])
+        if match and scope["type"] == "websocket" and match["channel"] == "socket":
+            return await self.websocket(scope, receive, send, match["uuid"])
+        return await self.application(scope, receive, send)
+
+    @staticmethod
+    def get_token(scope):
+        """Return the `token` query parameter of a request."""
+        query = parse_qs(scope["query_string"].decode())
+        return query.get("token", [""])[0]
+
+    async def server_sent_events(self, scope, receive, send, game_uuid):
+        """Stream the messages of a game, until the client disconnects."""
+        headers = [(b"cache-control", b"no-cache")]
+        origin = dict(scope["headers"]).get(b"origin", b"")
+        if origin.decode() in settings.CORS_ORIGIN_WHITELIST:
+            headers.append((b"access-control-allow-origin", origin))
+
+        start = {"type": "http.response.start", "headers": headers}
+        if not check_token(self.get_token(scope), game_uuid):
+            await send({**start, "status": 403})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        headers.append((b"content-type", b"text/event-stream"))
+        async with get_broker().subscribe(game_uuid) as queue:
+            await send({**start, "status": 200})
+            async for data in self.messages(queue, receive, {"http.disconnect"}):
+                if data is KEEP_ALIVE:
+                    body = b": keep-alive\n\n"
+                else:
+                    body = F"data: {json.dumps(data)}\n\n".encode()
+                await send(
+                    {"type": "http.response.body", "body": body, "more_body": True}
+                )
+
+    async def websocket(self, scope, receive, send, game_uuid):
+        """Send the messages of a game, until the client disconnects."""
+        if (await receive())["type"] != "websocket.connect":
+            return
+        if not check_token(self.get_token(scope), game_uuid):
+            await send({"type": "websocket.close", "code": 4403})
+            return
+
+        async with get_broker().subscribe(game_uuid) as queue:
+            await send({"type": "websocket.accept"})
+            async for data in self.messages(queue, receive, {"websocket.disconnect"}):
+                if data is not KEEP_ALIVE:
+                    await send({"type": "websocket.send", "text": json.dumps(data)})
+
+    @staticmethod
+    async def messages(queue, receive, disconnect_types):
+        """
+        Yield the messages from `queue`, until the client disconnects.
+
+        `KEEP_ALIVE` is yielded after every idle `KEEP_ALIVE_SECONDS`.
+        """
+
+        async def disconnected():
+            while (await receive())["type"] not in disconnect_types:
+                pass
+
+        disconnect = asyncio.ensure_future(disconnected())
+        try:
+            while True:
+                message = asyncio.ensure_future(queue.get())
+                done, __ = await asyncio.wait(
+                    {message, disconnect},
+                    timeout=KEEP_ALIVE_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if message not in done:
+                    message.cancel()
+                if disconnect in done:
+                    return
+                yield message.result() if message in done else KEEP_ALIVE
+        finally:
+            disconnect.cancel()
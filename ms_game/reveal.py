@@ -0,0 +1,101 @@
+"""
+Reveal engine for MS Game app.
+
+Uncovering a cell with no adjacent bombs uncovers all its neighbors, and
+the ones with no adjacent bombs do the same. The engine walks the board
+breadth first using flat `c * rows + r` indexes, a visited bitmap and the
+stored adjacent bomb counts, so every cell is visited at most once.
+
+Chording an uncovered cell with as many flagged neighbors as adjacent bombs
+uncovers all its other neighbors, and those with no adjacent bombs reveal
+their own neighbors.
+"""
+from collections import deque
+
+
+def uncover_neighbors(game, cell_key):
+    """
+    Uncover the neighbors of an uncovered cell with no adjacent bombs.
+
+    The reveal spreads through the neighbors that also have no adjacent
+    bombs. Return the set of keys of the cells uncovered by the reveal.
+    """
+    cell = game[cell_key]
+    if cell.is_covered or cell.has_bomb:
+        return set()
+
+    cols, rows = game.cols, game.rows
+    adjacent_bombs = game.adjacent_bombs
+    c, r = cell_key
+    start = c * rows + r
+    if adjacent_bombs[start]:
+        return set()
+
+    cell_at = game.cell_at
+    visited = bytearray(cols * rows)
+    visited[start] = 1
+    queue = deque([start])
+    uncovered = set()
+
+    while queue:
+        c, r = divmod(queue.popleft(), rows)
+        for cc in range(max(c - 1, 0), min(c + 2, cols)):
+            for rr in range(max(r - 1, 0), min(r + 2, rows)):
+                index = cc * rows + rr
+                if visited[index]:
+                    continue
+                visited[index] = 1
+
+                neighbor = cell_at(index)
+                if not neighbor.is_covered:
+                    continue
+
+                neighbor.uncover()
+                uncovered.add((cc, rr))
+                if not adjacent_bombs[index]:
+                    queue.append(index)
+
+    return uncovered
+
+
+def chord(game, cell_key):
+    """
+    Uncover the unflagged neighbors of a cell whose adjacent bombs are flagged.
+
+    Only uncovered cells with adjacent bombs, and exactly as many flagged
+    neighbors, are chorded. A wrong flag uncovers a bomb and loses the game.
+    Return the set of keys of the cells uncovered by the chord.
+    """
+    cell = game[cell_key]
+    if cell.is_covered or cell.has_bomb:
+        return set()
+
+    cols, rows = game.cols, game.rows
+    c, r = cell_key
+    adjacent_bombs = game.adjacent_bombs[c * rows + r]
+    if not adjacent_bombs:
+        return set()
+
+    cell_at = game.cell_at
+    neighbors = [
+        (cc, rr)
+        for cc in range(max(c - 1, 0), min(c + 2, cols))
+        for rr in range(max(r - 1, 0), min(r + 2, rows))
+        if cell_at(cc * rows + rr).is_covered
+    ]
+    flagged = {key for key in neighbors if cell_at(key[0] * rows + key[1]).is_flagged}
+    if len(flagged) != adjacent_bombs:
+        return set()
+
+    uncovered = set()
+    for key in neighbors:
+        neighbor = cell_at(key[0] * rows + key[1])
+        # Neighbors may have been uncovered by the reveal of a previous one.
+        if key in flagged or not neighbor.is_covered:
+            continue
+
+        neighbor.uncover()
+        uncovered.add(key)
+        uncovered |= uncover_neighbors(game, key)
+
+    return uncovered
@@ -1,13 +1,21 @@
 """Define serializers for MS Game app."""
-from random import random
+import time
 
+from django.db import transaction
 from rest_framework import serializers
 
-from .models import Game, Status
+from . import board_formats, pool
+from .generators import build_games, create_games, place_bombs
+from .models import Game, Grid, Status
 
 
 class GameSerializer(serializers.ModelSerializer):
-    """Serializer for Game model instances."""
+    """
+    Serializer for Game model instances.
+
+    Pass a `random.Random` instance as the `rng` context to create
+    reproducible boards.
+    """
 
     board = serializers.SerializerMethodField()
     cols = serializers.IntegerField(max_value=100, min_value=3)
@@ -15,6 +23,7 @@ class GameSerializer(serializers.ModelSerializer):
     bombs = serializers.IntegerField(min_value=1)
     finished = serializers.IntegerField(read_only=True)
     won = serializers.IntegerField(read_only=True)
+    safe_first_click = serializers.BooleanField(default=False)
 
     # Needed so that Swagger gets them as read_only.
     uuid = serializers.UUIDField(read_only=True)
@@ -32,6 +41,7 @@ class GameSerializer(serializers.ModelSerializer):
             "bombs",
             "finished",
             "won",
+            "safe_first_click",
             "created_at",
             "finished_at",
         ]
@@ -51,10 +61,6 @@ class GameSerializer(serializers.ModelSerializer):
 
         return super().validate(attrs)
 
-    @staticmethod
-    def _count_bombs(cells):
-        return sum(1 for _, cell in cells if cell.has_bomb)
-
     @staticmethod
     def _get_new_covered_board(cols, rows):
         board = []
@@ -76,17 +82,12 @@ class GameSerializer(serializers.ModelSerializer):
         return board
 
     @staticmethod
-    def _populate_board_with_bombs(board, bombs):
-        size = len(board) * len(board[0])
-        probability = bombs / size
-        bombs = min(size, bombs)
-        # Loop until we fill all the needed bombs.
-        while bombs:
-            for row in board:
-                for cell in row:
-                    if bombs and not cell.get("bomb", False) and random() < probability:
-                        cell["bomb"] = True
-                        bombs -= 1
+    def _populate_board_with_bombs(board, bombs, rng=None):
+        cols = len(board)
+        rows = len(board[0]) if cols else 0
+        for index in place_bombs(cols, rows, bombs, rng):
+            c, r = divmod(index, rows)
+            board[c][r]["bomb"] = True
 
         return board
 
@@ -94,35 +95,81 @@ class GameSerializer(serializers.ModelSerializer):
         """
         Represent the board as a 2 level nested list.
 
-        Each cell has a unique value that indicates its state.
+        Each cell has a unique value that indicates its state. The board is
+        encoded in one of the compact formats instead if it is requested as
+        the `board_format` context.
         """
+        board_format = self.context.get("board_format", "json")
+        if board_format != "json":
+            return board_formats.encode_board(obj, board_format)
+
         board = self._get_new_covered_board(obj.cols, obj.rows)
-        for cell_key, cell in obj.cells:
-            c, r = cell_key
-            if cell.is_flagged:
-                board[c][r] = "f"
-                continue
+        if not obj.has_board:
+            # A safe_first_click game before its first move.
+            return board
 
-            if not cell.is_covered:
-                if cell.has_bomb:
-                    board[c][r] = "*"
-                    continue
-                board[c][r] = self._count_bombs(obj.get_neighbors(cell_key))
+        adjacent_bombs = obj.adjacent_bombs
+        rows = obj.rows
+        for cell_key, cell in obj.cells:
+            if cell.is_covered and not cell.is_flagged:
                 continue
+            c, r = cell_key
+            board[c][r] = self.represent_cell(cell, adjacent_bombs[c * rows + r])
 
         return board
 
+    @staticmethod
+    def represent_cell(cell, adjacent_bombs):
+        """Return the value that represents the state of a cell in a board."""
+        if cell.is_flagged:
+            return "f"
+
+        if cell.is_covered:
+            return "c"
+
+        if cell.has_bomb:
+            return "*"
+
+        return adjacent_bombs
+
+    @transaction.atomic
     def create(self, validated_data):
-        """Create a new Game populating the board with the requested number of bombs."""
+        """
+        Create a new Game populating the board with the requested number of bombs.
+
+        The board is claimed from the pool when it has one, and goes back to it
+        if the game is not saved.
+        """
         # Extract validated data.
         cols = validated_data.pop("cols")
         rows = validated_data.pop("rows")
         bombs = validated_data.pop("bombs")
 
-        # Generate board with bombs.
-        board = self._get_new_data_board(cols, rows)
-        self._populate_board_with_bombs(board, bombs)
-        validated_data["board"] = board
+        # Claim a ready-made board from the pool, or generate one with bombs.
+        # Safe first click boards are built on the first move.
+        rng = self.context.get("rng")
+        board = []
+        pooled = None
+        if not validated_data["safe_first_click"]:
+            # Boards in the pool were not generated with the `rng`.
+            if rng is None:
+                pooled = pool.claim_board(cols, rows, bombs)
+            if pooled is None:
+                board = self._get_new_data_board(cols, rows)
+                self._populate_board_with_bombs(board, bombs, rng)
+                adjacency = Grid.from_board(board).count_adjacent_bombs()
+                validated_data["adjacency"] = adjacency
+        if pooled is not None:
+            validated_data["packed_board"] = bytes(pooled.packed_board)
+            validated_data["adjacency"] = bytes(pooled.adjacency)
+        else:
+            validated_data["board"] = board
+        validated_data["col_count"] = cols
+        validated_data["row_count"] = rows
+        validated_data["bomb_count"] = bombs
+        validated_data["flag_count"] = 0
+        validated_data["uncovered_count"] = 0
+        validated_data["uncovered_bomb_count"] = 0
 
         # Assign the player.
         validated_data["player"] = self._context["request"].user
@@ -130,6 +177,161 @@ class GameSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class GameBatchSerializer(serializers.Serializer):
+    """
+    Serializer to create many games with the same configuration.
+
+    Pass a `random.Random` instance as the `rng` context to create
+    reproducible boards.
+    """
+
+    count = serializers.IntegerField(min_value=1, max_value=1000)
+    cols = serializers.IntegerField(max_value=100, min_value=3)
+    rows = serializers.IntegerField(max_value=100, min_value=3)
+    bombs = serializers.IntegerField(min_value=1)
+    safe_first_click = serializers.BooleanField(default=False)
+    uuids = serializers.ListField(child=serializers.UUIDField(), read_only=True)
+    games_per_second = serializers.IntegerField(read_only=True)
+
+    def validate(self, attrs):
+        """Validate that at least one cell is empty."""
+        if attrs["cols"] * attrs["rows"] - 1 < attrs["bombs"]:
+            raise serializers.ValidationError(
+                {"bombs": "At least one cell must be empty."}
+            )
+
+        return super().validate(attrs)
+
+    def create(self, validated_data):
+        """Create the games with `bulk_create`, and time it."""
+        start = time.perf_counter()
+        games = build_games(
+            self.context["request"].user, rng=self.context.get("rng"), **validated_data
+        )
+        uuids = [game.uuid for batch in create_games(games) for game in batch]
+        seconds = time.perf_counter() - start
+
+        return {
+            **validated_data,
+            "uuids": uuids,
+            "games_per_second": round(len(uuids) / seconds),
+        }
+
+
+class GameSummarySerializer(serializers.ModelSerializer):
+    """
+    Serializer for Game model instances, without their board.
+
+    Every field is read from stored columns, so the board does not need to
+    be loaded.
+    """
+
+    cols = serializers.IntegerField(read_only=True)
+    rows = serializers.IntegerField(read_only=True)
+    bombs = serializers.IntegerField(read_only=True)
+    flags = serializers.IntegerField(read_only=True)
+    finished = serializers.IntegerField(read_only=True)
+    won = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        """Define options for GameSummarySerializer."""
+
+        model = Game
+        fields = [
+            "uuid",
+            "cols",
+            "rows",
+            "bombs",
+            "flags",
+            "finished",
+            "won",
+            "safe_first_click",
+            "created_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+
+class DeltaSerializer(serializers.Serializer):
+    """
+    Serializer for the changes made to a Game by a move.
+
+    The keys of the changed cells are passed as the `cells` context.
+    """
+
+    cells = serializers.SerializerMethodField()
+    finished = serializers.IntegerField(read_only=True)
+    won = serializers.IntegerField(read_only=True)
+    finished_at = serializers.DateTimeField(read_only=True)
+
+    def get_cells(self, obj):
+        """Represent each changed cell as a list of `[column, row, value]`."""
+        adjacent_bombs = obj.adjacent_bombs
+        rows = obj.rows
+        represent_cell = GameSerializer.represent_cell
+        return [
+            [c, r, represent_cell(obj[c, r], adjacent_bombs[c * rows + r])]
+            for c, r in sorted(self.context["cells"])
+        ]
+
+
+class MovesDeltaSerializer(DeltaSerializer):
+    """
+    Serializer for the changes made to a Game by a batch of moves.
+
+    The number of moves applied is passed as the `applied` context.
+    """
+
+    applied = serializers.SerializerMethodField()
+
+    def get_applied(self, obj):
+        """Return the number of moves applied, before the game finished."""
+        return self.context["applied"]
+
+
+class HintSerializer(serializers.Serializer):
+    """Serializer for a hint, the `[column, row]` of a safe cell, or null."""
+
+    cell = serializers.ListField(
+        child=serializers.IntegerField(), allow_null=True, read_only=True
+    )
+
+
+class PushSerializer(serializers.Serializer):
+    """Serializer for the URLs to subscribe to the updates of a game, or nulls."""
+
+    events = serializers.URLField(allow_null=True, read_only=True)
+    socket = serializers.CharField(allow_null=True, read_only=True)
+
+
+class GameFilterSerializer(serializers.Serializer):
+    """Serializer for the query parameters that filter the list of games."""
+
+    finished = serializers.BooleanField(required=False, allow_null=True, default=None)
+    won = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+    def filter_queryset(self, queryset):
+        """Return the queryset filtered by the validated parameters."""
+        finished = self.validated_data["finished"]
+        won = self.validated_data["won"]
+
+        if finished is not None:
+            queryset = queryset.finished() if finished else queryset.in_progress()
+
+        if won is not None:
+            queryset = queryset.won() if won else queryset.not_won()
+
+        return queryset
+
+
+class BoardFormatSerializer(serializers.Serializer):
+    """Serializer for the query parameter that selects the format of boards."""
+
+    board_format = serializers.ChoiceField(
+        ["json", *board_formats.FORMATS], required=False, default="json"
+    )
+
+
 class CellSerializer(serializers.Serializer):
     """Serializer for Cell data manipulation."""
 
@@ -162,3 +364,19 @@ class CellSerializer(serializers.Serializer):
 
         instance.unflag()
         return instance
+
+
+class MoveSerializer(serializers.Serializer):
+    """Serializer for a move: the new status of the cell at a column and row."""
+
+    col = serializers.IntegerField(min_value=0)
+    row = serializers.IntegerField(min_value=0)
+    status = serializers.ChoiceField(Status.choices, allow_null=True)
+
+
+class MovesSerializer(serializers.Serializer):
+    """Serializer for an ordered batch of moves."""
+
+    moves = serializers.ListField(
+        child=MoveSerializer(), allow_empty=False, max_length=1000
+    )
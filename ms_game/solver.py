@@ -0,0 +1,210 @@
+"""
+Minesweeper solver for MS Game app.
+
+The solver knows what a player sees: the uncovered cells, their number of
+adjacent bombs, and the total number of bombs. Sets of cells are bitsets,
+Python integers with the bit `c * rows + r` set for each cell, so that set
+operations over a whole board are single integer operations.
+
+Every uncovered cell with unknown neighbors is a constraint: that many
+bombs among those neighbors. Only the constraints around the cells that
+changed are propagated again, with two rules:
+
+- A constraint without bombs left has only safe cells, and one with as many
+  bombs as unknown cells has only bombs.
+- Between two overlapping constraints A and B, when the bombs A needs beyond
+  B fill the cells only A has, those are all bombs, and the cells only B has
+  are all safe. A subset of B is the case where A has no cells of its own.
+
+The total number of bombs decides the remaining cells when they are all
+safe or all bombs. The solver never guesses, so a board it solves can be
+solved by a player without guessing.
+"""
+from functools import lru_cache
+
+
+def bits(bitset):
+    """Yield the index of every bit set, lowest first."""
+    while bitset:
+        low = bitset & -bitset
+        yield low.bit_length() - 1
+        bitset ^= low
+
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    # Python < 3.10.
+    def popcount(bitset):
+        """Return the number of bits set."""
+        return bin(bitset).count("1")
+
+
+@lru_cache(maxsize=16)
+def neighbor_masks(cols, rows):
+    """Return the bitset of the neighbors of every cell, by `c * rows + r`."""
+    # The rows from r - 1 to r + 1 of a column, for every r.
+    columns = [
+        ((1 << (min(r + 2, rows) - max(r - 1, 0))) - 1) << max(r - 1, 0)
+        for r in range(rows)
+    ]
+    masks = []
+    for c in range(cols):
+        for r in range(rows):
+            mask = 0
+            for neighbor_c in range(max(c - 1, 0), min(c + 2, cols)):
+                mask |= columns[r] << (neighbor_c * rows)
+            masks.append(mask ^ (1 << (c * rows + r)))
+    return masks
+
+
+class Solver:
+    """
+    Deduce the safe cells and bombs of a board, as it is uncovered.
+
+    Cells are added with `uncover` as the player uncovers them, and `deduce`
+    then propagates the constraints they changed. Known cells are in the
+    `safe` and `mines` bitsets. Solvers can be pickled, to keep the state of
+    a game between moves.
+    """
+
+    def __init__(self, cols, rows, bombs):
+        """Start with every cell unknown."""
+        self.cols = cols
+        self.rows = rows
+        self.bombs = bombs
+        self.neighbors = neighbor_masks(cols, rows)
+        self.cells = (1 << (cols * rows)) - 1
+        self.uncovered = 0
+        # Cells known to be safe, uncovered or not, and to have a bomb.
+        self.safe = 0
+        self.mines = 0
+        # Adjacent bombs of the uncovered cells with unknown neighbors.
+        self.frontier = {}
+        self._pending = set()
+
+    def __getstate__(self):
+        """Pickle the state, without the neighbors shared by every solver."""
+        state = self.__dict__.copy()
+        del state["neighbors"]
+        return state
+
+    def __setstate__(self, state):
+        """Restore the state, and the neighbors for the size of the board."""
+        self.__dict__.update(state)
+        self.neighbors = neighbor_masks(self.cols, self.rows)
+
+    @property
+    def unknown(self):
+        """Return the cells not known to be safe or to have a bomb."""
+        return self.cells & ~(self.safe | self.mines)
+
+    @property
+    def safe_cells(self):
+        """Return the safe cells that have not been uncovered."""
+        return self.safe & ~self.uncovered
+
+    def uncover(self, index, adjacent_bombs):
+        """Add an uncovered cell, and its number of adjacent bombs."""
+        self.uncovered |= 1 << index
+        self._mark(1 << index, 0)
+        self.frontier[index] = adjacent_bombs
+        self._pending.add(index)
+
+    def deduce(self):
+        """
+        Find every safe cell and bomb that follows from what changed.
+
+        Return False if nothing changed since the previous call.
+        """
+        changed = bool(self._pending)
+        while True:
+            while self._pending:
+                index = self._pending.pop()
+                if index not in self.frontier:
+                    continue
+                unknown, needed = self._constraint(index)
+                if not unknown:
+                    del self.frontier[index]
+                elif needed == 0:
+                    self._mark(unknown, 0)
+                elif needed == popcount(unknown):
+                    self._mark(0, unknown)
+                else:
+                    self._compare(index, unknown, needed)
+            if not self._count_bombs():
+                return changed
+            changed = True
+
+    def _constraint(self, index):
+        """Return the unknown neighbors of a cell, and the bombs among them."""
+        neighbors = self.neighbors[index]
+        unknown = neighbors & ~(self.safe | self.mines)
+        return unknown, self.frontier[index] - popcount(neighbors & self.mines)
+
+    def _compare(self, index, unknown, needed):
+        """Apply the subset rule between a constraint and the ones it overlaps."""
+        others = set()
+        for cell in bits(unknown):
+            others.update(bits(self.neighbors[cell] & self.uncovered))
+        others.discard(index)
+
+        for other in others:
+            if other not in self.frontier:
+                continue
+            other_unknown, other_needed = self._constraint(other)
+            only = unknown & ~other_unknown
+            other_only = other_unknown & ~unknown
+            if needed - other_needed == popcount(only):
+                found = self._mark(other_only, only)
+            elif other_needed - needed == popcount(other_only):
+                found = self._mark(only, other_only)
+            else:
+                continue
+            if found:
+                # The constraint changed, compare it again.
+                self._pending.add(index)
+                return
+
+    def _count_bombs(self):
+        """Apply the total number of bombs to the unknown cells."""
+        unknown = self.unknown
+        remaining = self.bombs - popcount(self.mines)
+        if unknown and remaining == 0:
+            return self._mark(unknown, 0)
+        if unknown and remaining == popcount(unknown):
+            return self._mark(0, unknown)
+        return False
+
+    def _mark(self, safe, mines):
+        """Mark cells as safe or bombs, and return True if any was unknown."""
+        found = (safe | mines) & ~(self.safe | self.mines)
+        self.safe |= safe
+        self.mines |= mines
+        for cell in bits(found):
+            for index in bits(self.neighbors[cell] & self.uncovered):
+                if index in self.frontier:
+                    self._pending.add(index)
+        return bool(found)
+
+
+def is_solvable(grid, first_index, adjacency=None):
+    """
+    Return True if a Grid can be solved from `first_index` without guessing.
+
+    `adjacency` are the adjacent bomb counts of the Grid, computed if needed.
+    """
+    if grid.bombs[first_index]:
+        return False
+    if adjacency is None:
+        adjacency = grid.count_adjacent_bombs()
+
+    bombs = sum(grid.bombs)
+    solver = Solver(grid.cols, grid.rows, bombs)
+    uncover = 1 << first_index
+    while uncover:
+        for index in bits(uncover):
+            solver.uncover(index, adjacency[index])
+        solver.deduce()
+        uncover = solver.safe_cells
+    return popcount(solver.uncovered) == grid.size - bombs
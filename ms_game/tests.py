@@ -1,13 +1,52 @@
 """Define tests for MD GAme app."""
+import asyncio
+import base64
+import json
+import multiprocessing
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 from unittest.mock import Mock
-from rest_framework import serializers
+from rest_framework import exceptions, serializers
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-
-from .models import Cell, Game, Status
-from .serializers import GameSerializer, CellSerializer
-from django.urls import reverse
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import (
+    BoardEngine,
+    Cell,
+    Game,
+    Grid,
+    GridCell,
+    PooledBoard,
+    PoolStats,
+    Status,
+)
+from .authentication import EmailAuth
+from .board_formats import encode_board
+from . import hints, pool, push
+from .cache import SizeBoundedLRUCache, games as game_cache
+from .serializers import GameSerializer, GameSummarySerializer, CellSerializer
+from django.urls import reverse, set_script_prefix
+from .export import EXPORT_FIELDS
+from .generators import (
+    build_games,
+    generate_grid,
+    generate_solvable_grid,
+    place_bombs,
+)
+from .solver import Solver, bits, is_solvable, neighbor_masks
+from .reveal import chord, uncover_neighbors
 from .views import GameViewset
 
 User = get_user_model()
@@ -111,6 +150,149 @@ class GameModelTestCase(TestCase):
             }
             self.assertEqual(dict(game.get_neighbors(key)), expected_neighbors)
 
+    def test_adjacent_bombs(self):
+        """Adjacent bomb counts are indexed by `c * rows + r`."""
+        board = create_data_board(3, 4)
+        board[0][0]["bomb"] = True
+        board[2][1]["bomb"] = True
+        game = Game.objects.create(player=self.user, board=board)
+
+        self.assertEqual(
+            list(game.adjacent_bombs),
+            # col 0      col 1       col 2
+            [0, 1, 0, 0, 2, 2, 1, 0, 1, 0, 1, 0],
+        )
+
+    def test_adjacent_bombs_are_stored(self):
+        """Adjacent bomb counts are saved with the game."""
+        board = create_data_board(3, 3)
+        board[1][1]["bomb"] = True
+        game = Game.objects.create(player=self.user, board=board)
+        game.adjacent_bombs
+        game.save()
+
+        game = Game.objects.get(pk=game.pk)
+        game.board[1][1]["bomb"] = False
+        self.assertEqual(list(game.adjacent_bombs), [1, 1, 1, 1, 0, 1, 1, 1, 1])
+
+    def test_counters(self):
+        """Counters are counted from the board when first needed."""
+        board = create_data_board(3, 3)
+        board[0][0] = {"bomb": True, "status": Status.UNCOVERED.value}
+        board[1][1] = {"bomb": True, "status": Status.FLAGGED.value}
+        board[2][2]["status"] = Status.UNCOVERED.value
+        game = Game.objects.create(player=self.user, board=board)
+        self.assertIsNone(game.bomb_count)
+
+        self.assertEqual(game.bombs, 2)
+        self.assertEqual(game.flags, 1)
+        self.assertEqual(game.uncovered, 2)
+        self.assertEqual(game.uncovered_bombs, 1)
+        self.assertTrue(game.finished)
+        self.assertFalse(game.won)
+
+    def test_counters_follow_cells(self):
+        """Cells keep the counters up to date, without scanning the board."""
+        board = create_data_board(3, 3)
+        board[1][1]["bomb"] = True
+        game = Game.objects.create(player=self.user, board=board)
+        game.count_cells()
+
+        with self.subTest("flag"):
+            game[0, 0].flag()
+            self.assertEqual(game.flags, 1)
+
+        with self.subTest("unflag"):
+            game[0, 0].unflag()
+            self.assertEqual(game.flags, 0)
+
+        with self.subTest("uncover flagged"):
+            game[0, 1].flag()
+            game[0, 1].uncover()
+            self.assertEqual((game.flags, game.uncovered), (0, 1))
+
+        with self.subTest("uncover bomb"):
+            game[1, 1].uncover()
+            self.assertEqual((game.uncovered, game.uncovered_bombs), (2, 1))
+            self.assertTrue(game.finished)
+
+        game.save()
+        game.refresh_from_db()
+        self.assertEqual(
+            (game.bomb_count, game.flag_count, game.uncovered_count), (1, 0, 2)
+        )
+
+    def test_save_if_unchanged(self):
+        """A game is only saved if nobody saved it since it was loaded."""
+        game = Game.objects.create(player=self.user, board=create_data_board(2, 2))
+        first = Game.objects.get(pk=game.pk)
+        second = Game.objects.get(pk=game.pk)
+
+        first[0, 0].flag()
+        self.assertTrue(first.save_if_unchanged())
+        second[1, 1].flag()
+        self.assertFalse(second.save_if_unchanged())
+
+        game.refresh_from_db()
+        self.assertEqual(game.version, 1)
+        self.assertTrue(game[0, 0].is_flagged)
+        self.assertTrue(game[1, 1].is_covered)
+
+    def test_save_increases_version(self):
+        """Moves loaded before a save are not saved over it."""
+        game = Game.objects.create(player=self.user, board=create_data_board(2, 2))
+        self.assertEqual(game.version, 0)
+        move = Game.objects.get(pk=game.pk)
+
+        game[0, 0].flag()
+        game.save()
+        self.assertEqual(game.version, 1)
+        game.save(update_fields=["safe_first_click"])
+        self.assertEqual(game.version, 2)
+        self.assertTrue(game[0, 0].is_flagged)
+
+        move[1, 1].flag()
+        self.assertFalse(move.save_if_unchanged())
+        game.refresh_from_db()
+        self.assertTrue(game[1, 1].is_covered)
+
+    def test_save_if_unchanged_patches_cells(self):
+        """Saving the changed cells sends only their bytes, and the move columns."""
+        game = Game.objects.create(player=self.user, board=create_data_board(3, 3))
+        game.count_cells()
+        game[0, 0].flag()
+        game[0, 1].uncover()
+        # Not listed as changed, so it is not saved.
+        game.board[2][2]["status"] = Status.FLAGGED.value
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(game.save_if_unchanged({(0, 0), (0, 1)}))
+        self.assertIn("substr", queries[0]["sql"])
+        self.assertNotIn("adjacency", queries[0]["sql"])
+
+        game.refresh_from_db()
+        self.assertTrue(game[0, 0].is_flagged)
+        self.assertFalse(game[0, 1].is_covered)
+        self.assertTrue(game[2, 2].is_covered)
+        self.assertEqual((game.flag_count, game.uncovered_count), (1, 1))
+
+    def test_json_board(self):
+        """Games stored as JSON are read, and packed when saved."""
+        board = create_data_board(2, 2)
+        board[1][1]["bomb"] = True
+        game = Game.objects.create(player=self.user, board=board)
+        Game.objects.filter(pk=game.pk).update(packed_board=None, json_board=board)
+
+        game = Game.objects.get(pk=game.pk)
+        self.assertTrue(game[1, 1].has_bomb)
+        game[0, 0].flag()
+        self.assertTrue(game.save_if_unchanged({(0, 0)}))
+
+        game.refresh_from_db()
+        self.assertIsNone(game.json_board)
+        self.assertEqual(Grid.unpack(game.packed_board).to_board(), game.board)
+        self.assertTrue(game[0, 0].is_flagged)
+
     def test_cell_references_game_board(self):
         """
         The dict references in a Cell, is the same dict as in the game board.
@@ -125,6 +307,33 @@ class GameModelTestCase(TestCase):
         self.assertIs(cell._data, game.board[0][0])
 
 
+# The admin pages need no manifest of static files.
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class GameAdminTestCase(TestCase):
+    """Test the Django admin for games."""
+
+    def test_change(self):
+        """Games can be changed, without touching their board."""
+        admin = User.objects.create_superuser("admin@example.com", "password")
+        self.client.force_login(admin)
+        game = Game.objects.create(player=admin, board=create_data_board(2, 2))
+        url = reverse("admin:ms_game_game_change", args=[game.pk])
+
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "json_board")
+
+        data = {"player": admin.pk, "safe_first_click": "on"}
+        response = self.client.post(url, data, secure=True)
+        self.assertEqual(response.status_code, 302)
+        game.refresh_from_db()
+        self.assertTrue(game.safe_first_click)
+        self.assertEqual(game.version, 1)
+        self.assertEqual(game.board, create_data_board(2, 2))
+
+
 class CellFlagTestCase(TestCase):
     """Test the ability to flag Cells."""
 
@@ -215,6 +424,270 @@ class CellBombTestCase(TestCase):
             self.assertFalse(cell.has_bomb)
 
 
+class GridTestCase(TestCase):
+    """Test the compact Grid representation of a board."""
+
+    def setUp(self):
+        """Set up common test data."""
+        self.board = create_data_board(3, 4)
+        self.board[0][1]["bomb"] = True
+        self.board[1][2]["status"] = Status.UNCOVERED.value
+        self.board[2][3] = {"bomb": True, "status": Status.FLAGGED.value}
+
+    def test_from_board(self):
+        """Cells are stored column-major, indexed by `c * rows + r`."""
+        grid = Grid.from_board(self.board)
+        self.assertEqual((grid.cols, grid.rows), (3, 4))
+        self.assertEqual(grid.bombs[0 * 4 + 1], 1)
+        self.assertEqual(grid.status[1 * 4 + 2], Grid.UNCOVERED)
+        self.assertEqual(grid.status[2 * 4 + 3], Grid.FLAGGED)
+        self.assertEqual(sum(grid.bombs), 2)
+
+    def test_count_adjacent_bombs(self):
+        """Adjacent bombs are counted as the neighbors of each cell are."""
+        rng = random.Random(0)
+        for cols, rows in [(1, 1), (1, 5), (5, 1), (3, 4), (10, 10), (7, 13)]:
+            with self.subTest((cols, rows)):
+                grid = generate_grid(cols, rows, cols * rows // 3, rng)
+                expected = [
+                    sum(grid.bombs[neighbor] for neighbor in grid.neighbors(index))
+                    for index in range(grid.size)
+                ]
+                self.assertEqual(list(grid.count_adjacent_bombs()), expected)
+
+    def test_to_board(self):
+        """A Grid converts back to the same JSON board."""
+        self.assertEqual(Grid.from_board(self.board).to_board(), self.board)
+
+    def test_pack(self):
+        """A packed Grid has a size header and 4 bits per cell."""
+        packed = Grid.from_board(self.board).pack()
+        self.assertEqual(len(packed), 4 + 6)
+        self.assertEqual(Grid.unpack_size(packed), (3, 4))
+        # Cell 1 has a bomb (0b0100), cell 11 a flagged bomb (0b0101).
+        self.assertEqual(packed[4:], bytes([0x04, 0, 0, 0x20, 0, 0x05]))
+        self.assertEqual(Grid.unpack(memoryview(packed)).to_board(), self.board)
+
+    def test_pack_odd_size(self):
+        """Grids with an odd number of cells are padded."""
+        grid = Grid(3, 3)
+        grid.status[8] = Grid.UNCOVERED
+        packed = grid.pack()
+        self.assertEqual(packed[-1], 0x20)
+        self.assertEqual(Grid.unpack(packed).status, grid.status)
+
+    def test_non_existing_cell(self):
+        """Raise IndexError for keys outside the grid, TypeError for bad keys."""
+        grid = Grid.from_board(self.board)
+        for key in [(3, 0), (0, 4), (-1, 0)]:
+            with self.subTest(key), self.assertRaises(IndexError):
+                grid.index(key)
+
+        with self.assertRaises(TypeError):
+            grid.index(1)
+
+    def test_neighbors(self):
+        """Neighbors are the flat indexes of the surrounding cells."""
+        grid = Grid.from_board(self.board)
+        self.assertEqual(list(grid.neighbors(0)), [4, 1, 5])
+        self.assertEqual(len(list(grid.neighbors(grid.index((1, 1))))), 8)
+
+    def test_grid_cell(self):
+        """GridCells read and write the grid arrays."""
+        grid = Grid.from_board(self.board)
+        cell = GridCell(grid, grid.index((0, 0)))
+        self.assertTrue(cell.is_covered)
+        self.assertFalse(cell.has_bomb)
+
+        cell.flag()
+        self.assertTrue(cell.is_flagged)
+        cell.unflag()
+        self.assertFalse(cell.is_flagged)
+        cell.uncover()
+        self.assertFalse(cell.is_covered)
+        self.assertEqual(grid.status[0], Grid.UNCOVERED)
+
+
+@override_settings(MS_GAME_BOARD_ENGINE=BoardEngine.COMPACT)
+class CompactGameTestCase(TestCase):
+    """Test a Game using the compact board engine."""
+
+    def setUp(self):
+        """Set up common test data."""
+        self.user = User.objects.create_user("user@example.com")
+        board = create_data_board(8, 9)
+        board[2][2]["bomb"] = True
+        board[2][4]["bomb"] = True
+        self.game = Game.objects.create(player=self.user, board=board)
+
+    def test_cells_are_grid_cells(self):
+        """Cells are views over the Grid."""
+        self.assertIsInstance(self.game[0, 0], GridCell)
+        self.assertEqual(self.game[0, 0], self.game[0, 0])
+        self.assertEqual(len(dict(self.game.get_neighbors((0, 0)))), 3)
+        self.assertEqual(self.game.bombs, 2)
+
+    def test_serializer(self):
+        """The serialized board is the same as with the JSON engine."""
+        self.game[2, 3].uncover()
+        expected_board = create_covered_board(8, 9)
+        expected_board[2][3] = 2
+        self.assertEqual(GameSerializer(self.game).data["board"], expected_board)
+
+    def test_save_writes_board(self):
+        """Saving the game writes the Grid to the packed board."""
+        self.game[0, 0].flag()
+        self.game.save()
+        self.game.refresh_from_db()
+        grid = Grid.unpack(bytes(self.game.packed_board))
+        self.assertEqual(grid.status[0], Grid.FLAGGED)
+        self.assertEqual(self.game.board[0][0], {"status": Status.FLAGGED.value})
+
+    def test_save_if_unchanged_patches_cells(self):
+        """Changed cells are patched from the Grid."""
+        self.game[0, 0].flag()
+        self.game[2, 2].uncover()
+        self.assertTrue(self.game.save_if_unchanged({(0, 0), (2, 2)}))
+
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.board[0][0], {"status": Status.FLAGGED.value})
+        self.assertEqual(
+            self.game.board[2][2], {"bomb": True, "status": Status.UNCOVERED.value}
+        )
+
+    def test_recursive_uncovering(self):
+        """The reveal works the same as with the JSON engine."""
+        self.game[7, 8].uncover()
+        GameViewset.recursive_uncover_neighbors(self.game, (7, 8))
+        # Only (2, 3), enclosed by the bombs, is left covered.
+        self.assertEqual(self.game.uncovered, 8 * 9 - 3)
+        self.assertTrue(self.game[2, 3].is_covered)
+
+
+class GeneratorsTestCase(TestCase):
+    """Test the board generators."""
+
+    def test_exact_number_of_bombs(self):
+        """The requested number of bombs is placed, at any density."""
+        for bombs in [1, 50, 99, 100]:
+            with self.subTest(bombs):
+                indexes = place_bombs(10, 10, bombs)
+                self.assertEqual(len(set(indexes)), bombs)
+                self.assertTrue(all(0 <= index < 100 for index in indexes))
+
+    def test_reproducible(self):
+        """The same seed generates the same board."""
+        first = generate_grid(10, 10, 30, random.Random(42))
+        second = generate_grid(10, 10, 30, random.Random(42))
+        self.assertEqual(first.bombs, second.bombs)
+        self.assertEqual(sum(first.bombs), 30)
+
+    def test_build_games(self):
+        """Built games are ready to be saved, with their board and counters."""
+        player = User.objects.create_user("user@example.com")
+        game, safe_game = [
+            next(build_games(player, 1, 5, 7, 10, safe, random.Random(0)))
+            for safe in [False, True]
+        ]
+
+        self.assertEqual(Grid.unpack(game.packed_board).bombs.count(1), 10)
+        self.assertEqual(bytes(game.adjacency), game.as_grid().count_adjacent_bombs())
+        self.assertEqual((game.cols, game.rows, game.bomb_count), (5, 7, 10))
+        self.assertFalse(game.bombs_pending)
+        self.assertTrue(safe_game.bombs_pending)
+
+    def test_generate_solvable_grid(self):
+        """Generated boards can be solved from the first click without guessing."""
+        with ThreadPoolExecutor(1) as executor:
+            grids = [
+                generate_solvable_grid(
+                    16, 16, 40, (8, 8), executor, rng=random.Random(0)
+                )
+                for _ in range(2)
+            ]
+            with self.subTest("not found"):
+                self.assertIsNone(
+                    generate_solvable_grid(5, 5, 20, (2, 2), executor, attempts=5)
+                )
+        self.assertEqual(grids[0].bombs, grids[1].bombs)
+        self.assertEqual(sum(grids[0].bombs), 40)
+        self.assertTrue(is_solvable(grids[0], 8 * 16 + 8))
+
+        with self.subTest("in processes"):
+            grid = generate_solvable_grid(9, 9, 10, (0, 0))
+            self.assertTrue(is_solvable(grid, 0))
+
+        with self.subTest("in spawned processes"):
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                grid = generate_solvable_grid(9, 9, 10, (0, 0), executor)
+            self.assertTrue(is_solvable(grid, 0))
+
+
+class SolverTestCase(TestCase):
+    """Test the solver of boards."""
+
+    def solve(self, grid, first_index):
+        """Uncover a Grid from `first_index` as far as the solver can go."""
+        adjacency = grid.count_adjacent_bombs()
+        solver = Solver(grid.cols, grid.rows, sum(grid.bombs))
+        uncover = 1 << first_index
+        while uncover:
+            for index in bits(uncover):
+                self.assertFalse(grid.bombs[index])
+                solver.uncover(index, adjacency[index])
+            solver.deduce()
+            uncover = solver.safe_cells
+        return solver
+
+    def test_neighbor_masks(self):
+        """Neighbors are the same as the ones of the Grid."""
+        for cols, rows in [(1, 1), (1, 4), (4, 1), (3, 5), (7, 6)]:
+            grid = Grid(cols, rows)
+            masks = neighbor_masks(cols, rows)
+            for index in range(grid.size):
+                with self.subTest((cols, rows, index)):
+                    neighbors = set(grid.neighbors(index))
+                    self.assertEqual(set(bits(masks[index])), neighbors)
+
+    def test_subset_rule(self):
+        """Overlapping constraints find the bombs the simple rules can not."""
+        # Row 0 is covered, row 1 reads 1 2 1, row 2 is empty, bombs at 0 and 2.
+        grid = Grid(3, 3)
+        grid.bombs[0 * 3 + 0] = grid.bombs[2 * 3 + 0] = 1
+
+        solver = self.solve(grid, 1 * 3 + 2)
+        self.assertEqual(set(bits(solver.mines)), {0, 6})
+        self.assertTrue(is_solvable(grid, 1 * 3 + 2))
+
+    def test_guess_needed(self):
+        """Boards that need a guess are not solved, and nothing is guessed."""
+        # One bomb in either of the two cells of column 0.
+        grid = Grid(3, 2)
+        grid.bombs[0] = 1
+
+        solver = self.solve(grid, 2 * 2 + 0)
+        self.assertEqual(solver.mines, 0)
+        self.assertEqual(set(bits(solver.unknown)), {0, 1})
+        self.assertFalse(is_solvable(grid, 2 * 2 + 0))
+        self.assertFalse(is_solvable(grid, 0))
+
+    def test_sound(self):
+        """Safe cells never have a bomb, and bombs always have one."""
+        rng = random.Random(0)
+        for _ in range(200):
+            cols, rows = rng.randint(3, 10), rng.randint(3, 10)
+            first_index = rng.randrange(cols * rows)
+            grid = Grid(cols, rows)
+            bombs = rng.randint(1, cols * rows // 4)
+            for index in place_bombs(cols, rows, bombs, rng, {first_index}):
+                grid.bombs[index] = 1
+
+            solver = self.solve(grid, first_index)
+            for index in bits(solver.mines):
+                self.assertTrue(grid.bombs[index])
+
+
 class GameSerializerTestCase(TestCase):
     """Test the the Serializer for Game model."""
 
@@ -278,6 +751,21 @@ class GameSerializerTestCase(TestCase):
         self.assertEqual(game.cols, 5)
         self.assertEqual(game.rows, 7)
         self.assertEqual(game.bombs, 4)
+        self.assertEqual(len(game.adjacency), 5 * 7)
+        self.assertEqual((game.bomb_count, game.uncovered_count), (4, 0))
+
+    def test_creation_with_rng(self):
+        """A seeded random generator creates reproducible boards."""
+        request = Mock(user=self.user)
+        boards = []
+        for _ in range(2):
+            serializer = GameSerializer(
+                data={"cols": 5, "rows": 7, "bombs": 30},
+                context={"request": request, "rng": random.Random(1)},
+            )
+            serializer.is_valid()
+            boards.append(serializer.save().board)
+        self.assertEqual(boards[0], boards[1])
 
 
 class CellSerializerTestCase(TestCase):
@@ -347,6 +835,428 @@ class GameViewsetTestCase(TestCase):
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]["uuid"], str(self.game_1.uuid))
 
+    def test_batch(self):
+        """Many games are created at once, for the requesting user."""
+        self.client.force_login(self.user_1)
+        url = reverse("game-batch")
+        data = {"count": 3, "cols": 5, "rows": 6, "bombs": 7}
+        response = self.client.post(url, data, secure=True)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["uuids"]), 3)
+        self.assertIn("games_per_second", response.data)
+
+        games = Game.objects.filter(uuid__in=response.data["uuids"])
+        self.assertEqual(len(games), 3)
+        for game in games:
+            self.assertEqual(game.player, self.user_1)
+            self.assertEqual(game.as_grid().count_cells(), (7, 0, 0, 0))
+            self.assertEqual(len(game.adjacency), 5 * 6)
+            board = GameSerializer(game).data["board"]
+            self.assertEqual(board, create_covered_board(5, 6))
+
+    def test_batch_limits(self):
+        """Batches are limited in size, and need at least one empty cell."""
+        self.client.force_login(self.user_1)
+        url = reverse("game-batch")
+        for data, field in [
+            ({"count": 1001, "cols": 5, "rows": 5, "bombs": 1}, "count"),
+            ({"count": 1, "cols": 5, "rows": 5, "bombs": 25}, "bombs"),
+        ]:
+            with self.subTest(field):
+                response = self.client.post(url, data, secure=True)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.data)
+
+    def test_api_docs(self):
+        """The API documentation describes every action."""
+        response = self.client.get("/swagger/?format=openapi", secure=True)
+        self.assertEqual(response.status_code, 200)
+        for path in [
+            "/games/{uuid}/cells/{col},{row}/",
+            "/games/{uuid}/cells/{col},{row}/chord/",
+            "/games/{uuid}/moves/",
+            "/games/batch/",
+        ]:
+            self.assertIn(path, response.json()["paths"])
+
+    def create_safe_game(self, cols, rows, bombs):
+        """Create a `safe_first_click` game for user_1."""
+        serializer = GameSerializer(
+            data={"cols": cols, "rows": rows, "bombs": bombs, "safe_first_click": True},
+            context={"request": Mock(user=self.user_1)},
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def patch_cell(self, game, c, r, status):
+        """PATCH the status of a cell as user_1."""
+        self.client.force_login(self.user_1)
+        url = reverse("game-update-cell", args=[game.uuid, c, r])
+        return self.client.patch(
+            url, {"status": status}, content_type="application/json", secure=True
+        )
+
+    def test_safe_first_click_creation(self):
+        """Safe first click games are stored without a board."""
+        game = self.create_safe_game(10, 10, 50)
+        self.assertEqual(game.board, [])
+        self.assertTrue(game.bombs_pending)
+
+        data = GameSerializer(game).data
+        self.assertEqual(data["board"], create_covered_board(10, 10))
+        self.assertEqual((data["cols"], data["rows"], data["bombs"]), (10, 10, 50))
+
+    def test_safe_first_click(self):
+        """The first uncover never hits a bomb, nor its neighbors."""
+        for _ in range(10):
+            game = self.create_safe_game(10, 10, 91)
+            response = self.patch_cell(game, 5, 5, Status.UNCOVERED.value)
+            self.assertEqual(response.status_code, 200)
+
+            game.refresh_from_db()
+            self.assertFalse(game.bombs_pending)
+            self.assertEqual(game.bombs, 91)
+            self.assertEqual(game.uncovered, 9)
+            self.assertTrue(game.won)
+
+    def test_safe_first_click_dense(self):
+        """On boards too dense to spare the neighbors, the cell is still safe."""
+        game = self.create_safe_game(3, 3, 8)
+        self.patch_cell(game, 0, 0, Status.UNCOVERED.value)
+        game.refresh_from_db()
+        self.assertEqual(game.bombs, 8)
+        self.assertFalse(game[0, 0].has_bomb)
+        self.assertTrue(game.won)
+
+    def test_safe_first_click_flag(self):
+        """Cells can be flagged before the bombs are placed."""
+        game = self.create_safe_game(10, 10, 50)
+        self.patch_cell(game, 0, 0, Status.FLAGGED.value)
+        game.refresh_from_db()
+        self.assertTrue(game.bombs_pending)
+        self.assertTrue(game[0, 0].is_flagged)
+
+        self.patch_cell(game, 9, 9, Status.UNCOVERED.value)
+        game.refresh_from_db()
+        self.assertFalse(game.bombs_pending)
+        self.assertTrue(game[0, 0].is_flagged)
+        self.assertEqual(game.bombs, 50)
+        self.assertFalse(game[9, 9].has_bomb)
+
+    def test_update_cell_delta(self):
+        """Updating a cell responds with the changed cells and the game status."""
+        board = create_data_board(4, 3)
+        board[3][2]["bomb"] = True
+        game = Game.objects.create(player=self.user_1, board=board)
+
+        with self.subTest("flag"):
+            response = self.patch_cell(game, 3, 2, Status.FLAGGED.value)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["cells"], [[3, 2, "f"]])
+            self.assertFalse(response.data["finished"])
+
+        with self.subTest("reveal"):
+            response = self.patch_cell(game, 0, 0, Status.UNCOVERED.value)
+            self.assertEqual(len(response.data["cells"]), 11)
+            self.assertIn([0, 0, 0], response.data["cells"])
+            self.assertIn([2, 1, 1], response.data["cells"])
+            self.assertTrue(response.data["won"])
+            self.assertIsNotNone(response.data["finished_at"])
+
+    def test_update_cell_retries_on_conflict(self):
+        """A move that loses a race is applied again to the updated game."""
+        game = Game.objects.create(player=self.user_1, board=create_data_board(2, 2))
+        save_if_unchanged = Game.save_if_unchanged
+
+        def save_after_another_move(instance, cells=None):
+            # Another move is saved right before the first attempt.
+            if save.call_count == 1:
+                other = Game.objects.get(pk=instance.pk)
+                other[1, 1].flag()
+                save_if_unchanged(other)
+            return save_if_unchanged(instance, cells)
+
+        with mock.patch.object(
+            Game,
+            "save_if_unchanged",
+            autospec=True,
+            side_effect=save_after_another_move,
+        ) as save:
+            response = self.patch_cell(game, 0, 0, Status.FLAGGED.value)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(save.call_count, 2)
+        game.refresh_from_db()
+        self.assertEqual(game.version, 2)
+        self.assertEqual(game.flags, 2)
+
+    def test_update_cell_conflict(self):
+        """Moves that keep losing races are rejected with a conflict."""
+        with mock.patch.object(Game, "save_if_unchanged", return_value=False) as save:
+            response = self.patch_cell(self.game_1, 0, 0, Status.FLAGGED.value)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(save.call_count, GameViewset.move_attempts)
+        self.game_1.refresh_from_db()
+        self.assertTrue(self.game_1[0, 0].is_covered)
+
+    def test_chord(self):
+        """Chording responds with the uncovered cells, saved at once."""
+        board = create_data_board(3, 3)
+        board[2][2] = {"bomb": True, "status": Status.FLAGGED.value}
+        board[1][1]["status"] = Status.UNCOVERED.value
+        game = Game.objects.create(player=self.user_1, board=board)
+        self.client.force_login(self.user_1)
+
+        url = reverse("game-chord", args=[game.uuid, 1, 1])
+        response = self.client.post(url, secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["cells"]), 7)
+        self.assertIn([0, 0, 0], response.data["cells"])
+        self.assertTrue(response.data["won"])
+        game.refresh_from_db()
+        self.assertEqual(game.version, 1)
+        self.assertIsNotNone(game.finished_at)
+
+        with self.subTest("finished game"):
+            response = self.client.post(url, secure=True)
+            self.assertEqual(response.status_code, 400)
+
+    def test_chord_bombs_pending(self):
+        """Chording before the bombs are placed uncovers nothing."""
+        self.client.force_login(self.user_1)
+        for engine in BoardEngine:
+            with self.subTest(engine), override_settings(MS_GAME_BOARD_ENGINE=engine):
+                game = self.create_safe_game(5, 5, 5)
+                url = reverse("game-chord", args=[game.uuid, 2, 2])
+                response = self.client.post(url, secure=True)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["cells"], [])
+                self.assertFalse(response.data["finished"])
+                game.refresh_from_db()
+                self.assertTrue(game.bombs_pending)
+
+    def test_board_format(self):
+        """Boards are encoded in the format requested."""
+        board = create_data_board(3, 3)
+        board[1][1]["status"] = Status.FLAGGED.value
+        game = Game.objects.create(player=self.user_1, board=board)
+        self.client.force_login(self.user_1)
+        url = reverse("game-detail", args=[game.uuid])
+        json_board = create_covered_board(3, 3)
+        json_board[1][1] = "f"
+
+        for params, headers, expected in [
+            ({}, {}, json_board),
+            ({"board_format": "rle"}, {}, [9, 4, 10, 1, 9, 4]),
+            ({}, {"HTTP_ACCEPT": "application/json; board=rle"}, [9, 4, 10, 1, 9, 4]),
+            ({"board_format": "packed"}, {}, "mZmpmZA="),
+        ]:
+            with self.subTest(params=params, headers=headers):
+                response = self.client.get(url, params, secure=True, **headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["board"], expected)
+
+        response = self.client.get(url, {"board_format": "xml"}, secure=True)
+        self.assertEqual(response.status_code, 400)
+
+    def post_moves(self, game, *moves):
+        """POST a batch of `(col, row, status)` moves as user_1."""
+        self.client.force_login(self.user_1)
+        url = reverse("game-moves", args=[game.uuid])
+        moves = [{"col": c, "row": r, "status": status} for c, r, status in moves]
+        return self.client.post(
+            url, {"moves": moves}, content_type="application/json", secure=True
+        )
+
+    def test_moves(self):
+        """A batch of moves is saved at once, and responds with all changes."""
+        board = create_data_board(4, 3)
+        board[3][2]["bomb"] = True
+        board[0][2]["bomb"] = True
+        game = Game.objects.create(player=self.user_1, board=board)
+
+        response = self.post_moves(
+            game,
+            (3, 2, Status.FLAGGED.value),
+            (0, 2, Status.FLAGGED.value),
+            (0, 2, None),
+            (3, 1, Status.UNCOVERED.value),
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["applied"], 4)
+        self.assertEqual(response.data["cells"], [[0, 2, "c"], [3, 1, 1], [3, 2, "f"]])
+        game.refresh_from_db()
+        self.assertEqual(game.version, 1)
+        self.assertEqual(game.flags, 1)
+        self.assertEqual(game.uncovered, 1)
+
+    def test_moves_stop_at_game_over(self):
+        """Moves after the one that finishes the game are ignored."""
+        board = create_data_board(3, 3)
+        board[1][1]["bomb"] = True
+        game = Game.objects.create(player=self.user_1, board=board)
+
+        response = self.post_moves(
+            game,
+            (0, 0, Status.FLAGGED.value),
+            (1, 1, Status.UNCOVERED.value),
+            (2, 2, Status.UNCOVERED.value),
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["applied"], 2)
+        self.assertTrue(response.data["finished"])
+        self.assertFalse(response.data["won"])
+        game.refresh_from_db()
+        self.assertTrue(game[2, 2].is_covered)
+
+    def test_moves_invalid(self):
+        """If any move is invalid, none is saved."""
+        board = create_data_board(3, 3)
+        board[2][0]["bomb"] = True
+        board[2][2]["bomb"] = True
+        game = Game.objects.create(player=self.user_1, board=board)
+
+        for moves, index in [
+            ([(0, 0, Status.FLAGGED.value), (5, 0, Status.FLAGGED.value)], 1),
+            ([(0, 0, Status.UNCOVERED.value), (1, 0, Status.FLAGGED.value)], 1),
+            ([(0, 0, 7)], 0),
+        ]:
+            with self.subTest(moves):
+                response = self.post_moves(game, *moves)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(index, response.data["moves"])
+                game.refresh_from_db()
+                self.assertEqual(game.version, 0)
+
+    def test_list_pagination(self):
+        """Pages follow each other through the Link header, newest first."""
+        games = [self.game_1]
+        for _ in range(9):
+            games.append(Game.objects.create(player=self.user_1, board=[[dict()]]))
+        # Games created at the same time are ordered by uuid.
+        Game.objects.filter(pk__in=[game.pk for game in games[3:7]]).update(
+            created_at=games[3].created_at
+        )
+        self.client.force_login(self.user_1)
+
+        url = reverse("game-summary") + "?page_size=4"
+        uuids = []
+        while url:
+            response = self.client.get(url, secure=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data), 4)
+            uuids.extend(game["uuid"] for game in response.data)
+            url = response.get("Link", "")[1:].partition(">")[0]
+
+        expected = Game.objects.filter(player=self.user_1)
+        expected = expected.order_by("-created_at", "-uuid")
+        self.assertEqual(uuids, [str(game.uuid) for game in expected])
+
+    def test_list_cursor_index_scan(self):
+        """Pages after a cursor start the index range scan at the cursor."""
+        self.client.force_login(self.user_1)
+        Game.objects.create(player=self.user_1, board=[[dict()]])
+        url = reverse("game-summary") + "?page_size=1"
+        url = self.client.get(url, secure=True)["Link"][1:].partition(">")[0]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, secure=True).status_code, 200)
+
+        sql = next(q["sql"] for q in queries if "ms_game_game" in q["sql"])
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN " + sql)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        self.assertIn("ms_game_player_created_idx", plan)
+        self.assertRegex(plan, r"Index Cond: .*\(ROW\(created_at, uuid\) <")
+
+    def test_list_invalid_cursor(self):
+        """An invalid cursor is not found."""
+        self.client.force_login(self.user_1)
+        response = self.client.get(reverse("game-list") + "?cursor=nope", secure=True)
+        self.assertEqual(response.status_code, 404)
+
+    def test_retrieve(self):
+        """A player can retrieve its own games, with the board."""
+        self.client.force_login(self.user_1)
+
+        url = reverse("game-detail", args=[self.game_1.uuid])
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["board"], [["c"]])
+
+        url = reverse("game-detail", args=[self.game_2.uuid])
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 403)
+
+    def test_summary(self):
+        """The summary lists the games of the player, without boards."""
+        self.client.force_login(self.user_1)
+        response = self.client.get(reverse("game-summary"), secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["uuid"], str(self.game_1.uuid))
+        self.assertNotIn("board", response.data[0])
+
+    def test_summary_does_not_load_boards(self):
+        """Summaries are built from stored columns only."""
+        serializer = GameSerializer(
+            data={"cols": 10, "rows": 10, "bombs": 10},
+            context={"request": Mock(user=self.user_1)},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        game = Game.objects.defer(*Game.board_fields).get(pk=serializer.instance.pk)
+        with self.assertNumQueries(0):
+            data = GameSummarySerializer(game).data
+        self.assertEqual((data["cols"], data["rows"], data["bombs"]), (10, 10, 10))
+        self.assertEqual((data["finished"], data["won"]), (False, False))
+
+    def test_list_filters(self):
+        """Games can be filtered by their finished and won state."""
+        won = Game.objects.create(
+            player=self.user_1,
+            board=[[{"status": Status.UNCOVERED.value}, {"bomb": True}]],
+            finished_at=timezone.now(),
+        )
+        lost = Game.objects.create(
+            player=self.user_1,
+            board=[[{"status": Status.UNCOVERED.value, "bomb": True}, {}]],
+            finished_at=timezone.now(),
+        )
+        for game in [self.game_1, won, lost]:
+            game.count_cells()
+            game.save()
+        self.client.force_login(self.user_1)
+        url = reverse("game-list")
+
+        cases = [
+            ("finished=true", {won, lost}),
+            ("finished=false", {self.game_1}),
+            ("won=true", {won}),
+            ("won=false", {self.game_1, lost}),
+            ("finished=true&won=false", {lost}),
+        ]
+        for query, expected in cases:
+            with self.subTest(query):
+                response = self.client.get(F"{url}?{query}", secure=True)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    {game["uuid"] for game in response.data},
+                    {str(game.uuid) for game in expected},
+                )
+
+        with self.subTest("invalid"):
+            response = self.client.get(F"{url}?won=maybe", secure=True)
+            self.assertEqual(response.status_code, 400)
+
     def test_recursive_uncovering(self):
         """Cells with no neighboring bombs are recursively uncovered."""
         board = create_data_board(100, 100)
@@ -370,3 +1280,1047 @@ class GameViewsetTestCase(TestCase):
         with self.subTest("almost border"):
             self.assertTrue(game[97, 98].is_covered)
             self.assertTrue(game[97, 99].is_covered)
+
+
+class RevealTestCase(TestCase):
+    """Test the reveal engine."""
+
+    def setUp(self):
+        """Set up common test data."""
+        board = create_data_board(5, 5)
+        board[4][4]["bomb"] = True
+        board[0][0]["status"] = Status.UNCOVERED.value
+        self.game = Game(board=board)
+
+    def test_returns_uncovered_cells(self):
+        """The reveal returns exactly the cells it uncovered."""
+        self.game[1, 1].flag()
+        uncovered = uncover_neighbors(self.game, (0, 0))
+
+        expected = {key for key, _ in self.game.cells if key not in {(0, 0), (4, 4)}}
+        self.assertEqual(uncovered, expected)
+        with self.subTest("flagged cells are uncovered"):
+            self.assertFalse(self.game[1, 1].is_covered)
+
+    def test_visits_each_cell_once(self):
+        """Every cell is looked up at most once."""
+        with mock.patch.object(
+            Game, "cell_at", autospec=True, side_effect=Game.cell_at
+        ) as cell_at:
+            uncover_neighbors(self.game, (0, 0))
+
+        indexes = [call.args[1] for call in cell_at.call_args_list]
+        self.assertEqual(len(indexes), len(set(indexes)))
+
+    def test_stops_at_adjacent_bombs(self):
+        """Nothing is uncovered from a cell with adjacent bombs."""
+        self.game[3, 3].uncover()
+        self.assertEqual(uncover_neighbors(self.game, (3, 3)), set())
+
+    def test_covered_cell(self):
+        """Nothing is uncovered from a covered cell."""
+        self.assertEqual(uncover_neighbors(self.game, (2, 2)), set())
+        self.assertEqual(self.game.uncovered, 1)
+
+    def test_chord(self):
+        """Chording uncovers the unflagged neighbors, and reveals from them."""
+        self.game[3, 3].uncover()
+        self.game[4, 4].flag()
+
+        uncovered = chord(self.game, (3, 3))
+
+        expected = {key for key, _ in self.game.cells if key not in {(0, 0), (3, 3)}}
+        self.assertEqual(uncovered, expected - {(4, 4)})
+        self.assertTrue(self.game[4, 4].is_flagged)
+        self.assertTrue(self.game.won)
+
+    def test_chord_wrong_flag(self):
+        """Chording with a wrong flag uncovers the bomb."""
+        self.game[3, 3].uncover()
+        self.game[3, 4].flag()
+
+        uncovered = chord(self.game, (3, 3))
+
+        self.assertIn((4, 4), uncovered)
+        self.assertTrue(self.game.finished)
+        self.assertFalse(self.game.won)
+
+    def test_chord_unsatisfied(self):
+        """Nothing is uncovered unless the flags match the adjacent bombs."""
+        self.game[3, 3].uncover()
+        for key in [(2, 2), (1, 1), (3, 4)]:
+            with self.subTest(key):
+                self.assertEqual(chord(self.game, key), set())
+            self.game[3, 4].flag()
+            self.game[4, 4].flag()
+        self.assertEqual(self.game.uncovered, 2)
+
+
+class HintsTestCase(TestCase):
+    """Test the hints for safe cells."""
+
+    def setUp(self):
+        """Set up a game with a row of covered cells, and two bombs in it."""
+        for alias in [settings.MS_GAME_HINT_CACHE, settings.MS_GAME_CACHE]:
+            caches[alias].clear()
+        self.user = User.objects.create_user("user@example.com")
+        board = create_data_board(3, 3)
+        board[0][0]["bomb"] = True
+        board[2][0]["bomb"] = True
+        self.game = Game.objects.create(player=self.user, board=board)
+        self.client.force_login(self.user)
+
+    def uncover(self, c, r):
+        """Uncover a cell of the game."""
+        url = reverse("game-update-cell", args=[self.game.uuid, c, r])
+        data = {"status": Status.UNCOVERED.value}
+        return self.client.patch(
+            url, data, content_type="application/json", secure=True
+        )
+
+    def get_hint(self):
+        """Return the response to a hint for the game."""
+        return self.client.get(reverse("game-hint", args=[self.game.uuid]), secure=True)
+
+    def test_hint(self):
+        """Hints are safe cells, found by comparing the numbers."""
+        response = self.get_hint()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"cell": None})
+
+        self.uncover(1, 2)
+        self.assertEqual(self.get_hint().data, {"cell": [1, 0]})
+
+    def test_incremental(self):
+        """Moves update the cached solver, which is not built again."""
+        self.uncover(0, 1)
+        self.assertEqual(self.get_hint().data, {"cell": None})
+        with mock.patch.object(hints, "build_solver") as build_solver:
+            self.uncover(1, 2)
+            response = self.get_hint()
+        build_solver.assert_not_called()
+        self.assertEqual(response.data, {"cell": [1, 0]})
+
+        version, solver = caches[settings.MS_GAME_HINT_CACHE].get(
+            hints.KEY_PREFIX + str(self.game.uuid)
+        )
+        self.game.refresh_from_db()
+        self.assertEqual(version, self.game.version)
+        self.assertEqual(set(bits(solver.mines)), {0, 6})
+
+    def test_missed_move(self):
+        """The solver is built again when it missed a move."""
+        self.uncover(2, 2)
+        self.get_hint()
+        game = Game.objects.get(uuid=self.game.uuid)
+        game[0, 2].uncover()
+        game.save_if_unchanged([(0, 2)])
+        caches[settings.MS_GAME_CACHE].clear()
+
+        self.uncover(1, 1)
+        self.assertEqual(self.get_hint().data, {"cell": [1, 0]})
+
+    def test_finished(self):
+        """Finished games get no hints."""
+        self.uncover(0, 0)
+        self.assertEqual(self.get_hint().status_code, 400)
+
+    def test_safe_first_click(self):
+        """Before the bombs are placed, the center cell is safe."""
+        self.game = Game.objects.create(
+            player=self.user, board=[], col_count=5, row_count=4, safe_first_click=True
+        )
+        self.assertEqual(self.get_hint().data, {"cell": [2, 2]})
+
+    def test_safe_first_click_flagged(self):
+        """Before the bombs are placed, flagged cells are not hints."""
+        serializer = GameSerializer(
+            data={"cols": 5, "rows": 5, "bombs": 5, "safe_first_click": True},
+            context={"request": Mock(user=self.user)},
+        )
+        serializer.is_valid(raise_exception=True)
+        self.game = serializer.save()
+        url = reverse("game-update-cell", args=[self.game.uuid, 2, 2])
+        data = {"status": Status.FLAGGED.value}
+        self.client.patch(url, data, content_type="application/json", secure=True)
+
+        cell = self.get_hint().data["cell"]
+        self.assertNotEqual(cell, [2, 2])
+        self.assertEqual(max(abs(cell[0] - 2), abs(cell[1] - 2)), 1)
+
+
+class BoardFormatsTestCase(TestCase):
+    """Test the compact board formats."""
+
+    values = [0, 1, 2, 3, 4, 5, 6, 7, 8, "c", "f", "*"]
+
+    def setUp(self):
+        """Set up a board with cells in every state."""
+        rng = random.Random(0)
+        board = GameSerializer._get_new_data_board(7, 9)
+        GameSerializer._populate_board_with_bombs(board, 15, rng)
+        for column in board:
+            for cell_data in column:
+                cell_data["status"] = rng.choice([None, "F", "U"])
+        self.board = board
+
+    def decode(self, codes, cols, rows):
+        """Return the nested board for a list of cell codes."""
+        values = [self.values[code] for code in codes]
+        return [values[c * rows : (c + 1) * rows] for c in range(cols)]
+
+    def test_formats(self):
+        """Compact boards decode to the same board as the JSON one."""
+        for engine in BoardEngine:
+            with self.subTest(engine), override_settings(MS_GAME_BOARD_ENGINE=engine):
+                game = Game(board=self.board)
+                expected = GameSerializer(game).data["board"]
+
+                runs = encode_board(game, "rle")
+                codes = [
+                    code
+                    for code, length in zip(runs[0::2], runs[1::2])
+                    for _ in range(length)
+                ]
+                self.assertEqual(self.decode(codes, 7, 9), expected)
+
+                packed = base64.b64decode(encode_board(game, "packed"))
+                codes = [code for byte in packed for code in divmod(byte, 16)]
+                self.assertEqual(self.decode(codes[: 7 * 9], 7, 9), expected)
+
+    def test_runs(self):
+        """Runs of cells with the same code are encoded once."""
+        game = Game(board=create_data_board(4, 5))
+        self.assertEqual(encode_board(game, "rle"), [9, 20])
+        game[0, 0].flag()
+        self.assertEqual(encode_board(game, "rle"), [10, 1, 9, 19])
+
+    def test_pending_bombs(self):
+        """Games without a board are all covered."""
+        game = Game(packed_board=Grid(0, 0).pack(), col_count=3, row_count=3)
+        self.assertEqual(encode_board(game, "rle"), [9, 9])
+        packed = base64.b64decode(encode_board(game, "packed"))
+        self.assertEqual(packed, b"\x99" * 4 + b"\x90")
+
+
+class PushTestCase(TestCase):
+    """Test the game updates pushed to subscribers."""
+
+    def setUp(self):
+        """Set up a game, and a token to subscribe to it."""
+        self.user = User.objects.create_user("user@example.com")
+        self.game = Game.objects.create(player=self.user, board=create_data_board(3, 3))
+        self.uuid = str(self.game.uuid)
+        self.token = push.subscription_token(self.game)
+
+    def subscribe(self, scope_type, channel, token, messages, **scope):
+        """Subscribe to the game, publish `messages`, and return what was sent."""
+        scope = {
+            "type": scope_type,
+            "path": "/" + push.subscription_path(self.uuid, channel),
+            "query_string": F"token={token}".encode(),
+            "headers": [],
+            **scope,
+        }
+        disconnect = {"type": F"{scope_type}.disconnect"}
+
+        async def run():
+            received = asyncio.Queue()
+            if scope_type == "websocket":
+                received.put_nowait({"type": "websocket.connect"})
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            task = asyncio.ensure_future(
+                push.PushRouter(None)(scope, received.get, send)
+            )
+            while not sent and not task.done():
+                await asyncio.sleep(0)
+            for message in messages:
+                push.get_broker().publish(self.uuid, message)
+            while len(sent) < 1 + len(messages) and not task.done():
+                await asyncio.sleep(0)
+            received.put_nowait(disconnect)
+            await task
+            return sent
+
+        return asyncio.run(run())
+
+    def test_broker(self):
+        """Messages are delivered to the subscribers of the game, from any thread."""
+
+        def publish():
+            try:
+                push.publish(self.game, {"cells": []})
+            finally:
+                connection.close()
+
+        async def run():
+            async with push.get_broker().subscribe(self.uuid) as queue:
+                thread = threading.Thread(target=publish)
+                thread.start()
+                thread.join()
+                push.get_broker().publish("other", {"cells": [1]})
+                return await asyncio.wait_for(queue.get(), 1)
+
+        self.assertEqual(asyncio.run(run()), {"cells": []})
+        self.assertEqual(push.get_broker()._subscribers, {})
+
+    def test_server_sent_events(self):
+        """Messages are streamed as Server-Sent Events."""
+        sent = self.subscribe("http", "events", self.token, [{"cells": []}, None])
+
+        self.assertEqual(sent[0]["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), sent[0]["headers"])
+        self.assertEqual(
+            [message["body"] for message in sent[1:]],
+            [b'data: {"cells": []}\n\n', b"data: null\n\n"],
+        )
+
+    def test_websocket(self):
+        """Messages are sent over a WebSocket."""
+        sent = self.subscribe("websocket", "socket", self.token, [{"cells": []}])
+
+        self.assertEqual(sent[0], {"type": "websocket.accept"})
+        self.assertEqual(sent[1], {"type": "websocket.send", "text": '{"cells": []}'})
+
+    @override_settings(MS_GAME_PUSH_PREFIX="push/")
+    def test_prefix(self):
+        """Subscriptions are served below the prefix, inside the root path."""
+        path = F"/push/{self.uuid}/events/"
+        sent = self.subscribe("http", "events", self.token, [], path=path)
+        self.assertEqual(sent[0]["status"], 200)
+
+        sent = self.subscribe(
+            "http", "events", self.token, [], path="/api" + path, root_path="/api"
+        )
+        self.assertEqual(sent[0]["status"], 200)
+
+    def test_invalid_token(self):
+        """Subscriptions need a token for the game."""
+        other = Game.objects.create(player=self.user, board=create_data_board(3, 3))
+        for token in ["", "nope", push.subscription_token(other)]:
+            with self.subTest(token):
+                sent = self.subscribe("http", "events", token, [])
+                self.assertEqual(sent[0]["status"], 403)
+
+                sent = self.subscribe("websocket", "socket", token, [])
+                self.assertEqual(sent, [{"type": "websocket.close", "code": 4403}])
+
+    def test_push_urls(self):
+        """Players get the URLs to subscribe to their games."""
+        self.client.force_login(self.user)
+        url = reverse("game-push", args=[self.uuid])
+        response = self.client.get(url, secure=True, **{push.ENVIRON_KEY: True})
+
+        self.assertEqual(response.status_code, 200)
+        events, socket = response.data["events"], response.data["socket"]
+        self.assertTrue(events.startswith(F"https://testserver/games/{self.uuid}/"))
+        self.assertTrue(socket.startswith(F"wss://testserver/games/{self.uuid}/"))
+        self.assertTrue(push.check_token(events.split("token=")[1], self.uuid))
+
+        self.client.force_login(User.objects.create_user("other@example.com"))
+        response = self.client.get(reverse("game-push", args=[self.uuid]), secure=True)
+        self.assertIn(response.status_code, [403, 404])
+
+    @override_settings(MS_GAME_PUSH_PREFIX="push/")
+    def test_push_urls_script_name(self):
+        """The URLs are below the script name and the configured prefix."""
+        self.client.force_login(self.user)
+        url = reverse("game-push", args=[self.uuid])
+        # The test client skips WSGIHandler, which sets the prefix from SCRIPT_NAME.
+        set_script_prefix("/api/")
+        self.addCleanup(set_script_prefix, "/")
+        response = self.client.get(url, secure=True, **{push.ENVIRON_KEY: True})
+
+        events, socket = response.data["events"], response.data["socket"]
+        self.assertTrue(events.startswith(F"https://testserver/api/push/{self.uuid}/"))
+        self.assertTrue(socket.startswith(F"wss://testserver/api/push/{self.uuid}/"))
+
+    def test_push_urls_without_asgi(self):
+        """Without the ASGI application nobody serves subscriptions, so no URLs."""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("game-push", args=[self.uuid]), secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"events": None, "socket": None})
+
+    def test_subscribable(self):
+        """Requests to the WSGI application served next to PushRouter are marked."""
+        environs = []
+        application = push.subscribable(lambda environ, start: environs.append(environ))
+        application({}, None)
+        self.assertEqual(environs, [{push.ENVIRON_KEY: True}])
+
+    def test_moves_are_pushed(self):
+        """The delta of every saved move is published."""
+        self.client.force_login(self.user)
+        url = reverse("game-update-cell", args=[self.uuid, 0, 0])
+        with mock.patch.object(push, "publish") as publish:
+            response = self.client.patch(
+                url, {"status": "F"}, content_type="application/json", secure=True
+            )
+
+        publish.assert_called_once_with(mock.ANY, response.data)
+        self.assertEqual(publish.call_args.args[0].pk, self.game.pk)
+
+
+class PostgresBrokerTestCase(TransactionTestCase):
+    """Test the broker that pushes updates through Postgres."""
+
+    def test_publish(self):
+        """Messages are delivered through the database, or replaced if too big."""
+        broker = push.PostgresBroker()
+        self.addCleanup(broker.close)
+
+        def publish():
+            try:
+                broker.publish("game", {"cells": []})
+                broker.publish("game", {"cells": ["x" * 8000]})
+            finally:
+                connection.close()
+
+        async def run():
+            async with broker.subscribe("game") as queue:
+                thread = threading.Thread(target=publish)
+                thread.start()
+                thread.join()
+                return [await asyncio.wait_for(queue.get(), 5) for _ in range(2)]
+
+        self.assertEqual(asyncio.run(run()), [{"cells": []}, None])
+
+    @override_settings(MS_GAME_PUSH_BROKER="ms_game.push.PostgresBroker")
+    def test_publish_on_commit(self):
+        """Moves are published once committed, and not at all if rolled back."""
+        broker = push.get_broker()
+        self.addCleanup(push._brokers.pop, settings.MS_GAME_PUSH_BROKER)
+        self.addCleanup(broker.close)
+        game = Mock(pk="game")
+
+        def publish():
+            try:
+                with self.assertRaises(ValueError), transaction.atomic():
+                    push.publish(game, {"cells": [1]})
+                    raise ValueError
+                with transaction.atomic():
+                    push.publish(game, {"cells": [2]})
+            finally:
+                connection.close()
+
+        async def run():
+            async with broker.subscribe("game") as queue:
+                thread = threading.Thread(target=publish)
+                thread.start()
+                thread.join()
+                return await asyncio.wait_for(queue.get(), 5), queue.empty()
+
+        self.assertEqual(asyncio.run(run()), ({"cells": [2]}, True))
+
+
+class AsgiTestCase(TransactionTestCase):
+    """Test the games API served by the ASGI application."""
+
+    def test_requests_in_threads(self):
+        """Each request is handled, iterated and closed in a thread of its own."""
+        from minesweeper_api.asgi import ThreadSensitive
+
+        # Both requests must be running at once to get past the barrier.
+        barrier = threading.Barrier(2, timeout=5)
+        threads = []
+
+        class Response:
+            def __init__(self, path):
+                self.path = path
+
+            def __iter__(self):
+                threads.append((self.path, threading.get_ident()))
+                yield self.path.encode()
+
+            def close(self):
+                threads.append((self.path, threading.get_ident()))
+
+        def wsgi_application(environ, start_response):
+            threads.append((environ["PATH_INFO"], threading.get_ident()))
+            barrier.wait()
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return Response(environ["PATH_INFO"])
+
+        async def request(path):
+            scope = {
+                "type": "http",
+                "http_version": "1.1",
+                "method": "GET",
+                "path": path,
+                "query_string": b"",
+                "headers": [],
+            }
+            received = asyncio.Queue()
+            received.put_nowait({"type": "http.request", "body": b""})
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            await ThreadSensitive(wsgi_application)(scope, received.get, send)
+            return sent[0]["status"], b"".join(m.get("body", b"") for m in sent[1:])
+
+        async def run():
+            return await asyncio.gather(request("/a/"), request("/b/"))
+
+        self.assertEqual(asyncio.run(run()), [(200, b"/a/"), (200, b"/b/")])
+        request_threads = {
+            path: {thread for other, thread in threads if other == path}
+            for path in ["/a/", "/b/"]
+        }
+        self.assertEqual(len(threads), 6)
+        self.assertEqual([len(ids) for ids in request_threads.values()], [1, 1])
+        self.assertNotEqual(request_threads["/a/"], request_threads["/b/"])
+
+    def test_concurrent_requests(self):
+        """Concurrent requests each use the database from their own thread."""
+        from minesweeper_api.asgi import application
+
+        user = User.objects.create_user("user@example.com")
+        games = [
+            Game.objects.create(player=user, board=create_data_board(3, 3))
+            for _ in range(3)
+        ]
+        credentials = base64.b64encode(b"user@example.com:")
+        headers = [
+            (b"authorization", b"Basic " + credentials),
+            (b"content-type", b"application/json"),
+            (b"x-forwarded-proto", b"https"),
+        ]
+
+        async def request(method, path, body=None):
+            body = json.dumps(body).encode() if body is not None else b""
+            scope = {
+                "type": "http",
+                "http_version": "1.1",
+                "method": method,
+                "path": path,
+                "root_path": "",
+                "query_string": b"",
+                "headers": [*headers, (b"content-length", b"%d" % len(body))],
+                "server": ("testserver", 443),
+            }
+            received = asyncio.Queue()
+            received.put_nowait({"type": "http.request", "body": body})
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            await application(scope, received.get, send)
+            return sent[0]["status"]
+
+        async def run():
+            requests = [request("GET", "/games/")]
+            for game in games:
+                url = F"/games/{game.uuid}/cells/0,0/"
+                requests += [
+                    request("POST", "/games/", {"cols": 3, "rows": 3, "bombs": 1}),
+                    request("PATCH", url, {"status": Status.FLAGGED.value}),
+                ]
+            return await asyncio.gather(*requests)
+
+        # Close the connection of each thread after its request, so the test
+        # database can be dropped.
+        database = connection.settings_dict
+        with mock.patch.dict(database, CONN_MAX_AGE=0):
+            statuses = asyncio.run(run())
+
+        self.assertEqual(statuses, [200] + [201, 200] * len(games))
+        self.assertEqual(Game.objects.filter(player=user).count(), 2 * len(games))
+        for game in games:
+            game.refresh_from_db()
+            self.assertTrue(game[0, 0].is_flagged)
+
+
+class SizeBoundedLRUCacheTestCase(TestCase):
+    """Test the in-process cache bounded by size."""
+
+    def setUp(self):
+        """Set up a small cache."""
+        self.cache = SizeBoundedLRUCache("test", {"OPTIONS": {"MAX_BYTES": 300}})
+        self.cache.clear()
+
+    def test_evicts_least_recently_used(self):
+        """Values are evicted, least recently used first, to fit the size."""
+        for key in "abc":
+            self.cache.set(key, bytes(80))
+        self.cache.get("a")
+        self.cache.set("d", bytes(80))
+
+        self.assertEqual([k for k in "abcd" if self.cache.has_key(k)], ["a", "c", "d"])
+        self.assertLessEqual(self.cache.size, 300)
+
+    def test_too_big(self):
+        """Values bigger than the cache are not cached."""
+        self.cache.set("a", bytes(10))
+        self.cache.set("b", bytes(1000))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), bytes(10))
+
+    def test_expiry(self):
+        """Expired values are not returned."""
+        self.cache.set("a", 1, timeout=-1)
+        self.cache.set("b", 2)
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("b"), 2)
+
+
+class EmailAuthTestCase(TestCase):
+    """Test the authentication by email."""
+
+    def setUp(self):
+        """Set up common test data."""
+        for alias in settings.MS_GAME_USER_CACHES:
+            caches[alias].clear()
+        self.auth = EmailAuth()
+
+    def test_creates_user(self):
+        """Users are created on their first request, with a lowercase username."""
+        user, __ = self.auth.authenticate_credentials("Player@Example.com", "")
+        self.assertEqual(user.username, "player@example.com")
+        self.assertTrue(User.objects.filter(pk=user.pk).exists())
+
+    def test_invalid_email(self):
+        """Only emails are accepted."""
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials("player", "")
+
+    def test_cached(self):
+        """Users are read from the caches after their first request."""
+        authenticate = self.auth.authenticate_credentials
+        user, __ = authenticate("player@example.com", "")
+        with self.assertNumQueries(0):
+            cached, __ = authenticate("PLAYER@example.com", "")
+        self.assertEqual(cached, user)
+
+        with self.subTest("shared cache"):
+            caches[settings.MS_GAME_USER_CACHES[0]].clear()
+            with self.assertNumQueries(0):
+                cached, __ = authenticate("player@example.com", "")
+            self.assertEqual(cached, user)
+
+    @override_settings(MS_GAME_EMAIL_AUTH_IGNORE_CONFLICTS=True)
+    def test_ignore_conflicts(self):
+        """Users can be created ignoring conflicts with concurrent requests."""
+        with CaptureQueriesContext(connection) as queries:
+            user, __ = self.auth.authenticate_credentials("player@example.com", "")
+        self.assertEqual(user.username, "player@example.com")
+        self.assertTrue(any("ON CONFLICT DO NOTHING" in q["sql"] for q in queries))
+
+        with self.subTest("created by another request"):
+            caches[settings.MS_GAME_USER_CACHES[0]].clear()
+            caches[settings.MS_GAME_USER_CACHES[1]].clear()
+            with mock.patch.object(
+                User.objects, "get", side_effect=[User.DoesNotExist, user]
+            ):
+                other, __ = self.auth.authenticate_credentials("player@example.com", "")
+            self.assertEqual(other, user)
+            self.assertEqual(User.objects.filter(username=user.username).count(), 1)
+
+    def test_invalidation(self):
+        """Deleted users are removed from the caches."""
+        user, __ = self.auth.authenticate_credentials("player@example.com", "")
+        user.delete()
+        new_user, __ = self.auth.authenticate_credentials("player@example.com", "")
+        self.assertNotEqual(new_user.pk, user.pk)
+
+
+class ProvisionPlayersTestCase(TestCase):
+    """Test the command to create players in bulk."""
+
+    def provision(self, *emails, batch_size=2):
+        """Run the command with the emails in stdin, and return its output."""
+        stdout, stderr = StringIO(), StringIO()
+        with mock.patch("sys.stdin", StringIO("\n".join(emails))):
+            call_command(
+                "provision_players", batch_size=batch_size, stdout=stdout, stderr=stderr
+            )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_provision(self):
+        """Players are created once, with lowercase usernames."""
+        User.objects.create_user("old@example.com")
+        stdout, stderr = self.provision(
+            "a@example.com", "B@example.com", "", "old@example.com", "b@example.com"
+        )
+
+        self.assertIn("Created 2 players", stdout)
+        self.assertEqual(
+            set(User.objects.values_list("username", flat=True)),
+            {"a@example.com", "b@example.com", "old@example.com"},
+        )
+
+    def test_concurrent_players(self):
+        """Players that conflict on insert, created by others, are not counted."""
+        User.objects.create_user("a@example.com")
+        # As if it was created after the command looked for existing players.
+        with mock.patch.object(QuerySet, "values_list", return_value=[]):
+            stdout, stderr = self.provision("a@example.com", "b@example.com")
+
+        self.assertIn("Created 1 players", stdout)
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_invalid_emails(self):
+        """Invalid emails are reported, and skipped."""
+        stdout, stderr = self.provision("a@example.com", "nope")
+        self.assertIn("Invalid email: nope", stderr)
+        self.assertIn("skipped 1 invalid", stdout)
+        self.assertEqual(User.objects.count(), 1)
+
+
+class CreateGamesTestCase(TestCase):
+    """Test the command to create games in bulk."""
+
+    def test_create_games(self):
+        """Games are created in batches, for a new or existing player."""
+        stdout = StringIO()
+        call_command(
+            "create_games",
+            "Player@example.com",
+            5,
+            cols=4,
+            rows=3,
+            bombs=2,
+            batch_size=2,
+            seed=0,
+            stdout=stdout,
+        )
+
+        games = Game.objects.filter(player__username="player@example.com")
+        self.assertEqual(games.count(), 5)
+        self.assertEqual(stdout.getvalue().count("games/s"), 3)
+        counts = {game.as_grid().count_cells() for game in games}
+        self.assertEqual(counts, {(2, 0, 0, 0)})
+
+    def test_invalid_bombs(self):
+        """Boards without empty cells are refused."""
+        with self.assertRaises(CommandError):
+            call_command("create_games", "player@example.com", 1, bombs=100)
+        self.assertFalse(Game.objects.exists())
+
+
+@override_settings(MS_GAME_POOL_CONFIGS=[(4, 3, 2)])
+class BoardPoolTestCase(TransactionTestCase):
+    """Test the pool of ready-made boards, counted once games are committed."""
+
+    def setUp(self):
+        """Set up a player."""
+        self.user = User.objects.create_user("user@example.com")
+
+    def test_claim_board(self):
+        """Boards are claimed once, counting hits and misses."""
+        self.assertEqual(pool.fill_pool(4, 3, 2, 2, random.Random(0)), 2)
+        self.assertEqual(pool.fill_pool(4, 3, 2, 2), 0)
+
+        boards = [pool.claim_board(4, 3, 2) for _ in range(3)]
+        self.assertEqual(len({board.pk for board in boards[:2]}), 2)
+        self.assertIsNone(boards[2])
+        grid = Grid.unpack(bytes(boards[0].packed_board))
+        self.assertEqual(grid.count_cells(), (2, 0, 0, 0))
+        self.assertEqual(bytes(boards[0].adjacency), grid.count_adjacent_bombs())
+        self.assertEqual(
+            pool.stats(), [{"config": "4x3x2", "size": 0, "hits": 2, "misses": 1}]
+        )
+
+        with self.subTest("not pooled"), self.assertNumQueries(0):
+            self.assertIsNone(pool.claim_board(4, 3, 3))
+
+    def test_stats_shared(self):
+        """Claims from every connection are counted, unless rolled back."""
+
+        def claim():
+            try:
+                pool.claim_board(4, 3, 2)
+            finally:
+                connection.close()
+
+        with self.assertRaises(ValueError), transaction.atomic():
+            pool.claim_board(4, 3, 2)
+            raise ValueError
+        threads = [threading.Thread(target=claim) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(PoolStats.objects.get().misses, 4)
+        self.assertEqual(pool.stats()[0]["misses"], 4)
+
+    def test_create_game(self):
+        """New games claim their board from the pool, or generate it."""
+        pool.fill_pool(4, 3, 2, 1)
+        pooled = PooledBoard.objects.get()
+        self.client.force_login(self.user)
+
+        data = {"cols": 4, "rows": 3, "bombs": 2}
+        uuids = []
+        for _ in range(2):
+            response = self.client.post(reverse("game-list"), data, secure=True)
+            self.assertEqual(response.status_code, 201)
+            uuids.append(response.data["uuid"])
+
+        games = [Game.objects.get(uuid=uuid) for uuid in uuids]
+        self.assertEqual(bytes(games[0].packed_board), bytes(pooled.packed_board))
+        self.assertEqual(bytes(games[0].adjacency), bytes(pooled.adjacency))
+        for game in games:
+            self.assertEqual(game.as_grid().count_cells(), (2, 0, 0, 0))
+        self.assertFalse(PooledBoard.objects.exists())
+        self.assertEqual(pool.stats()[0]["hits"], 1)
+        self.assertEqual(pool.stats()[0]["misses"], 1)
+
+    def test_fill_board_pool(self):
+        """The command fills the pool of the given configurations."""
+        stdout = StringIO()
+        call_command("fill_board_pool", "5x5x3", "4x3x2", size=2, stdout=stdout)
+
+        self.assertEqual(PooledBoard.objects.count(), 4)
+        self.assertIn("Added 2 5x5x3 boards.", stdout.getvalue())
+        self.assertIn("4x3x2: 2 boards, 0 hits, 0 misses.", stdout.getvalue())
+
+        for config in ["5x5", "3x3x9"]:
+            with self.subTest(config), self.assertRaises(CommandError):
+                call_command("fill_board_pool", config)
+
+
+@override_settings(MS_GAME_POOL_CONFIGS=[(4, 3, 2)])
+class BoardPoolClaimTestCase(TransactionTestCase):
+    """Test boards claimed at the same time."""
+
+    def test_skip_locked(self):
+        """Boards being claimed are skipped, instead of waited for."""
+        pool.fill_pool(4, 3, 2, 2)
+        claimed = threading.Event()
+        done = threading.Event()
+        boards = {}
+
+        def claim():
+            try:
+                with transaction.atomic():
+                    boards["thread"] = pool.claim_board(4, 3, 2)
+                    claimed.set()
+                    done.wait(5)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=claim)
+        thread.start()
+        try:
+            claimed.wait(5)
+            boards["main"] = pool.claim_board(4, 3, 2)
+            boards["empty"] = pool.claim_board(4, 3, 2)
+        finally:
+            done.set()
+            thread.join()
+
+        self.assertNotEqual(boards["main"].pk, boards["thread"].pk)
+        self.assertIsNone(boards["empty"])
+        self.assertFalse(PooledBoard.objects.exists())
+
+
+class ExportTestCase(TestCase):
+    """Test the export of games."""
+
+    def setUp(self):
+        """Set up a won, a lost and an unfinished game."""
+        self.user = User.objects.create_user("user@example.com")
+        other = User.objects.create_user("other@example.com")
+        self.won = Game.objects.create(
+            player=self.user,
+            board=[[{"status": Status.UNCOVERED.value}, {"bomb": True}]],
+        )
+        self.won.finished_at = self.won.created_at + timedelta(seconds=90)
+        self.lost = Game.objects.create(
+            player=self.user,
+            board=[[{"status": Status.UNCOVERED.value, "bomb": True}, {}]],
+        )
+        self.lost.finished_at = self.lost.created_at + timedelta(seconds=5)
+        self.playing = Game.objects.create(player=other, board=create_data_board(2, 3))
+        for game in [self.won, self.lost, self.playing]:
+            game.col_count, game.row_count = game.cols, game.rows
+            game.count_cells()
+            game.save()
+
+    def test_ndjson(self):
+        """Games are streamed as JSON lines, oldest first, for the player only."""
+        self.client.force_login(self.user)
+        url = reverse("game-export", args=["ndjson"])
+        response = self.client.get(url, secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        content = b"".join(response.streaming_content).decode()
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [row["uuid"] for row in rows], [str(self.won.uuid), str(self.lost.uuid)]
+        )
+        self.assertEqual(
+            {key: rows[0][key] for key in ["cols", "rows", "bombs", "won", "duration"]},
+            {"cols": 1, "rows": 2, "bombs": 1, "won": True, "duration": 90},
+        )
+        self.assertEqual((rows[1]["finished"], rows[1]["won"]), (True, False))
+
+    def test_csv_filters(self):
+        """Games can be exported as CSV, and filtered."""
+        self.client.force_login(self.user)
+        url = reverse("game-export", args=["csv"])
+        response = self.client.get(url + "?won=false", secure=True)
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ",".join(EXPORT_FIELDS))
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(str(self.lost.uuid)))
+
+    def test_command(self):
+        """The command exports every game."""
+        stdout = StringIO()
+        call_command("export_games", stdout=stdout)
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[2]["player"], "other@example.com")
+        self.assertIsNone(rows[2]["duration"])
+
+        stdout = StringIO()
+        call_command(
+            "export_games", format="csv", player="USER@example.com", stdout=stdout
+        )
+        self.assertEqual(len(stdout.getvalue().splitlines()), 3)
+
+
+class GameCacheTestCase(TestCase):
+    """Test the cache of Game instances."""
+
+    def setUp(self):
+        """Set up common test data."""
+        game_cache.cache.clear()
+        self.user = User.objects.create_user("user@example.com")
+        board = create_data_board(3, 3)
+        board[1][1]["bomb"] = True
+        self.game = Game.objects.create(player=self.user, board=board)
+
+    def test_get(self):
+        """Cached games are new instances, with the same data."""
+        game_cache.set(self.game)
+        with self.assertNumQueries(0):
+            game = game_cache.get(self.game.uuid)
+            self.assertIsNot(game, self.game)
+            self.assertEqual(game.board, self.game.board)
+            self.assertEqual(game.adjacent_bombs, self.game.adjacent_bombs)
+        self.assertIsNone(game_cache.get(self.user.pk))
+
+    def test_invalidation(self):
+        """Saved and deleted games are removed from the cache."""
+        game_cache.set(self.game)
+        self.game.save()
+        self.assertIsNone(game_cache.get(self.game.uuid))
+
+        game_cache.set(self.game)
+        self.game.delete()
+        self.assertIsNone(game_cache.get(self.game.uuid))
+
+    def test_retrieve_from_cache(self):
+        """Retrieving a game twice loads its board from the database once."""
+        self.client.force_login(self.user)
+        url = reverse("game-detail", args=[self.game.uuid])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, secure=True)
+        first = len(queries)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, secure=True)
+        # Only the version of the game is read.
+        self.assertEqual(len(queries), first)
+        self.assertFalse(any("board" in query["sql"] for query in queries))
+        self.assertEqual(response.status_code, 200)
+
+        with self.subTest("other players"):
+            self.client.force_login(User.objects.create_user("other@example.com"))
+            self.assertEqual(self.client.get(url, secure=True).status_code, 403)
+
+    def test_update_cell_stale_cache(self):
+        """Moves on a stale cached game are applied to the stored game."""
+        self.client.force_login(self.user)
+        url = reverse("game-update-cell", args=[self.game.uuid, 0, 0])
+        self.client.get(reverse("game-detail", args=[self.game.uuid]), secure=True)
+
+        other = Game.objects.get(pk=self.game.pk)
+        other[2, 2].flag()
+        other.save_if_unchanged()
+
+        response = self.client.patch(
+            url,
+            {"status": Status.FLAGGED.value},
+            content_type="application/json",
+            secure=True,
+        )
+        self.assertEqual(response.status_code, 200)
+
+        game = game_cache.get(self.game.uuid)
+        self.assertEqual(game.version, 2)
+        self.assertTrue(game[0, 0].is_flagged)
+        self.assertTrue(game[2, 2].is_flagged)
+
+    def test_retrieve_stale_cache(self):
+        """Games changed since they were cached are loaded from the database."""
+        self.client.force_login(self.user)
+        url = reverse("game-detail", args=[self.game.uuid])
+        self.client.get(url, secure=True)
+
+        # A move saved by another process, which does not update this cache.
+        other = Game.objects.get(pk=self.game.pk)
+        other[2, 2].flag()
+        other.save_if_unchanged()
+
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.data["board"][2][2], "f")
+        self.assertEqual(game_cache.get(self.game.uuid).version, 1)
+
+
+class ConcurrentMovesTestCase(TransactionTestCase):
+    """Test moves sent at the same time to the same game."""
+
+    def test_no_lost_moves(self):
+        """Concurrent moves on one game are all saved."""
+        user = User.objects.create_user("user@example.com")
+        # One move per column. Each move can lose, at most, one race per other
+        # move, so all of them must fit in the attempts.
+        board = create_data_board(GameViewset.move_attempts, 2)
+        game = Game.objects.create(player=user, board=board)
+        barrier = threading.Barrier(game.cols)
+        responses = {}
+
+        def move(c):
+            client = Client()
+            client.force_login(user)
+            url = reverse("game-update-cell", args=[game.uuid, c, 0])
+            try:
+                barrier.wait()
+                responses[c] = client.patch(
+                    url,
+                    {"status": Status.FLAGGED.value},
+                    content_type="application/json",
+                    secure=True,
+                )
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=move, args=[c]) for c in range(game.cols)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(
+            [responses[c].status_code for c in range(game.cols)], [200] * game.cols
+        )
+        game.refresh_from_db()
+        self.assertEqual(game.version, game.cols)
+        self.assertEqual(game.flags, game.cols)
+        self.assertTrue(all(game[c, 0].is_flagged for c in range(game.cols)))
@@ -1,35 +1,81 @@
 """Define views for MS Game app."""
-from django.http import Http404
+from uuid import UUID
+
+from django.http import Http404, StreamingHttpResponse
+from django.http.multipartparser import parse_header
+from django.urls import get_script_prefix
 from django.utils import timezone
 from django.utils.decorators import method_decorator
-from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from drf_yasg.utils import no_body, swagger_auto_schema
 from rest_framework import mixins
-from rest_framework import status as http_status
+from rest_framework import status
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 from ms_game.authorization import IsPlayer
 
-from .models import Game
-from .serializers import CellSerializer, GameSerializer
+from . import board_formats, export, hints, push
+from .cache import games as game_cache
+from .exceptions import GameConflict
+from .generators import place_pending_bombs
+from .models import Game, Status
+from .pagination import GameKeysetPagination
+from .reveal import chord, uncover_neighbors
+from .serializers import (
+    BoardFormatSerializer,
+    CellSerializer,
+    DeltaSerializer,
+    GameBatchSerializer,
+    GameFilterSerializer,
+    GameSerializer,
+    GameSummarySerializer,
+    HintSerializer,
+    MovesDeltaSerializer,
+    MovesSerializer,
+    PushSerializer,
+)
+
+board_format_parameter = openapi.Parameter(
+    "board_format",
+    openapi.IN_QUERY,
+    description=(
+        "Format of the boards, also selected by a `board` parameter in the "
+        "Accept header, like `application/json; board=packed`."
+    ),
+    type=openapi.TYPE_STRING,
+    enum=["json", *board_formats.FORMATS],
+)
 
 
 @method_decorator(
     name="list",
     decorator=swagger_auto_schema(
-        operation_description="Retreive the games for the requesting user."
+        operation_description="Retreive the games for the requesting user.",
+        query_serializer=GameFilterSerializer,
+        manual_parameters=[board_format_parameter],
+    ),
+)
+@method_decorator(
+    name="retrieve",
+    decorator=swagger_auto_schema(
+        operation_description="Retrieve a game of the requesting user.",
+        manual_parameters=[board_format_parameter],
     ),
 )
 @method_decorator(
     name="create",
     decorator=swagger_auto_schema(
-        operation_description="Create a new game for the requesting user."
+        operation_description="Create a new game for the requesting user.",
+        manual_parameters=[board_format_parameter],
     ),
 )
 class GameViewset(
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
     viewsets.GenericViewSet,
 ):
     """
@@ -41,14 +87,115 @@ class GameViewset(
     queryset = Game.objects.all()
     serializer_class = GameSerializer
     permission_classes = [IsPlayer]
+    pagination_class = GameKeysetPagination
+    move_attempts = 10
+
+    def get_object(self, fresh=True):
+        """
+        Return the requested game, from the game cache if it is there.
+
+        Other processes may have saved moves since the game was cached, so
+        a cached game is only returned if its `version` is the one in the
+        database, read without the board. Moves skip that check with
+        `fresh=False`, as they are only saved if the version has not changed.
+        Games loaded from the database are added to the cache.
+        """
+        uuid = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            game = game_cache.get(UUID(uuid))
+        except ValueError:
+            game = None
+
+        if game is not None and fresh:
+            versions = Game.objects.filter(pk=game.pk).values_list("version", flat=True)
+            if versions.first() != game.version:
+                game = None
+
+        if game is None:
+            game = super().get_object()
+            game_cache.set(game)
+        else:
+            self.check_object_permissions(self.request, game)
+        return game
+
+    def get_serializer_context(self):
+        """Add the requested `board_format` to the serializer context."""
+        context = super().get_serializer_context()
+        board_format = self.get_board_format()
+        if board_format is not None:
+            serializer = BoardFormatSerializer(data={"board_format": board_format})
+            serializer.is_valid(raise_exception=True)
+            context["board_format"] = serializer.validated_data["board_format"]
+        return context
+
+    def get_board_format(self):
+        """
+        Return the format of boards requested, or None.
+
+        It is requested with the `board_format` query parameter, or with a
+        `board` parameter in the Accept header.
+        """
+        request = self.request
+        if request is None:
+            return None
+
+        board_format = request.query_params.get("board_format")
+        accepted_media_type = getattr(request, "accepted_media_type", None)
+        if board_format is None and accepted_media_type:
+            __, params = parse_header(accepted_media_type.encode("ascii"))
+            if "board" in params:
+                board_format = params["board"].decode("ascii")
+        return board_format
+
+    def perform_create(self, serializer):
+        """Create the game, and add it to the game cache."""
+        super().perform_create(serializer)
+        game_cache.set(serializer.instance)
 
     def filter_queryset(self, queryset):
         """Limit the list querysets to the ones the user can access."""
         if not self.detail:
-            queryset = queryset.filter(player=self.request.user)[:15]
+            filters = GameFilterSerializer(data=self.request.query_params)
+            filters.is_valid(raise_exception=True)
+            queryset = queryset.filter(player=self.request.user)
+            queryset = filters.filter_queryset(queryset)
         return queryset
 
-    @swagger_auto_schema(responses={204: "Empty response."})
+    @swagger_auto_schema(query_serializer=GameFilterSerializer)
+    @action(detail=False, serializer_class=GameSummarySerializer)
+    def summary(self, request):
+        """Retrieve the games for the requesting user, without their boards."""
+        queryset = self.filter_queryset(self.get_queryset().defer(*Game.board_fields))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(responses={201: GameBatchSerializer})
+    @action(detail=False, methods=["POST"], serializer_class=GameBatchSerializer)
+    def batch(self, request):
+        """Create many games with the same configuration for the requesting user."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(query_serializer=GameFilterSerializer)
+    @action(detail=False, url_path=r"export/(?P<file_format>ndjson|csv)")
+    def export(self, request, file_format):
+        """
+        Stream all the games for the requesting user, as NDJSON or CSV.
+
+        Each row has the board size, bombs, outcome and duration of a game.
+        """
+        lines, content_type = export.FORMATS[file_format]
+        rows = export.export_rows(self.filter_queryset(self.get_queryset()))
+        response = StreamingHttpResponse(lines(rows), content_type=content_type)
+        response["Content-Disposition"] = F'attachment; filename="games.{file_format}"'
+        return response
+
+    @swagger_auto_schema(
+        responses={200: DeltaSerializer, 409: str(GameConflict.default_detail)}
+    )
     @action(
         detail=True,
         methods=["PATCH"],
@@ -56,56 +203,206 @@ class GameViewset(
         serializer_class=CellSerializer,
     )
     def update_cell(self, request, pk, col, row):
-        """Allow changing the status of a cell."""
+        """
+        Allow changing the status of a cell.
+
+        Respond with the cells changed by the move, and the game status. The
+        move is saved, and retried on conflicts, by `play`.
+        """
         col, row = int(col), int(row)
-        game = self.get_object()
-        try:
-            cell = game[(col, row)]
-        except IndexError:
-            raise Http404
+        game, changed = self.play(
+            lambda game: self.apply_move(game, (col, row), request.data)
+        )
+        return self.delta_response(DeltaSerializer(game, context={"cells": changed}))
 
-        # Force a Game validation.
-        # This checks that the game has not been finished.
-        GameSerializer(game, {}, partial=True).is_valid(raise_exception=True)
+    @swagger_auto_schema(
+        responses={200: MovesDeltaSerializer, 409: str(GameConflict.default_detail)}
+    )
+    @action(detail=True, methods=["POST"], serializer_class=MovesSerializer)
+    def moves(self, request, pk):
+        """
+        Apply an ordered list of moves, and save them at once.
 
-        serializer = self.get_serializer(cell, data=request.data)
+        Moves after the one that finishes the game are ignored. Respond with
+        the cells changed by all the moves, the game status, and the number
+        of moves applied. If any move is invalid, none is saved.
+        """
+        serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        self.recursive_uncover_neighbors(game, (col, row))
-        if game.finished:
-            game.finished_at = timezone.now()
-        game.save()
+        moves = serializer.validated_data["moves"]
+        applied = 0
+
+        def apply_moves(game):
+            nonlocal applied
+            changed = set()
+            for applied, move in enumerate(moves, 1):
+                try:
+                    key = move["col"], move["row"]
+                    changed |= self.apply_move(game, key, move, validated=True)
+                except Http404:
+                    raise ValidationError({"moves": {applied - 1: ["Cell not found."]}})
+                except ValidationError as error:
+                    raise ValidationError({"moves": {applied - 1: error.detail}})
+                if game.finished:
+                    break
+            return changed
+
+        game, changed = self.play(apply_moves)
+        context = {"cells": changed, "applied": applied}
+        return self.delta_response(MovesDeltaSerializer(game, context=context))
+
+    @swagger_auto_schema(
+        request_body=no_body,
+        responses={200: DeltaSerializer, 409: str(GameConflict.default_detail)},
+    )
+    @action(
+        detail=True,
+        methods=["POST"],
+        url_path=r"cells/(?P<col>[0-9]*),(?P<row>[0-9]*)/chord",
+        serializer_class=DeltaSerializer,
+    )
+    def chord(self, request, pk, col, row):
+        """
+        Uncover the unflagged neighbors of a number with all its bombs flagged.
+
+        Respond with the cells uncovered, and the game status. Nothing is
+        uncovered if the cell is covered, the bombs are not placed yet, or its
+        flagged neighbors do not match its adjacent bombs.
+        """
+        col, row = int(col), int(row)
+
+        def apply_chord(game):
+            if col >= game.cols or row >= game.rows:
+                raise Http404
+            GameSerializer(game).validate({})
+            if game.bombs_pending:
+                # Every cell is covered, there is nothing to chord.
+                return set()
+            changed = chord(game, (col, row))
+            if game.finished:
+                game.finished_at = timezone.now()
+            return changed
+
+        game, changed = self.play(apply_chord)
+        return self.delta_response(DeltaSerializer(game, context={"cells": changed}))
+
+    @swagger_auto_schema(responses={200: HintSerializer})
+    @action(detail=True, serializer_class=HintSerializer)
+    def hint(self, request, pk):
+        """
+        Return a covered cell that can be uncovered without guessing.
+
+        The cell is null when every covered cell needs a guess. The solver
+        behind hints is cached, and updated with the cells uncovered by every
+        move, so a hint only looks at what changed since the previous one.
+        """
+        game = self.get_object()
+        GameSerializer(game).validate({})
+        key = hints.hint(game)
+        serializer = self.get_serializer({"cell": key and list(key)})
+        return Response(serializer.data)
 
-        return Response(status=http_status.HTTP_204_NO_CONTENT)
+    @swagger_auto_schema(responses={200: PushSerializer})
+    @action(detail=True, serializer_class=PushSerializer)
+    def push(self, request, pk):
+        """
+        Return the URLs to subscribe to the updates of a game.
+
+        Every saved move is pushed to the subscribers, as Server-Sent Events
+        from `events`, or over a WebSocket from `socket`. The URLs are valid
+        for an hour, and are only served by the ASGI application, so both
+        are null when the API is served by WSGI.
+        """
+        game = self.get_object()
+        if not request.META.get(push.ENVIRON_KEY):
+            serializer = self.get_serializer({"events": None, "socket": None})
+            return Response(serializer.data)
+
+        query = F"?token={push.subscription_token(game)}"
+        events, socket = (
+            request.build_absolute_uri(
+                get_script_prefix() + push.subscription_path(game.pk, channel) + query
+            )
+            for channel in ["events", "socket"]
+        )
+        socket = "ws" + socket[len("http") :]
+        serializer = self.get_serializer({"events": events, "socket": socket})
+        return Response(serializer.data)
 
     @staticmethod
-    def recursive_uncover_neighbors(game, cell_key):
-        """Recursively uncover neighbors for uncovered cells with no adjacent bombs."""
-        cell = game[cell_key]
+    def delta_response(serializer):
+        """Push the delta of a saved move to the game subscribers, and return it."""
+        if serializer.context["cells"]:
+            push.publish(serializer.instance, serializer.data)
+        return Response(serializer.data)
+
+    def play(self, move):
+        """
+        Apply `move` to the requested game, and save the cells it changed.
 
-        if cell.is_covered or cell.has_bomb:
-            return
+        `move` is called with the game, and returns the keys of the changed
+        cells. Only the changed cells and counters are written, and the game
+        cache and the solver behind hints are updated. If another move is
+        saved while this one is being applied, or the cached game was stale,
+        the move is applied again to the game loaded from the database, up to
+        `move_attempts` times. Return the game and the changed keys.
+        """
+        for _ in range(self.move_attempts):
+            game = self.get_object(fresh=False)
+            # Until the bombs are placed, the move builds the whole board.
+            building_board = game.bombs_pending
+            changed = move(game)
+            if not changed:
+                return game, changed
+            if game.save_if_unchanged(None if building_board else changed):
+                game_cache.set(game)
+                hints.update(game, changed)
+                return game, changed
+            game_cache.delete(game.pk)
 
-        keys_to_check = {cell_key}
+        raise GameConflict
 
-        while keys_to_check:
-            current_cell_key = keys_to_check.pop()
-            current_cell = game[current_cell_key]
+    def apply_move(self, game, cell_key, data, validated=False):
+        """
+        Change the status of a cell, without saving the game.
 
-            neighbor_has_bomb = False
-            neighbor_keys = []
-            neighbors = []
+        If `data` was `validated` already, as the moves of a batch are, it is
+        only checked against the game and the cell. Return the set of keys of
+        the cells changed by the move.
+        """
+        col, row = cell_key
+        if col >= game.cols or row >= game.rows:
+            raise Http404
 
-            # First pass checks if the current cell has neighbors with bombs.
-            for neighbor_key, neighbor in game.get_neighbors((current_cell_key)):
-                neighbors.append(neighbor)
-                if neighbor.has_bomb:
-                    neighbor_has_bomb = True
+        if game.bombs_pending:
+            uncovering = data.get("status") == Status.UNCOVERED
+            place_pending_bombs(game, cell_key if uncovering else None)
 
-                if neighbor.is_covered:
-                    neighbor_keys.append(neighbor_key)
+        cell = game[cell_key]
+
+        if validated:
+            GameSerializer(game).validate({})
+            serializer = CellSerializer(cell)
+            serializer.update(cell, serializer.validate(data))
+        else:
+            # Force a Game validation.
+            # This checks that the game has not been finished.
+            GameSerializer(game, {}, partial=True).is_valid(raise_exception=True)
+
+            serializer = CellSerializer(cell, data=data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        changed = self.recursive_uncover_neighbors(game, cell_key)
+        changed.add(cell_key)
+        if game.finished:
+            game.finished_at = timezone.now()
+        return changed
+
+    @staticmethod
+    def recursive_uncover_neighbors(game, cell_key):
+        """
+        Recursively uncover neighbors for uncovered cells with no adjacent bombs.
 
-            if not neighbor_has_bomb:
-                [cell.uncover() for cell in neighbors]
-                current_cell.uncover()
-                keys_to_check.update(neighbor_keys)
+        Return the set of keys of the cells that were uncovered.
+        """
+        return uncover_neighbors(game, cell_key)